@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dashboard
+from .models import Dashboard, ExportJob
 
 
 @admin.register(Dashboard)
@@ -8,3 +8,11 @@ class DashboardAdmin(admin.ModelAdmin):
     list_filter = ('template', 'is_public', 'created_at')
     search_fields = ('name', 'description', 'organization__name')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('dashboard', 'content', 'format', 'status', 'size', 'organization', 'created_at')
+    list_filter = ('content', 'format', 'status', 'created_at')
+    search_fields = ('dashboard__name', 'organization__name')
+    readonly_fields = ('artifact_key', 'artifact_path', 'size', 'created_at', 'finished_at')
@@ -0,0 +1,294 @@
+"""
+Agregações usadas pelos KPIs e gráficos dos dashboards
+Lidas do cubo diário pré-calculado na ingestão quando possível; caso
+contrário calculadas direto das linhas, em pandas ou no motor SQL embutido
+(settings.DASHBOARD_ENGINE = 'duckdb')
+"""
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from apps.datasources.services import dates
+from apps.datasources.services.sql_engine import ROWS, day_date, quote
+
+MONTH_COLUMNS = ['year', 'month_num', 'value']
+WEEK_COLUMNS = ['year', 'week', 'value']
+
+
+class RowAggregates:
+    """Agregações calculadas sobre as linhas do DataFrame"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def row_count(self) -> int:
+        return len(self.df)
+
+    def total(self, col) -> float:
+        return float(self.df[col].sum())
+
+    def mean(self, col) -> float:
+        return float(self.df[col].mean())
+
+    def summary_by(self, dimension, col) -> pd.DataFrame:
+        """sum/count/mean de `col` por valor de `dimension` (ordenado pela dimensão)"""
+        return self.df.groupby(dimension)[col].agg(['sum', 'count', 'mean'])
+
+    def rows_by(self, dimension) -> pd.Series:
+        """Número de linhas por valor de `dimension`"""
+        return self.df.groupby(dimension).size()
+
+    def nunique(self, dimension) -> int:
+        return int(self.df[dimension].nunique())
+
+    def _dated(self, date_col, col):
+        """(dias desde 1970, valores) das linhas com data"""
+        days = dates.epoch_days(self.df[date_col])
+        valid = days != dates.NAT_DAY
+        return days[valid], self.df[col].to_numpy()[valid]
+
+    def monthly(self, date_col, col) -> pd.DataFrame:
+        """Soma mensal: colunas year, month_num, value"""
+        days, values = self._dated(date_col, col)
+        return _monthly(days, values)
+
+    def weekly(self, date_col, col) -> pd.DataFrame:
+        """Soma por ano/semana ISO: colunas year, week, value"""
+        days, values = self._dated(date_col, col)
+        return _weekly(days, values)
+
+
+def _monthly(days: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """Soma dos valores por mês, agrupando pelo número inteiro do mês"""
+    if len(days) == 0:
+        return pd.DataFrame(columns=MONTH_COLUMNS)
+    sums = pd.Series(values).groupby(dates.month_numbers(days)).sum()
+    months = sums.index.to_numpy()
+    return pd.DataFrame({
+        'year': months // 12 + 1970,
+        'month_num': months % 12 + 1,
+        'value': sums.to_numpy(),
+    })
+
+
+def _weekly(days: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """Soma dos valores por semana ISO (ano ISO, semana), em ordem cronológica"""
+    if len(days) == 0:
+        return pd.DataFrame(columns=WEEK_COLUMNS)
+    year, week = dates.iso_weeks(days)
+    sums = pd.Series(values).groupby([year, week]).sum()
+    return pd.DataFrame({
+        'year': sums.index.get_level_values(0).to_numpy(),
+        'week': sums.index.get_level_values(1).to_numpy(),
+        'value': sums.to_numpy(),
+    })
+
+
+class CubeAggregates(RowAggregates):
+    """
+    Agregações lidas do cubo diário (AggregateCube) já filtrado pelo período.
+
+    Só é usado quando o cubo cobre exatamente as mesmas linhas do DataFrame
+    (mesma coluna de data e mesmo período). Medidas ou dimensões que não
+    estão no cubo caem no cálculo sobre as linhas.
+
+    Continuam lendo as linhas do período (o cubo só guarda somas e
+    contagens por dia e membro):
+    - medidas/dimensões fora do cubo: colunas que viraram texto num chunk
+      posterior e dimensões com mais de MAX_MEMBERS valores;
+    - períodos por outra coluna de data que não a do cubo (os dias do cubo
+      não dizem nada sobre ela);
+    - estatísticas por linha do AnalysisContext: histograma, desvio,
+      quantis, metades cronológicas (insights, previsões e alertas),
+      nulos e duplicados.
+    """
+
+    def __init__(self, df: pd.DataFrame, cube):
+        super().__init__(df)
+        self.cube = cube
+        self._totals = cube.totals()
+        self._dimensions = {}
+
+    def _by(self, dimension) -> pd.DataFrame:
+        if dimension not in self._dimensions:
+            self._dimensions[dimension] = self.cube.by_dimension(dimension)
+        return self._dimensions[dimension]
+
+    def row_count(self) -> int:
+        return int(self._totals.get('rows', 0))
+
+    def total(self, col) -> float:
+        if not self.cube.has_measure(col):
+            return super().total(col)
+        return float(self._totals.get(f'{col}__sum', 0.0))
+
+    def mean(self, col) -> float:
+        if not self.cube.has_measure(col):
+            return super().mean(col)
+        count = self._totals.get(f'{col}__count', 0)
+        return float(self._totals[f'{col}__sum'] / count) if count else float('nan')
+
+    def summary_by(self, dimension, col) -> pd.DataFrame:
+        if not (self.cube.has_dimension(dimension) and self.cube.has_measure(col)):
+            return super().summary_by(dimension, col)
+        by = self._by(dimension)
+        summary = pd.DataFrame({
+            'sum': by[f'{col}__sum'],
+            'count': by[f'{col}__count'].astype('int64'),
+        })
+        summary['mean'] = summary['sum'] / summary['count'].where(summary['count'] > 0)
+        return summary.rename_axis(dimension)
+
+    def rows_by(self, dimension) -> pd.Series:
+        if not self.cube.has_dimension(dimension):
+            return super().rows_by(dimension)
+        return self._by(dimension)['rows'].astype('int64').rename_axis(dimension)
+
+    def nunique(self, dimension) -> int:
+        if not self.cube.has_dimension(dimension):
+            return super().nunique(dimension)
+        return len(self._by(dimension))
+
+    def _daily(self, date_col, col) -> Optional[pd.DataFrame]:
+        if date_col != self.cube.date_column or not self.cube.has_measure(col):
+            return None
+        daily = self.cube.daily()
+        return daily[daily['rows'] > 0][[f'{col}__sum']].rename(columns={f'{col}__sum': 'value'})
+
+    def monthly(self, date_col, col) -> pd.DataFrame:
+        daily = self._daily(date_col, col)
+        if daily is None:
+            return super().monthly(date_col, col)
+        return _monthly(dates.epoch_days(daily.index.to_series()), daily['value'].to_numpy())
+
+    def weekly(self, date_col, col) -> pd.DataFrame:
+        daily = self._daily(date_col, col)
+        if daily is None:
+            return super().weekly(date_col, col)
+        return _weekly(dates.epoch_days(daily.index.to_series()), daily['value'].to_numpy())
+
+
+class SQLAggregates(RowAggregates):
+    """
+    Agregações executadas pelo motor SQL embutido (DuckDB) sobre a tabela
+    com as linhas do período (ver SQLEngine.register_rows)
+
+    Mesmos resultados de RowAggregates: grupos ordenados pela dimensão,
+    linhas sem valor na dimensão fora dos grupos, somas vazias 0 e médias
+    vazias NaN. df continua disponível para quem lê as linhas (ver LazyRows).
+    """
+
+    def __init__(self, df: pd.DataFrame, engine, relation=ROWS):
+        super().__init__(df)
+        self.engine = engine
+        self.relation = quote(relation)
+
+    def row_count(self) -> int:
+        return int(self.engine.scalar(f'SELECT count(*) FROM {self.relation}'))
+
+    def total(self, col) -> float:
+        value = self.engine.scalar(f'SELECT sum({quote(col)}) FROM {self.relation}')
+        return float(value) if value is not None else 0.0
+
+    def mean(self, col) -> float:
+        value = self.engine.scalar(f'SELECT avg({quote(col)}) FROM {self.relation}')
+        return float(value) if value is not None else float('nan')
+
+    def _grouped(self, dimension, select) -> pd.DataFrame:
+        key = quote(dimension)
+        frame = self.engine.query(
+            f'SELECT {key}, {select} FROM {self.relation} '
+            f'WHERE {key} IS NOT NULL GROUP BY {key} ORDER BY {key}'
+        )
+        return frame.set_index(frame.columns[0]).rename_axis(dimension)
+
+    def summary_by(self, dimension, col) -> pd.DataFrame:
+        value = quote(col)
+        return self._grouped(
+            dimension,
+            f'coalesce(sum({value}), 0) AS "sum", count({value}) AS "count", avg({value}) AS "mean"',
+        )
+
+    def rows_by(self, dimension) -> pd.Series:
+        return self._grouped(dimension, 'count(*) AS "size"')['size'].astype('int64').rename(None)
+
+    def nunique(self, dimension) -> int:
+        return int(self.engine.scalar(f'SELECT count(DISTINCT {quote(dimension)}) FROM {self.relation}'))
+
+    def _by_day(self, date_col, col, periods, columns) -> pd.DataFrame:
+        """Soma de `col` por período do dia (expressões SQL sobre a coluna day)"""
+        frame = self.engine.query(
+            f'SELECT {periods}, coalesce(sum(value), 0) AS value FROM ('
+            f'SELECT {day_date(date_col)} AS day, {quote(col)} AS value FROM {self.relation} '
+            f'WHERE {quote(date_col)} IS NOT NULL) GROUP BY 1, 2 ORDER BY 1, 2'
+        )
+        if frame.empty:
+            return pd.DataFrame(columns=columns)
+        frame.columns = columns
+        return frame.astype({columns[0]: 'int64', columns[1]: 'int64'})
+
+    def monthly(self, date_col, col) -> pd.DataFrame:
+        return self._by_day(date_col, col, 'year(day), month(day)', MONTH_COLUMNS)
+
+    def weekly(self, date_col, col) -> pd.DataFrame:
+        return self._by_day(date_col, col, 'isoyear(day), week(day)', WEEK_COLUMNS)
+
+
+class LazyRows:
+    """
+    Linhas do período em pandas, carregadas só quando alguém as lê
+
+    Com o motor SQL as linhas do período já estão na tabela do motor e os
+    KPIs e gráficos não precisam do DataFrame: columns, empty e len são
+    respondidos pelo esquema e pela contagem no motor. Qualquer outro
+    acesso (insights, previsões, widgets) carrega o DataFrame uma vez, com
+    load(), e é repassado a ele.
+    """
+
+    def __init__(self, columns, engine, load, relation=ROWS):
+        self.columns = pd.Index(columns)
+        self._engine = engine
+        self._relation = quote(relation)
+        self._load = load
+        self._frame = None
+        self._row_count = None
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            self._frame = self._load()
+        return self._frame
+
+    @property
+    def loaded(self) -> bool:
+        return self._frame is not None
+
+    @property
+    def empty(self) -> bool:
+        return len(self.columns) == 0 or len(self) == 0
+
+    def __len__(self):
+        if self._frame is not None:
+            return len(self._frame)
+        if self._row_count is None:
+            self._row_count = int(self._engine.scalar(f'SELECT count(*) FROM {self._relation}'))
+        return self._row_count
+
+    def __getitem__(self, key):
+        return self.frame[key]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.frame, name)
+
+
+def build_aggregates(df: pd.DataFrame, cube=None, date_col=None) -> RowAggregates:
+    """
+    Usa o cubo quando ele foi construído sobre a mesma coluna de data das
+    linhas; sem cubo (snapshots antigos, fontes combinadas) ou com outra
+    coluna de data, as agregações são calculadas sobre as linhas
+    """
+    if cube is not None and date_col and cube.date_column == date_col:
+        return CubeAggregates(df, cube)
+    return RowAggregates(df)
@@ -10,6 +10,8 @@ from typing import Dict, List, Any, Optional
 from django.conf import settings
 import openai
 
+from apps.datasources.services.type_inference import DATE, NUMERIC, TypeInferenceEngine
+
 
 class DataProcessor:
     """Processador de dados com suporte a Free (Python) e Paid (GPT)"""
@@ -72,7 +74,8 @@ class DataProcessor:
                 if field in detected:
                     break
         
-        # Detectar tipos de dados
+        # Detectar tipos de dados (uma passada sobre uma amostra)
+        schema = TypeInferenceEngine().infer(df)
         column_types = {}
         for col in available_columns:
             dtype = str(df[col].dtype)
@@ -81,8 +84,10 @@ class DataProcessor:
             column_types[col] = {
                 'dtype': dtype,
                 'sample': sample,
-                'is_numeric': pd.api.types.is_numeric_dtype(df[col]),
-                'is_datetime': pd.api.types.is_datetime64_any_dtype(df[col]),
+                'type': schema[col]['type'],
+                'role': schema[col]['role'],
+                'is_numeric': schema[col]['type'] == NUMERIC,
+                'is_datetime': schema[col]['type'] == DATE,
             }
         
         return {
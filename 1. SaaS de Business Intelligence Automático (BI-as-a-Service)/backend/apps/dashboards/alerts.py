@@ -1,20 +1,21 @@
 """
 Sistema de Alertas Inteligentes
 """
-import pandas as pd
+import numpy as np
 from typing import Dict, List, Any
 
+from .analysis_context import AnalysisContext
+
 
 class AlertEngine:
     """Engine para detectar e gerar alertas"""
     
-    def generate_alerts(self, df: pd.DataFrame, col_types: Dict, kpis: Dict, plan: str = 'free') -> List[Dict]:
+    def generate_alerts(self, context: AnalysisContext, kpis: Dict, plan: str = 'free') -> List[Dict]:
         """
         Gera alertas automáticos baseados nos dados e KPIs.
         
         Args:
-            df: DataFrame com os dados
-            col_types: Tipos de colunas detectados
+            context: Dados do período e tipos de colunas (ver AnalysisContext)
             kpis: KPIs calculados
             plan: Plano do usuário
         
@@ -22,17 +23,18 @@ class AlertEngine:
             Lista de alertas
         """
         alerts = []
+        col_types = context.col_types
         
         # 1. ALERTAS DE META
         alerts.extend(self._check_goal_alerts(kpis, plan))
         
         # 2. ALERTAS DE ANOMALIA
         if col_types.get('numeric'):
-            alerts.extend(self._check_anomaly_alerts(df, col_types))
+            alerts.extend(self._check_anomaly_alerts(context))
         
         # 3. ALERTAS DE TENDÊNCIA
         if col_types.get('date') and col_types.get('numeric'):
-            alerts.extend(self._check_trend_alerts(df, col_types))
+            alerts.extend(self._check_trend_alerts(context))
         
         # 4. ALERTAS DE THRESHOLD (configuráveis - futura feature)
         alerts.extend(self._check_threshold_alerts(kpis, plan))
@@ -78,19 +80,20 @@ class AlertEngine:
         
         return alerts
     
-    def _check_anomaly_alerts(self, df: pd.DataFrame, col_types: Dict) -> List[Dict]:
+    def _check_anomaly_alerts(self, context: AnalysisContext) -> List[Dict]:
         """Detecta anomalias nos dados"""
         alerts = []
         
-        value_col = col_types['numeric'][0]
+        value_col = context.value_col
         
         try:
-            mean = df[value_col].mean()
-            std = df[value_col].std()
+            values = context.values(value_col)
+            mean = context.mean(value_col)
+            std = context.std(value_col)
             
             # Detectar valores muito abaixo da média (3 desvios padrão)
             threshold_low = mean - 3 * std
-            low_values = (df[value_col] < threshold_low).sum()
+            low_values = int((values < threshold_low).sum())
             
             if low_values > 0 and low_values <= 3:
                 alerts.append({
@@ -104,7 +107,7 @@ class AlertEngine:
             
             # Detectar valores muito acima da média
             threshold_high = mean + 3 * std
-            high_values = (df[value_col] > threshold_high).sum()
+            high_values = int((values > threshold_high).sum())
             
             if high_values > 0 and high_values <= 3:
                 alerts.append({
@@ -120,24 +123,18 @@ class AlertEngine:
         
         return alerts
     
-    def _check_trend_alerts(self, df: pd.DataFrame, col_types: Dict) -> List[Dict]:
+    def _check_trend_alerts(self, context: AnalysisContext) -> List[Dict]:
         """Alertas de tendência"""
         alerts = []
         
-        date_col = col_types['date'][0]
-        value_col = col_types['numeric'][0]
-        
         try:
-            df_copy = df.copy()
-            df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-            df_copy = df_copy.dropna(subset=[date_col])
-            df_copy = df_copy.sort_values(date_col)
+            # Metades da série em ordem cronológica
+            first, second = context.halves(context.value_col)
             
-            if len(df_copy) >= 4:
+            if len(first) + len(second) >= 4:
                 # Comparar primeiros 50% vs últimos 50%
-                mid = len(df_copy) // 2
-                first_half_avg = df_copy.iloc[:mid][value_col].mean()
-                second_half_avg = df_copy.iloc[mid:][value_col].mean()
+                first_half_avg = np.nanmean(first)
+                second_half_avg = np.nanmean(second)
                 
                 if first_half_avg > 0:
                     change_pct = ((second_half_avg - first_half_avg) / first_half_avg) * 100
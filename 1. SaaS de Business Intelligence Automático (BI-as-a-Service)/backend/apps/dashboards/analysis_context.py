@@ -0,0 +1,127 @@
+"""
+Contexto de análise compartilhado pelo pipeline do dashboard
+Montado uma vez por requisição: KPIs, gráficos, insights, previsões e
+alertas leem dele em vez de copiar o DataFrame e recalcular as mesmas
+ordenações, somas e desvios
+"""
+import numpy as np
+import pandas as pd
+
+from apps.datasources.services import dates
+from .aggregates import RowAggregates
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class AnalysisContext:
+    """
+    Dados tipados de uma requisição e tudo que é derivado deles
+
+    df: DataFrame já tipado e filtrado pelo período (não é alterado)
+    col_types: colunas por tipo (ver DashboardService._detect_column_types)
+    aggregates: somas/contagens do período (cubo diário ou linhas)
+
+    Arrays numpy, ordem cronológica, somas mensais/semanais, agrupamentos,
+    quantis e desvios são calculados na primeira vez que alguém pede e
+    memorizados. O contexto é imutável e os arrays devolvidos são somente
+    leitura, então podem ser compartilhados entre os motores sem cópias.
+    """
+
+    def __init__(self, df: pd.DataFrame, col_types, aggregates=None):
+        object.__setattr__(self, 'df', df)
+        object.__setattr__(self, 'col_types', col_types)
+        object.__setattr__(self, 'aggregates', aggregates or RowAggregates(df))
+        object.__setattr__(self, '_memo', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AnalysisContext é imutável')
+
+    def _cached(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # Colunas principais usadas pelos motores
+
+    @property
+    def date_col(self):
+        return self.col_types['date'][0] if self.col_types.get('date') else None
+
+    @property
+    def value_col(self):
+        return self.col_types['numeric'][0] if self.col_types.get('numeric') else None
+
+    @property
+    def row_count(self) -> int:
+        return len(self.df)
+
+    # Arrays
+
+    def values(self, col) -> np.ndarray:
+        """Valores numéricos da coluna (float64, NaN onde falta)"""
+        return self._cached(
+            ('values', col),
+            lambda: _read_only(np.array(self.df[col].to_numpy(dtype='float64', na_value=np.nan))),
+        )
+
+    @property
+    def days(self) -> np.ndarray:
+        """Dias desde 1970 da coluna de data principal"""
+        return self._cached('days', lambda: _read_only(dates.epoch_days(self.df[self.date_col])))
+
+    @property
+    def order(self) -> np.ndarray:
+        """Posições das linhas com data, da mais antiga para a mais recente"""
+        return self._cached('order', lambda: _read_only(dates.chronological_order(self.df[self.date_col])))
+
+    def chronological(self, col) -> np.ndarray:
+        """Valores da coluna em ordem cronológica (só linhas com data)"""
+        return self._cached(('chronological', col), lambda: _read_only(self.values(col)[self.order]))
+
+    def halves(self, col):
+        """Primeira e segunda metade (em número de linhas) da série cronológica"""
+        values = self.chronological(col)
+        mid = len(values) // 2
+        return values[:mid], values[mid:]
+
+    # Estatísticas
+
+    def total(self, col) -> float:
+        return self._cached(('total', col), lambda: self.aggregates.total(col))
+
+    def mean(self, col) -> float:
+        return self._cached(('mean', col), lambda: float(pd.Series(self.values(col)).mean()))
+
+    def std(self, col) -> float:
+        return self._cached(('std', col), lambda: float(pd.Series(self.values(col)).std()))
+
+    def quantile(self, col, q) -> float:
+        return self._cached(('quantile', col, q), lambda: float(pd.Series(self.values(col)).quantile(q)))
+
+    def null_counts(self) -> pd.Series:
+        return self._cached('null_counts', lambda: self.df.isnull().sum())
+
+    def duplicate_count(self) -> int:
+        return self._cached('duplicate_count', lambda: int(self.df.duplicated().sum()))
+
+    # Agregações
+
+    def summary_by(self, dimension, col) -> pd.DataFrame:
+        return self._cached(('summary_by', dimension, col), lambda: self.aggregates.summary_by(dimension, col))
+
+    def rows_by(self, dimension) -> pd.Series:
+        return self._cached(('rows_by', dimension), lambda: self.aggregates.rows_by(dimension))
+
+    def nunique(self, dimension) -> int:
+        return self._cached(('nunique', dimension), lambda: self.aggregates.nunique(dimension))
+
+    def monthly(self, col, date_col=None) -> pd.DataFrame:
+        date_col = date_col or self.date_col
+        return self._cached(('monthly', date_col, col), lambda: self.aggregates.monthly(date_col, col))
+
+    def weekly(self, col, date_col=None) -> pd.DataFrame:
+        date_col = date_col or self.date_col
+        return self._cached(('weekly', date_col, col), lambda: self.aggregates.weekly(date_col, col))
@@ -0,0 +1,186 @@
+"""
+Comparação de períodos (período anterior e mesmo período do ano passado)
+Calculada do cubo diário completo, sem ler as linhas de novo: os dias das
+janelas de comparação são deslocados para cair sobre o período atual, então
+os mesmos agrupamentos (mês, semana ISO, membros de uma dimensão) alinham
+com as séries atuais
+"""
+import numpy as np
+import pandas as pd
+
+from apps.datasources.services import dates
+from apps.datasources.services.aggregate_cube import TOTAL, AggregateCube
+from .aggregates import CubeAggregates, RowAggregates
+
+# Janelas comparadas com o período atual
+WINDOWS = ('previous', 'last_year')
+
+
+class WindowAggregates(CubeAggregates):
+    """
+    Agregações de uma janela de comparação
+
+    Totais e somas por membro vêm prontos de PeriodComparison; o cubo da
+    janela só guarda os totais diários (dias já deslocados), para as séries
+    mensal e semanal. As linhas da janela não são lidas: medidas e dimensões
+    fora do cubo levantam KeyError em vez de cair no cálculo sobre as linhas.
+    """
+
+    def __init__(self, daily_cube, totals: pd.Series, by_dimension: dict):
+        RowAggregates.__init__(self, pd.DataFrame())
+        self.cube = daily_cube
+        self._totals = totals
+        self._dimensions = by_dimension
+
+    def _require(self, dimension=None, col=None):
+        if dimension is not None and not self.cube.has_dimension(dimension):
+            raise KeyError(dimension)
+        if col is not None and not self.cube.has_measure(col):
+            raise KeyError(col)
+
+    def total(self, col) -> float:
+        self._require(col=col)
+        return super().total(col)
+
+    def mean(self, col) -> float:
+        self._require(col=col)
+        return super().mean(col)
+
+    def summary_by(self, dimension, col) -> pd.DataFrame:
+        self._require(dimension, col)
+        return super().summary_by(dimension, col)
+
+    def rows_by(self, dimension) -> pd.Series:
+        self._require(dimension)
+        return super().rows_by(dimension)
+
+    def nunique(self, dimension) -> int:
+        self._require(dimension)
+        return super().nunique(dimension)
+
+    def monthly(self, date_col, col) -> pd.DataFrame:
+        self._require(col=col)
+        if date_col != self.cube.date_column:
+            raise KeyError(date_col)
+        return super().monthly(date_col, col)
+
+    def weekly(self, date_col, col) -> pd.DataFrame:
+        self._require(col=col)
+        if date_col != self.cube.date_column:
+            raise KeyError(date_col)
+        return super().weekly(date_col, col)
+
+
+class PeriodComparison:
+    """
+    Janelas de comparação de um período [start, end)
+
+    cube: cubo diário completo (sem filtro de período)
+
+    Anterior: os mesmos N dias imediatamente antes de start. Ano passado:
+    N dias a partir de start - 1 ano. Cada janela vira um cubo com os dias
+    deslocados para o período atual (ver aggregates()), montado numa única
+    passada sobre os dias do cubo.
+    """
+
+    def __init__(self, cube, start, end):
+        self.cube = cube
+        first = dates.first_day(start)
+        last = dates.first_day(end)
+        length = last - first
+        year_ago = dates.first_day(pd.Timestamp(start) - pd.DateOffset(years=1))
+        self.windows = {
+            'current': (first, last),
+            'previous': (first - length, first),
+            'last_year': (year_ago, year_ago + length),
+        }
+        self._aggregates = self._split()
+
+    def _split(self):
+        frame = self.cube.frame
+        days = dates.epoch_days(frame['day'])
+        first = self.windows['current'][0]
+
+        # Posições e dia deslocado de cada janela (janelas podem se sobrepor)
+        positions, shifted, window_ids = [], [], []
+        for window_id, name in enumerate(WINDOWS):
+            start, end = self.windows[name]
+            selected = np.flatnonzero((days >= start) & (days < end))
+            positions.append(selected)
+            shifted.append(days[selected] + (first - start))
+            window_ids.append(np.full(len(selected), window_id))
+
+        moved = frame.take(np.concatenate(positions)).assign(
+            day=np.concatenate(shifted).astype('datetime64[D]').astype('datetime64[ns]'),
+            window=np.concatenate(window_ids),
+        )
+        # Um único agrupamento para todas as janelas: totais (dimensão vazia)
+        # e somas por membro de cada dimensão
+        sums = (
+            moved.drop(columns='day')
+            .groupby(['window', 'dimension', 'member'], observed=True, sort=True)
+            .sum()
+        )
+        parts = {
+            key: part.droplevel(['window', 'dimension'])
+            for key, part in sums.groupby(level=['window', 'dimension'], observed=True)
+        }
+        empty = sums.iloc[:0].droplevel(['window', 'dimension'])
+
+        aggregates = {}
+        for window_id, name in enumerate(WINDOWS):
+            totals = parts.get((window_id, TOTAL), empty).sum()
+            by_dimension = {}
+            for dimension in self.cube.dimensions:
+                members = parts.get((window_id, dimension), empty)
+                members.index = members.index.astype(str)
+                by_dimension[dimension] = members[members['rows'] > 0]
+            daily = moved[(moved['window'] == window_id) & (moved['dimension'] == TOTAL)].drop(columns='window')
+            daily_cube = AggregateCube(daily, self.cube.date_column, self.cube.measures, self.cube.dimensions)
+            aggregates[name] = WindowAggregates(daily_cube, totals, by_dimension)
+        return aggregates
+
+    def aggregates(self, window) -> WindowAggregates:
+        """Agregações da janela com os dias alinhados ao período atual"""
+        return self._aggregates[window]
+
+    def periods(self):
+        """Datas [início, fim) de cada janela, em ISO"""
+        def iso(day):
+            return str(np.datetime64(day, 'D'))
+        return {name: {'start': iso(start), 'end': iso(end)} for name, (start, end) in self.windows.items()}
+
+
+def change_pct(current, base):
+    """Variação percentual; None quando a base é zero ou não existe"""
+    if base is None or current is None or not np.isfinite(base) or base == 0:
+        return None
+    return round(float((current - base) / abs(base) * 100), 1)
+
+
+def compare_values(current, values):
+    """Valor atual, valores das janelas e variações"""
+    item = {'current': current}
+    for name in WINDOWS:
+        base = values.get(name)
+        item[name] = base
+        item[f'{name}_change_pct'] = change_pct(current, base)
+    return item
+
+
+def compare_series(series, label_field, value_field, values):
+    """
+    Pontos de uma série do gráfico com os valores das janelas
+
+    values: {janela: pd.Series valor por rótulo}; rótulos ausentes na
+    janela valem 0
+    """
+    compared = []
+    for point in series:
+        label = point[label_field]
+        bases = {
+            name: float(by_label.get(label, 0.0)) if by_label is not None else None
+            for name, by_label in values.items()
+        }
+        compared.append({'label': label, **compare_values(point[value_field], bases)})
+    return compared
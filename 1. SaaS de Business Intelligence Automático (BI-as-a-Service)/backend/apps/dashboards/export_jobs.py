@@ -0,0 +1,201 @@
+"""
+Exportações em background
+Os arquivos são gerados por uma tarefa Celery e guardados em storage
+(settings.EXPORT_STORAGE). A chave do artefato combina conteúdo, formato e
+a versão dos dados do dashboard (hash dos snapshots, mais template,
+mapeamento e metas para relatórios): pedir de novo a mesma exportação de um
+dashboard sem mudanças devolve o artefato já gerado.
+"""
+import hashlib
+import logging
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .exporters import DashboardExporter
+from .models import ExportJob
+from .result_cache import DashboardResultCache
+
+logger = logging.getLogger(__name__)
+
+
+class ExportLimitReached(ValueError):
+    """Limite mensal de exportações do plano atingido"""
+
+
+class ExportJobService:
+    """Cria, gera e entrega exportações de dashboards"""
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'parquet': 'application/vnd.apache.parquet',
+    }
+    # Formatos disponíveis por conteúdo
+    FORMATS = {
+        'report': ('xlsx', 'csv'),
+        'rows': ('csv', 'xlsx', 'parquet'),
+    }
+
+    def __init__(self, storage=None):
+        self.storage = storage or self._build_storage()
+        self.exporter = DashboardExporter()
+
+    def _build_storage(self):
+        """Storage configurado em settings.EXPORT_STORAGE"""
+        config = getattr(settings, 'EXPORT_STORAGE', {})
+        backend = import_string(config.get('BACKEND', 'django.core.files.storage.FileSystemStorage'))
+        return backend(**config.get('OPTIONS', {}))
+
+    def artifact_key(self, dashboard, content: str, fmt: str) -> str:
+        """Mesma chave enquanto os dados e a configuração do dashboard não mudam"""
+        result_cache = DashboardResultCache()
+        if content == 'report':
+            version = result_cache.build_key(dashboard, {})
+        else:
+            version = ','.join(result_cache.snapshot_hashes(dashboard))
+        return hashlib.sha256(f"{content}:{fmt}:{version}".encode()).hexdigest()
+
+    def request_export(self, dashboard, user, content='report', fmt='xlsx'):
+        """
+        Pede uma exportação do dashboard
+
+        Returns:
+            (job, created): um job existente com a mesma chave (concluído com
+            o arquivo ainda em storage, ou em andamento) é reaproveitado sem
+            contar no limite do plano; senão um job novo é criado e
+            enfileirado depois do commit.
+        """
+        if fmt not in self.FORMATS.get(content, ()):
+            raise ValueError(f'Formato {fmt} indisponível para exportação de {content}')
+
+        key = self.artifact_key(dashboard, content, fmt)
+        existing = (
+            ExportJob.objects
+            .filter(dashboard=dashboard, artifact_key=key, status__in=['pending', 'running', 'done'])
+            .order_by('-created_at')
+            .first()
+        )
+        if existing and (existing.status != 'done' or self.storage.exists(existing.artifact_path)):
+            return existing, False
+
+        organization = user.organization
+        if self.exporter.get_export_limit(organization.plan) <= 0:
+            raise ExportLimitReached('Exportação indisponível no seu plano')
+        if not organization.claim_export():
+            raise ExportLimitReached('Limite mensal de exportações atingido')
+
+        job = ExportJob.objects.create(
+            organization=organization,
+            dashboard=dashboard,
+            created_by=user,
+            content=content,
+            format=fmt,
+            artifact_key=key,
+        )
+
+        from .tasks import render_export_job
+        transaction.on_commit(lambda: render_export_job.delay(job.id))
+        return job, True
+
+    def render(self, job):
+        """Gera o arquivo do job em storage (executado pela tarefa Celery)"""
+        ExportJob.objects.filter(pk=job.pk).update(status='running')
+
+        path = self.build_path(job)
+        if self.storage.exists(path):
+            self.storage.delete(path)
+
+        if job.content == 'report':
+            from .services import DashboardService
+
+            data = DashboardService().get_dashboard_data(job.dashboard)
+            if job.format == 'xlsx':
+                body = self.exporter.export_to_excel(data, job.dashboard.name)
+            else:
+                body = self.exporter.export_to_csv(data)
+            path = self.storage.save(path, ContentFile(body))
+        else:
+            # Linhas em lotes para um arquivo temporário: memória limitada
+            with tempfile.TemporaryFile() as fh:
+                for chunk in self.exporter.stream_rows(job.dashboard, job.format):
+                    fh.write(chunk)
+                fh.seek(0)
+                path = self.storage.save(path, File(fh))
+
+        job.status = 'done'
+        job.artifact_path = path
+        job.size = self.storage.size(path)
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'artifact_path', 'size', 'error', 'finished_at'])
+        self.expire_previous(job)
+        return job
+
+    def expire_previous(self, job):
+        """Remove os arquivos de versões antigas da mesma exportação do dashboard"""
+        previous = (
+            ExportJob.objects
+            .filter(dashboard=job.dashboard, content=job.content, format=job.format, status='done')
+            .exclude(artifact_key=job.artifact_key)
+        )
+        for old in previous:
+            if old.artifact_path and self.storage.exists(old.artifact_path):
+                self.storage.delete(old.artifact_path)
+        previous.update(status='expired')
+
+    def build_path(self, job):
+        """Artefatos agrupados por organização e dashboard"""
+        return f"org_{job.organization_id}/dashboard_{job.dashboard_id}/{job.artifact_key}.{job.format}"
+
+    def open(self, job):
+        return self.storage.open(job.artifact_path, 'rb')
+
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: str, size: int):
+    """
+    Intervalo (start, end) inclusivo de um header Range de um único intervalo
+
+    Returns None quando não há header (ou não é um intervalo de bytes
+    simples: o arquivo inteiro é enviado). Intervalos fora do arquivo
+    levantam ValueError (resposta 416).
+    """
+    match = _RANGE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Sufixo: últimos N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Intervalo vazio')
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Intervalo fora do arquivo')
+    return start, end
+
+
+def iter_file(fh, start: int, length: int, chunk_size=256 * 1024):
+    """Bytes [start, start + length) do arquivo, em blocos"""
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
@@ -1,5 +1,6 @@
 """
 Sistema de Exportação de Dashboards (PDF, Excel, CSV)
+Inclui a exportação em streaming das linhas da fonte (CSV, XLSX, Parquet)
 """
 import pandas as pd
 from typing import Dict, Any
@@ -79,6 +80,28 @@ class DashboardExporter:
         
         return output.getvalue().encode('utf-8')
     
+    def stream_rows(self, dashboard, fmt: str, params=None):
+        """
+        Exporta as linhas da fonte do dashboard em streaming.
+        
+        O arquivo é gerado em lotes direto do snapshot colunar (memória
+        limitada a um lote). params aceita columns, sort e filter[...],
+        como /datasources/{id}/data/.
+        
+        Returns:
+            gerador com os bytes do arquivo
+        """
+        from apps.datasources.services import DataSourceService
+        from apps.datasources.services.data_pages import DataQuery
+        
+        datasource = dashboard.datasources.first()
+        if datasource is None:
+            raise ValueError('Dashboard sem fonte de dados')
+        
+        pager = DataSourceService().get_pager(datasource)
+        query = DataQuery.from_params(params or {}, pager.table.column_names)
+        return pager.stream(fmt, query)
+    
     def can_export_without_watermark(self, plan: str) -> bool:
         """Verifica se o plano permite exportar sem marca d'água"""
         return plan in ['starter', 'pro', 'enterprise']
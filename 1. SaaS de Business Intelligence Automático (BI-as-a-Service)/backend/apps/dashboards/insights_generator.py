@@ -1,37 +1,37 @@
 """
 Gerador Automático de Insights e Análises Inteligentes
 """
-import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
 
+from .analysis_context import AnalysisContext
+
 
 class InsightsGenerator:
     """Gera insights automáticos a partir dos dados"""
     
-    def generate_insights(self, df: pd.DataFrame, col_types: Dict, kpis: Dict) -> List[Dict[str, str]]:
+    def generate_insights(self, context: AnalysisContext, kpis: Dict) -> List[Dict[str, str]]:
         """
         Gera insights automáticos baseados nos dados.
         Retorna lista de insights com tipo, mensagem e ícone.
+        
+        context: dados do período e agregações compartilhadas (ver AnalysisContext)
         """
         insights = []
+        col_types = context.col_types
         
         # 1. INSIGHTS DE CRESCIMENTO
         if col_types.get('date') and col_types.get('numeric'):
-            date_col = col_types['date'][0]
-            value_col = col_types['numeric'][0]
+            value_col = context.value_col
             
             try:
-                df_copy = df.copy()
-                df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-                df_copy = df_copy.dropna(subset=[date_col])
-                df_copy = df_copy.sort_values(date_col)
+                # Metades da série em ordem cronológica
+                first, second = context.halves(value_col)
                 
-                if len(df_copy) >= 2:
+                if len(first) + len(second) >= 2:
                     # Comparar períodos
-                    mid_point = len(df_copy) // 2
-                    first_half = df_copy.iloc[:mid_point][value_col].sum()
-                    second_half = df_copy.iloc[mid_point:][value_col].sum()
+                    first_half = np.nansum(first)
+                    second_half = np.nansum(second)
                     
                     if first_half > 0:
                         growth = ((second_half - first_half) / first_half) * 100
@@ -50,7 +50,7 @@ class InsightsGenerator:
         # 2. INSIGHTS DE TOP PERFORMERS
         # Filtrar colunas que NÃO são clientes/pessoas
         if col_types.get('categorical') and col_types.get('numeric'):
-            value_col = col_types['numeric'][0]
+            value_col = context.value_col
             
             # Encontrar coluna categórica que não seja cliente
             valid_cat_col = None
@@ -63,9 +63,10 @@ class InsightsGenerator:
             
             if valid_cat_col:
                 try:
-                    top_item = df.groupby(valid_cat_col)[value_col].sum().idxmax()
-                    top_value = df.groupby(valid_cat_col)[value_col].sum().max()
-                    total = df[value_col].sum()
+                    sums = context.summary_by(valid_cat_col, value_col)['sum']
+                    total = context.total(value_col)
+                    top_item = sums.idxmax()
+                    top_value = sums.max()
                     percentage = (top_value / total * 100) if total > 0 else 0
                     
                     if percentage >= 20:  # Item representa 20%+ do total
@@ -78,7 +79,7 @@ class InsightsGenerator:
                     pass
         
         # 3. INSIGHTS DE VOLUME
-        total_records = len(df)
+        total_records = context.row_count
         if total_records >= 100:
             insights.append({
                 'type': 'info',
@@ -99,8 +100,7 @@ class InsightsGenerator:
             
             # Calcular desvio padrão do ticket
             if col_types.get('numeric'):
-                value_col = col_types['numeric'][0]
-                std_dev = df[value_col].std()
+                std_dev = context.std(context.value_col)
                 
                 if std_dev / avg_ticket > 0.5:  # Alta variação
                     insights.append({
@@ -114,7 +114,7 @@ class InsightsGenerator:
             # Verificar se há concentração em categorias
             for cat_col in col_types['categorical'][:2]:
                 try:
-                    unique_ratio = df[cat_col].nunique() / len(df)
+                    unique_ratio = context.nunique(cat_col) / context.row_count
                     if unique_ratio < 0.1:  # Menos de 10% de valores únicos
                         insights.append({
                             'type': 'tip',
@@ -128,17 +128,19 @@ class InsightsGenerator:
         # Limitar a 5 insights mais relevantes
         return insights[:5]
     
-    def detect_data_problems(self, df: pd.DataFrame, col_types: Dict) -> List[Dict[str, Any]]:
+    def detect_data_problems(self, context: AnalysisContext) -> List[Dict[str, Any]]:
         """
         Detecta problemas de qualidade nos dados.
         Retorna lista de problemas encontrados.
         """
         problems = []
+        df = context.df
+        col_types = context.col_types
         
         # 1. VALORES NEGATIVOS EM COLUNAS NUMÉRICAS
         for col in col_types.get('numeric', []):
             try:
-                negative_count = (df[col] < 0).sum()
+                negative_count = int((context.values(col) < 0).sum())
                 if negative_count > 0:
                     problems.append({
                         'type': 'warning',
@@ -152,8 +154,7 @@ class InsightsGenerator:
                 pass
         
         # 2. VALORES NULOS/VAZIOS
-        for col in df.columns:
-            null_count = df[col].isnull().sum()
+        for col, null_count in context.null_counts().items():
             if null_count > 0:
                 percentage = (null_count / len(df)) * 100
                 if percentage >= 10:  # 10% ou mais de dados faltantes
@@ -167,7 +168,7 @@ class InsightsGenerator:
                     })
         
         # 3. VALORES DUPLICADOS
-        duplicate_count = df.duplicated().sum()
+        duplicate_count = context.duplicate_count()
         if duplicate_count > 0:
             problems.append({
                 'type': 'info',
@@ -181,15 +182,16 @@ class InsightsGenerator:
         # 4. OUTLIERS EXTREMOS
         for col in col_types.get('numeric', []):
             try:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
+                Q1 = context.quantile(col, 0.25)
+                Q3 = context.quantile(col, 0.75)
                 IQR = Q3 - Q1
                 
                 # Definir outliers extremos (3x IQR)
                 lower_bound = Q1 - 3 * IQR
                 upper_bound = Q3 + 3 * IQR
                 
-                outliers = ((df[col] < lower_bound) | (df[col] > upper_bound)).sum()
+                values = context.values(col)
+                outliers = int(((values < lower_bound) | (values > upper_bound)).sum())
                 
                 if outliers > 0 and outliers < len(df) * 0.1:  # Menos de 10% são outliers
                     problems.append({
@@ -231,11 +233,13 @@ class InsightsGenerator:
         
         return problems[:8]
     
-    def suggest_additional_charts(self, df: pd.DataFrame, col_types: Dict, existing_charts: List[str]) -> List[Dict[str, Any]]:
+    def suggest_additional_charts(self, context: AnalysisContext, existing_charts: List[str]) -> List[Dict[str, Any]]:
         """
         Sugere gráficos adicionais RICOS baseado nas colunas disponíveis.
         """
         suggestions = []
+        df = context.df
+        col_types = context.col_types
         
         # 1. SUGERIR GRÁFICO DE DISTRIBUIÇÃO REAL
         if col_types.get('numeric') and 'value_distribution' not in existing_charts:
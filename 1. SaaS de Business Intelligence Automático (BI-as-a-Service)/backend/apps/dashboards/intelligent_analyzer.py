@@ -8,6 +8,8 @@ import numpy as np
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from apps.datasources.services.type_inference import DATE, IDENTIFIER, TypeInferenceEngine
+
 
 class IntelligentDataAnalyzer:
     """
@@ -34,8 +36,10 @@ class IntelligentDataAnalyzer:
         }
         
         # 1. ANÁLISE POR COLUNA (detectar tipo semântico, não só dtype)
+        # Tipos de todas as colunas inferidos de uma vez, sobre uma amostra
+        schema = TypeInferenceEngine().infer(df)
         for col in df.columns:
-            analysis['columns'][col] = self._analyze_column(df, col)
+            analysis['columns'][col] = self._analyze_column(df, col, schema[col])
         
         # 2. DETECTAR RELACIONAMENTOS ENTRE COLUNAS
         analysis['relationships'] = self._detect_relationships(df, analysis['columns'])
@@ -54,20 +58,24 @@ class IntelligentDataAnalyzer:
         
         return analysis
     
-    def _analyze_column(self, df: pd.DataFrame, col: str) -> Dict:
+    def _analyze_column(self, df: pd.DataFrame, col: str, column_type: Dict) -> Dict:
         """
         Análise PROFUNDA de uma coluna.
         Não só dtype, mas tipo SEMÂNTICO baseado no conteúdo.
+        
+        column_type: entrada da coluna no TypedSchema (tipo + papel)
         """
         series = df[col]
+        null_count = int(series.isnull().sum())
+        unique_count = int(series.nunique())
         
         analysis = {
             'name': col,
             'dtype': str(series.dtype),
-            'null_count': int(series.isnull().sum()),
-            'null_percentage': float(series.isnull().sum() / len(series) * 100),
-            'unique_count': int(series.nunique()),
-            'cardinality': 'high' if series.nunique() > len(series) * 0.8 else 'medium' if series.nunique() > 20 else 'low',
+            'null_count': null_count,
+            'null_percentage': float(null_count / len(series) * 100),
+            'unique_count': unique_count,
+            'cardinality': 'high' if unique_count > len(series) * 0.8 else 'medium' if unique_count > 20 else 'low',
             'sample_values': series.dropna().head(5).tolist(),
             'semantic_type': None,  # Será inferido
             'role': None,  # measure, dimension, identifier, date
@@ -77,16 +85,16 @@ class IntelligentDataAnalyzer:
         
         # INFERIR TIPO SEMÂNTICO através de ANÁLISE, não nome
         
-        # É IDENTIFICADOR? (alta cardinalidade, valores únicos)
-        if analysis['unique_count'] == len(series):
+        # É IDENTIFICADOR? (valores únicos com cara de código/id)
+        if column_type['type'] == IDENTIFIER:
             analysis['semantic_type'] = 'identifier'
             analysis['role'] = 'identifier'
             analysis['is_key'] = True
             analysis['confidence'] = 0.95
             return analysis
         
-        # É DATA/TEMPO? (testar parsing)
-        if self._is_temporal(series):
+        # É DATA/TEMPO? (formato detectado na amostra)
+        if column_type['type'] == DATE:
             analysis['semantic_type'] = 'temporal'
             analysis['role'] = 'date'
             analysis['confidence'] = 0.9
@@ -117,7 +125,7 @@ class IntelligentDataAnalyzer:
             return analysis
         
         # É CATEGORIA? (baixa cardinalidade, texto)
-        if self._is_category(series):
+        if self._is_category(series, unique_count):
             analysis['semantic_type'] = 'category'
             analysis['role'] = 'dimension'
             analysis['confidence'] = 0.75
@@ -145,20 +153,6 @@ class IntelligentDataAnalyzer:
         
         return analysis
     
-    def _is_temporal(self, series: pd.Series) -> bool:
-        """Detecta se é coluna temporal através de ANÁLISE, não nome"""
-        if pd.api.types.is_datetime64_any_dtype(series):
-            return True
-        
-        # Tentar converter para data
-        try:
-            sample = series.dropna().head(10)
-            parsed = pd.to_datetime(sample, errors='coerce')
-            valid_dates = parsed.notna().sum()
-            return valid_dates / len(sample) > 0.7  # 70%+ são datas válidas
-        except:
-            return False
-    
     def _is_monetary(self, series: pd.Series) -> bool:
         """Detecta valores monetários através de PADRÕES estatísticos"""
         if not pd.api.types.is_numeric_dtype(series):
@@ -226,9 +220,9 @@ class IntelligentDataAnalyzer:
         
         return False
     
-    def _is_category(self, series: pd.Series) -> bool:
+    def _is_category(self, series: pd.Series, unique_count: int) -> bool:
         """Detecta categorias (baixa cardinalidade)"""
-        unique_ratio = series.nunique() / len(series)
+        unique_ratio = unique_count / len(series)
         return unique_ratio < 0.05  # Menos de 5% de valores únicos
     
     def _is_person_name(self, series: pd.Series) -> bool:
@@ -4,10 +4,11 @@ from django.utils import timezone
 from .models import Dashboard
 from apps.datasources.models import DataSource
 from .ai_processor import DataProcessor
-from apps.datasources.services import DataSourceService
+from apps.datasources.services import DataSourceService, serialization
 from .insights_generator import InsightsGenerator
 from .predictions import PredictionEngine
 from .alerts import AlertEngine
+from .analysis_context import AnalysisContext
 
 
 class DashboardService:
@@ -198,16 +199,13 @@ class DashboardService:
             try:
                 payment_col = payment_cols[0]
                 value_col = col_types['numeric'][0]
-                payment_analysis = df.groupby(payment_col)[value_col].agg(['sum', 'count', 'mean']).reset_index()
-                additional['payment_analysis'] = [
-                    {
-                        'method': str(row[payment_col]),
-                        'total': float(row['sum']),
-                        'count': int(row['count']),
-                        'avg_ticket': float(row['mean'])
-                    }
-                    for _, row in payment_analysis.iterrows()
-                ]
+                payment_analysis = df.groupby(payment_col)[value_col].agg(['sum', 'count', 'mean'])
+                additional['payment_analysis'] = serialization.records({
+                    'method': serialization.labels(payment_analysis.index),
+                    'total': serialization.floats(payment_analysis['sum']),
+                    'count': payment_analysis['count'].to_numpy(dtype=np.int64),
+                    'avg_ticket': serialization.floats(payment_analysis['mean']),
+                })
             except:
                 pass
         
@@ -217,14 +215,11 @@ class DashboardService:
             try:
                 region_col = region_cols[0]
                 value_col = col_types['numeric'][0]
-                region_sales = df.groupby(region_col)[value_col].sum().reset_index()
-                additional['region_sales'] = [
-                    {
-                        'region': str(row[region_col]),
-                        'sales': float(row[value_col])
-                    }
-                    for _, row in region_sales.iterrows()
-                ]
+                region_sales = df.groupby(region_col)[value_col].sum()
+                additional['region_sales'] = serialization.records({
+                    'region': serialization.labels(region_sales.index),
+                    'sales': serialization.floats(region_sales),
+                })
             except:
                 pass
         
@@ -240,15 +235,13 @@ class DashboardService:
                 
                 df_copy['week'] = df_copy[date_col].dt.isocalendar().week
                 df_copy['year'] = df_copy[date_col].dt.year
-                weekly_sales = df_copy.groupby(['year', 'week'])[value_col].sum().reset_index()
+                weekly_sales = df_copy.groupby(['year', 'week'])[value_col].sum()
                 
-                additional['weekly_trend'] = [
-                    {
-                        'week': f"Sem {int(row['week'])}",
-                        'value': float(row[value_col])
-                    }
-                    for _, row in weekly_sales.iterrows()
-                ]
+                weeks = serialization.labels(weekly_sales.index.get_level_values('week').to_numpy(dtype=np.int64))
+                additional['weekly_trend'] = serialization.records({
+                    'week': np.char.add('Sem ', weeks),
+                    'value': serialization.floats(weekly_sales),
+                })
             except:
                 pass
         
@@ -386,13 +379,12 @@ class DashboardService:
                         .sort_values(['year', 'month_num'])
                     )
 
-                    sales_evolution = [
-                        {
-                            'month': f"{month_labels_pt.get(int(row['month_num']), str(int(row['month_num'])))} {int(row['year'])}",
-                            'value': float(row[value_col])
-                        }
-                        for _, row in sales_by_month.iterrows()
-                    ]
+                    months = sales_by_month['month_num'].map(month_labels_pt).astype(str)
+                    years = sales_by_month['year'].astype(str)
+                    sales_evolution = serialization.records({
+                        'month': months + ' ' + years,
+                        'value': serialization.floats(sales_by_month[value_col]),
+                    })
             
             # GRÁFICO: Top produtos
             top_products_data = []
@@ -438,17 +430,18 @@ class DashboardService:
                 'total_quantity': total_quantity,
             }
             
-            insights = insights_gen.generate_insights(df, col_types, kpis_dict)
-            problems = insights_gen.detect_data_problems(df, col_types)
-            suggestions = insights_gen.suggest_additional_charts(df, col_types, ['sales_evolution', 'top_products'])
+            context = AnalysisContext(df, col_types)
+            insights = insights_gen.generate_insights(context, kpis_dict)
+            problems = insights_gen.detect_data_problems(context)
+            suggestions = insights_gen.suggest_additional_charts(context, ['sales_evolution', 'top_products'])
             
             # PREVISÕES
             prediction_engine = PredictionEngine()
-            predictions = prediction_engine.generate_predictions(df, col_types, plan='free')
+            predictions = prediction_engine.generate_predictions(context, plan='free')
             
             # ALERTAS
             alert_engine = AlertEngine()
-            alerts = alert_engine.generate_alerts(df, col_types, kpis_dict, plan='free')
+            alerts = alert_engine.generate_alerts(context, kpis_dict, plan='free')
             
             return {
                 'kpis': {
@@ -531,12 +524,12 @@ class DashboardService:
                 df_copy['month'] = df_copy[date_col].dt.to_period('M').astype(str)
                 
                 monthly = df_copy.groupby(['month', type_col])[value_col].sum().unstack(fill_value=0)
-                for month in monthly.index:
-                    revenue_by_month.append({
-                        'month': month,
-                        'receitas': float(monthly.loc[month].get('Receita', 0)),
-                        'despesas': float(monthly.loc[month].get('Despesa', 0)),
-                    })
+                monthly = monthly.reindex(columns=['Receita', 'Despesa'], fill_value=0)
+                revenue_by_month = serialization.records({
+                    'month': monthly.index,
+                    'receitas': serialization.floats(monthly['Receita']),
+                    'despesas': serialization.floats(monthly['Despesa']),
+                })
             
             # Gráfico: Despesas por categoria
             expenses_by_category = []
@@ -548,10 +541,10 @@ class DashboardService:
             
             if category_col and type_col:
                 despesas_cat = despesas_df.groupby(category_col)[value_col].sum().nlargest(10)
-                expenses_by_category = [
-                    {'name': str(name), 'value': float(value)}
-                    for name, value in despesas_cat.items()
-                ]
+                expenses_by_category = serialization.records({
+                    'name': serialization.labels(despesas_cat.index),
+                    'value': serialization.floats(despesas_cat),
+                })
             
             # Gráfico: Receitas por mês (linha)
             revenue_evolution = []
@@ -561,10 +554,10 @@ class DashboardService:
                 receitas_monthly = receitas_monthly.dropna(subset=[date_col])
                 receitas_monthly['month'] = receitas_monthly[date_col].dt.to_period('M').astype(str)
                 monthly_revenue = receitas_monthly.groupby('month')[value_col].sum()
-                revenue_evolution = [
-                    {'month': str(month), 'value': float(value)}
-                    for month, value in monthly_revenue.items()
-                ]
+                revenue_evolution = serialization.records({
+                    'month': serialization.labels(monthly_revenue.index),
+                    'value': serialization.floats(monthly_revenue),
+                })
             
             # Análise de formas de pagamento
             payment_analysis = []
@@ -575,15 +568,12 @@ class DashboardService:
                     break
             
             if payment_col:
-                payment_stats = df.groupby(payment_col)[value_col].agg(['sum', 'count']).reset_index()
-                payment_analysis = [
-                    {
-                        'method': str(row[payment_col]),
-                        'total': float(row['sum']),
-                        'count': int(row['count'])
-                    }
-                    for _, row in payment_stats.iterrows()
-                ]
+                payment_stats = df.groupby(payment_col)[value_col].agg(['sum', 'count'])
+                payment_analysis = serialization.records({
+                    'method': serialization.labels(payment_stats.index),
+                    'total': serialization.floats(payment_stats['sum']),
+                    'count': payment_stats['count'].to_numpy(dtype=np.int64),
+                })
             
             # Top despesas
             top_expenses = []
@@ -595,10 +585,10 @@ class DashboardService:
             
             if desc_col and type_col:
                 top_desp = despesas_df.nlargest(5, value_col)[[desc_col, value_col]]
-                top_expenses = [
-                    {'description': str(row[desc_col]), 'value': float(row[value_col])}
-                    for _, row in top_desp.iterrows()
-                ]
+                top_expenses = serialization.records({
+                    'description': serialization.labels(top_desp[desc_col]),
+                    'value': serialization.floats(top_desp[value_col]),
+                })
             
             return {
                 'kpis': {
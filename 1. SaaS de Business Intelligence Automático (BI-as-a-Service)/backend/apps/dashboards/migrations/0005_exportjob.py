@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboards', '0004_dashboard_share_preview_fields'),
+        ('organizations', '0003_organization_export_usage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.CharField(choices=[('report', 'Relatório (KPIs, gráficos, insights)'), ('rows', 'Linhas da fonte de dados')], default='report', max_length=20, verbose_name='conteúdo')),
+                ('format', models.CharField(choices=[('xlsx', 'Excel'), ('csv', 'CSV'), ('parquet', 'Parquet')], default='xlsx', max_length=10, verbose_name='formato')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em execução'), ('done', 'Concluída'), ('failed', 'Falhou'), ('expired', 'Expirada')], default='pending', max_length=20, verbose_name='status')),
+                ('artifact_key', models.CharField(db_index=True, max_length=64, verbose_name='chave do artefato')),
+                ('artifact_path', models.CharField(blank=True, max_length=500, verbose_name='arquivo')),
+                ('size', models.BigIntegerField(default=0, verbose_name='tamanho (bytes)')),
+                ('error', models.TextField(blank=True, verbose_name='erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='criado em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='concluído em')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='criado por')),
+                ('dashboard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='dashboards.dashboard', verbose_name='dashboard')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='organizations.organization', verbose_name='organização')),
+            ],
+            options={
+                'verbose_name': 'exportação',
+                'verbose_name_plural': 'exportações',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
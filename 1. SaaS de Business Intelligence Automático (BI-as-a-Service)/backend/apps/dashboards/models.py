@@ -68,3 +68,68 @@ class Dashboard(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class ExportJob(models.Model):
+    """Exportação de dashboard gerada em background e guardada em storage."""
+    
+    CONTENT_CHOICES = [
+        ('report', 'Relatório (KPIs, gráficos, insights)'),
+        ('rows', 'Linhas da fonte de dados'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em execução'),
+        ('done', 'Concluída'),
+        ('failed', 'Falhou'),
+        ('expired', 'Expirada'),
+    ]
+    
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name=_('organização')
+    )
+    dashboard = models.ForeignKey(
+        Dashboard,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name=_('dashboard')
+    )
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='export_jobs',
+        verbose_name=_('criado por')
+    )
+    
+    content = models.CharField(_('conteúdo'), max_length=20, choices=CONTENT_CHOICES, default='report')
+    format = models.CharField(_('formato'), max_length=10, choices=FORMAT_CHOICES, default='xlsx')
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Dashboard + hash dos snapshots + formato: exportações repetidas de um
+    # dashboard sem mudanças reaproveitam o mesmo artefato
+    artifact_key = models.CharField(_('chave do artefato'), max_length=64, db_index=True)
+    artifact_path = models.CharField(_('arquivo'), max_length=500, blank=True)
+    size = models.BigIntegerField(_('tamanho (bytes)'), default=0)
+    error = models.TextField(_('erro'), blank=True)
+    
+    created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('concluído em'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('exportação')
+        verbose_name_plural = _('exportações')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.dashboard} ({self.content}.{self.format})"
@@ -6,17 +6,19 @@ import numpy as np
 from typing import Dict, List, Any
 from datetime import datetime, timedelta
 
+from apps.datasources.services import serialization
+from .analysis_context import AnalysisContext
+
 
 class PredictionEngine:
     """Engine de previsões usando ML"""
     
-    def generate_predictions(self, df: pd.DataFrame, col_types: Dict, plan: str = 'free') -> Dict[str, Any]:
+    def generate_predictions(self, context: AnalysisContext, plan: str = 'free') -> Dict[str, Any]:
         """
         Gera previsões baseadas nos dados históricos.
         
         Args:
-            df: DataFrame com os dados
-            col_types: Tipos de colunas detectados
+            context: Dados do período e tipos de colunas (ver AnalysisContext)
             plan: Plano do usuário ('free', 'starter', 'pro', 'enterprise')
         
         Returns:
@@ -24,52 +26,50 @@ class PredictionEngine:
         """
         predictions = {}
         
-        if not col_types.get('date') or not col_types.get('numeric'):
+        if not context.col_types.get('date') or not context.col_types.get('numeric'):
             return predictions
         
-        date_col = col_types['date'][0]
-        value_col = col_types['numeric'][0]
-        
         try:
-            # Preparar dados
-            df_copy = df.copy()
-            df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-            df_copy = df_copy.dropna(subset=[date_col, value_col])
-            df_copy = df_copy.sort_values(date_col)
+            # Série em ordem cronológica, sem valores faltantes (arrays do contexto, sem copiar o df)
+            values = context.chronological(context.value_col)
+            valid = ~np.isnan(values)
+            values = values[valid]
+            days = context.days[context.order][valid]
             
-            if len(df_copy) < 3:  # Precisa de pelo menos 3 pontos
+            if len(values) < 3:  # Precisa de pelo menos 3 pontos
                 return predictions
             
             # Plano FREE: Regressão Linear Simples
             if plan == 'free':
-                predictions = self._predict_linear(df_copy, date_col, value_col)
+                predictions = self._predict_linear(days, values)
             
             # Planos PAGOS: Modelos avançados (Prophet, ARIMA)
             else:
                 try:
                     # Tentar Prophet primeiro (melhor qualidade)
-                    predictions = self._predict_prophet(df_copy, date_col, value_col)
+                    timestamps = context.df[context.date_col].to_numpy()[context.order][valid]
+                    predictions = self._predict_prophet(timestamps, days, values)
                 except:
                     # Fallback para linear se Prophet não estiver disponível
-                    predictions = self._predict_linear(df_copy, date_col, value_col)
+                    predictions = self._predict_linear(days, values)
             
             # Adicionar confiança e recomendações
-            predictions['confidence'] = self._calculate_confidence(df_copy, value_col)
-            predictions['recommendations'] = self._generate_recommendations(predictions, df_copy, value_col)
+            predictions['confidence'] = self._calculate_confidence(values)
+            predictions['recommendations'] = self._generate_recommendations(predictions, values)
             
         except Exception as e:
             predictions['error'] = str(e)
         
         return predictions
     
-    def _predict_linear(self, df: pd.DataFrame, date_col: str, value_col: str) -> Dict:
+    def _predict_linear(self, days: np.ndarray, values: np.ndarray) -> Dict:
         """Previsão usando regressão linear simples (FREE)"""
-        # Converter datas para números (dias desde o início)
-        df['days'] = (df[date_col] - df[date_col].min()).dt.days
+        # Datas como número de dias desde o início
+        days = days.astype(np.int64)
         
         # Regressão linear simples
-        X = df['days'].values
-        y = df[value_col].values
+        X = days - days.min()
+        y = values
         
         # Calcular coeficientes manualmente (sem sklearn)
         n = len(X)
@@ -102,26 +102,23 @@ class PredictionEngine:
             'next_month_prediction': float(next_month_prediction),
             'trend_percentage': float(trend_pct),
             'trend_direction': 'up' if m > 0 else 'down',
-            'daily_predictions': [
-                {
-                    'day': int(i),
-                    'value': float(future_values[i])
-                }
-                for i in range(min(7, len(future_values)))  # Próximos 7 dias
-            ],
+            'daily_predictions': serialization.records({  # Próximos 7 dias
+                'day': np.arange(min(7, len(future_values))),
+                'value': future_values[:7],
+            }),
             'min_predicted': float(future_values.min()),
             'max_predicted': float(future_values.max()),
         }
     
-    def _predict_prophet(self, df: pd.DataFrame, date_col: str, value_col: str) -> Dict:
+    def _predict_prophet(self, timestamps: np.ndarray, days: np.ndarray, values: np.ndarray) -> Dict:
         """Previsão usando Prophet (PLANOS PAGOS)"""
         try:
             from prophet import Prophet
             
             # Preparar dados no formato do Prophet
             prophet_df = pd.DataFrame({
-                'ds': df[date_col],
-                'y': df[value_col]
+                'ds': timestamps,
+                'y': values
             })
             
             # Criar e treinar modelo
@@ -137,12 +134,13 @@ class PredictionEngine:
             forecast = model.predict(future)
             
             # Pegar apenas previsões futuras
-            future_forecast = forecast[forecast['ds'] > df[date_col].max()]
+            future_forecast = forecast[forecast['ds'] > timestamps.max()]
+            next_week = future_forecast.head(7)
             
             next_month_prediction = future_forecast['yhat'].mean()
             
             # Calcular tendência
-            current_avg = df[value_col].tail(7).mean()
+            current_avg = values[-7:].mean()
             trend_pct = ((next_month_prediction - current_avg) / current_avg * 100) if current_avg != 0 else 0
             
             return {
@@ -150,26 +148,24 @@ class PredictionEngine:
                 'next_month_prediction': float(next_month_prediction),
                 'trend_percentage': float(trend_pct),
                 'trend_direction': 'up' if trend_pct > 0 else 'down',
-                'daily_predictions': [
-                    {
-                        'day': i + 1,
-                        'value': float(row['yhat']),
-                        'lower_bound': float(row['yhat_lower']),
-                        'upper_bound': float(row['yhat_upper'])
-                    }
-                    for i, (_, row) in enumerate(future_forecast.head(7).iterrows())
-                ],
+                'daily_predictions': serialization.records({
+                    'day': np.arange(1, len(next_week) + 1),
+                    'value': serialization.floats(next_week['yhat']),
+                    'lower_bound': serialization.floats(next_week['yhat_lower']),
+                    'upper_bound': serialization.floats(next_week['yhat_upper']),
+                }),
                 'min_predicted': float(future_forecast['yhat_lower'].min()),
                 'max_predicted': float(future_forecast['yhat_upper'].max()),
             }
         except ImportError:
             # Prophet não instalado, usar linear
-            return self._predict_linear(df, date_col, value_col)
+            return self._predict_linear(days, values)
     
-    def _calculate_confidence(self, df: pd.DataFrame, value_col: str) -> str:
+    def _calculate_confidence(self, values: np.ndarray) -> str:
         """Calcula nível de confiança da previsão"""
-        n = len(df)
-        cv = df[value_col].std() / df[value_col].mean() if df[value_col].mean() != 0 else 0
+        n = len(values)
+        mean = values.mean()
+        cv = values.std(ddof=1) / mean if mean != 0 else 0
         
         if n >= 30 and cv < 0.3:
             return 'high'
@@ -178,7 +174,7 @@ class PredictionEngine:
         else:
             return 'low'
     
-    def _generate_recommendations(self, predictions: Dict, df: pd.DataFrame, value_col: str) -> List[str]:
+    def _generate_recommendations(self, predictions: Dict, values: np.ndarray) -> List[str]:
         """Gera recomendações baseadas nas previsões"""
         recommendations = []
         
@@ -196,7 +192,7 @@ class PredictionEngine:
             recommendations.append("➡️ Tendência estável - mantenha o curso")
         
         # Análise de volatilidade
-        current_avg = df[value_col].mean()
+        current_avg = values.mean()
         predicted = predictions.get('next_month_prediction', current_avg)
         
         if predicted > current_avg * 1.2:
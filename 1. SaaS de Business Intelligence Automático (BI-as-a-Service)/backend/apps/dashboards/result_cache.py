@@ -0,0 +1,248 @@
+"""
+Cache de resultados processados de dashboards
+Materializa a saída de DashboardService.get_dashboard_data com semântica
+stale-while-revalidate
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from apps.datasources.services import serialization
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardResultCache:
+    """
+    Cache do resultado processado de um dashboard.
+
+    A chave combina o hash do snapshot de cada fonte com template,
+    column_mapping, período, compare, metas e widgets, mais uma geração por dashboard
+    que é incrementada na invalidação explícita (sync, troca de template,
+    set_goal).
+
+    Entradas mais velhas que FRESH_SECONDS continuam sendo servidas (stale)
+    enquanto UMA única recomputação roda em segundo plano.
+
+    Misses também são coalescidos (single-flight distribuído): a trava
+    `<chave>:lock` fica no cache compartilhado (Redis em produção, LocMem
+    em desenvolvimento/testes), só a primeira requisição calcula e as
+    concorrentes recebem o último resultado da mesma visão do dashboard
+    (antes do sync/invalidação) ou esperam o cálculo terminar. Contadores
+    em metrics().
+
+    O resultado é guardado já serializado (bytes JSON), pronto para ser
+    devolvido na resposta sem passar de novo pelo encoder.
+    """
+
+    KEY_PREFIX = 'dashboard_result'
+    # Tempo em que o resultado é considerado atual
+    FRESH_SECONDS = 15 * 60
+    # Tempo máximo que uma entrada pode ser servida como stale
+    STALE_SECONDS = 24 * 60 * 60
+    # Trava de recomputação (evita várias recomputações simultâneas)
+    LOCK_SECONDS = 5 * 60
+    # Espera máxima pelo cálculo de outra requisição antes de calcular junto
+    WAIT_SECONDS = 30
+    POLL_SECONDS = 0.05
+    METRICS_PREFIX = 'dashboard_result_metrics'
+    METRICS = ('hits', 'stale_hits', 'computed', 'coalesced', 'served_previous', 'wait_timeouts')
+
+    def get_or_compute(self, dashboard, options: Dict, compute: Callable[[], Dict], encoded=False):
+        """
+        Retorna o resultado do cache ou calcula com `compute`.
+
+        Hit fresco: retorna direto. Hit stale: retorna o valor antigo e agenda
+        uma recomputação em background. Miss: calcula de forma síncrona, uma
+        única vez entre as requisições concorrentes (ver _compute_once).
+
+        encoded: retorna os bytes JSON em vez do dict.
+        """
+        key = self.build_key(dashboard, options)
+        last_key = self.build_last_key(dashboard, options)
+        entry = cache.get(key)
+
+        if entry is not None and 'payload' in entry:
+            age = time.time() - entry['computed_at']
+            if age >= self.FRESH_SECONDS:
+                self._count('stale_hits')
+                self._revalidate(key, compute, last_key)
+            else:
+                self._count('hits')
+            payload = entry['payload']
+        else:
+            payload = self._compute_once(key, compute, last_key)
+        return payload if encoded else serialization.loads(payload)
+
+    def build_key(self, dashboard, options: Dict) -> str:
+        options = options or {}
+        config = dashboard.config or {}
+        fingerprint = {
+            'snapshots': self.snapshot_hashes(dashboard),
+            'template': dashboard.template,
+            'column_mapping': options.get('override_mapping') or config.get('column_mapping') or {},
+            'period': options.get('period') or '30d',
+            'compare': bool(options.get('compare')),
+            'goals': config.get('goals') or {},
+            'widgets': config.get('widgets') or [],
+            # Combinação das fontes (os hashes de todas já estão em snapshots)
+            'sources': config.get('sources') or None,
+            # Períodos são relativos a "hoje"
+            'day': timezone.localdate().isoformat(),
+        }
+        digest = hashlib.md5(
+            json.dumps(fingerprint, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{self.KEY_PREFIX}:{dashboard.id}:g{self._generation(dashboard.id)}:{digest}"
+
+    def build_last_key(self, dashboard, options: Dict) -> str:
+        """
+        Chave do último resultado de uma visão do dashboard (template,
+        mapeamento, combinação das fontes, widgets, metas, período,
+        compare), independente da versão dos dados
+
+        As metas entram na visão: depois de set_goal, um resultado anterior
+        traria o progresso das metas antigas.
+        """
+        options = options or {}
+        config = dashboard.config or {}
+        view = {
+            'template': dashboard.template,
+            'column_mapping': options.get('override_mapping') or config.get('column_mapping') or {},
+            'sources': config.get('sources') or None,
+            'widgets': config.get('widgets') or [],
+            'goals': config.get('goals') or {},
+            'period': options.get('period') or '30d',
+            'compare': bool(options.get('compare')),
+        }
+        digest = hashlib.md5(json.dumps(view, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.KEY_PREFIX}_last:{dashboard.id}:{digest}"
+
+    def metrics(self) -> Dict[str, int]:
+        """Contadores (compartilhados entre processos) de acertos e cálculos"""
+        keys = {f"{self.METRICS_PREFIX}:{name}": name for name in self.METRICS}
+        values = cache.get_many(list(keys))
+        return {name: int(values.get(key) or 0) for key, name in keys.items()}
+
+    def reset_metrics(self):
+        cache.delete_many([f"{self.METRICS_PREFIX}:{name}" for name in self.METRICS])
+
+    def _count(self, name):
+        key = f"{self.METRICS_PREFIX}:{name}"
+        try:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+        except ValueError:
+            # Expirou/foi removida entre o add e o incr
+            cache.set(key, 1, timeout=None)
+        except Exception as e:
+            logger.debug(f"Dashboard result metric {name} not recorded: {str(e)}")
+
+    def invalidate(self, dashboard_id: int):
+        """Descarta todos os resultados em cache do dashboard"""
+        generation_key = self._generation_key(dashboard_id)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            # Chave ainda não existe (ou expirou)
+            cache.set(generation_key, int(time.time()), timeout=None)
+
+    def invalidate_datasource(self, datasource):
+        """Descarta os resultados de todos os dashboards que usam a fonte"""
+        for dashboard_id in datasource.dashboards.values_list('id', flat=True):
+            self.invalidate(dashboard_id)
+
+    def snapshot_hashes(self, dashboard):
+        """Versão dos dados de cada fonte do dashboard"""
+        hashes = []
+        for datasource in dashboard.datasources.order_by('id'):
+            snapshot = (datasource.connection_config or {}).get('last_snapshot') or {}
+            # Fontes sem snapshot: usar a data de atualização como versão
+            hashes.append(snapshot.get('data_hash') or datasource.updated_at.isoformat())
+        return hashes
+
+    def _generation_key(self, dashboard_id):
+        return f"{self.KEY_PREFIX}_generation:{dashboard_id}"
+
+    def _generation(self, dashboard_id):
+        return cache.get(self._generation_key(dashboard_id), 0)
+
+    def _store(self, key: str, data: Dict, last_key: str = None) -> bytes:
+        payload = serialization.dumps(data)
+        entry = {'payload': payload, 'computed_at': time.time()}
+        if last_key:
+            cache.set_many({key: entry, last_key: entry}, timeout=self.STALE_SECONDS)
+        else:
+            cache.set(key, entry, timeout=self.STALE_SECONDS)
+        self._count('computed')
+        return payload
+
+    def _compute_once(self, key: str, compute: Callable[[], Dict], last_key: str = None) -> bytes:
+        """
+        Miss: só quem obtém a trava calcula
+
+        As demais requisições recebem o último resultado da visão, se
+        houver, ou esperam o resultado aparecer no cache. Se a trava for
+        liberada sem resultado (o cálculo falhou) a próxima requisição a
+        obtê-la calcula; depois de WAIT_SECONDS sem resultado a requisição
+        calcula por conta própria.
+        """
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.WAIT_SECONDS
+        previous_checked = False
+
+        while True:
+            if cache.add(lock_key, 1, timeout=self.LOCK_SECONDS):
+                try:
+                    # O líder anterior pode ter terminado entre o get e o add
+                    entry = cache.get(key)
+                    if entry is not None and 'payload' in entry:
+                        self._count('coalesced')
+                        return entry['payload']
+                    return self._store(key, compute(), last_key)
+                finally:
+                    cache.delete(lock_key)
+
+            if not previous_checked and last_key:
+                previous_checked = True
+                previous = cache.get(last_key)
+                if previous is not None and 'payload' in previous:
+                    self._count('served_previous')
+                    return previous['payload']
+
+            while cache.get(lock_key):
+                if time.monotonic() >= deadline:
+                    self._count('wait_timeouts')
+                    return self._store(key, compute(), last_key)
+                time.sleep(self.POLL_SECONDS)
+                entry = cache.get(key)
+                if entry is not None and 'payload' in entry:
+                    self._count('coalesced')
+                    return entry['payload']
+
+    def _revalidate(self, key: str, compute: Callable[[], Dict], last_key: str = None) -> Optional[threading.Thread]:
+        lock_key = f"{key}:lock"
+        if not cache.add(lock_key, 1, timeout=self.LOCK_SECONDS):
+            # Outra requisição já está recomputando
+            return None
+
+        def run():
+            try:
+                self._store(key, compute(), last_key)
+            except Exception as e:
+                logger.error(f"Error revalidating dashboard result {key}: {str(e)}")
+            finally:
+                cache.delete(lock_key)
+                # Conexões abertas nesta thread não são fechadas pelo Django
+                connections.close_all()
+
+        thread = threading.Thread(target=run, name='dashboard-result-revalidate', daemon=True)
+        thread.start()
+        return thread
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Dashboard
+from .models import Dashboard, ExportJob
+from .sources import parse_sources
 
 
 class DashboardSerializer(serializers.ModelSerializer):
@@ -44,4 +45,41 @@ class DashboardSerializer(serializers.ModelSerializer):
                             'hint': 'Conecte uma fonte em /datasources e crie o dashboard a partir dela.'
                         })
         
+        # Combinação de várias fontes: só fontes do próprio dashboard
+        config = data.get('config', self.instance.config if self.instance else None) or {}
+        if config.get('sources'):
+            if 'datasources' in data:
+                datasource_ids = [ds.id for ds in data['datasources']]
+            else:
+                datasource_ids = list(self.instance.datasources.values_list('id', flat=True)) if self.instance else []
+            try:
+                parse_sources(config['sources'], datasource_ids)
+            except ValueError as exc:
+                raise serializers.ValidationError({'config': {'sources': str(exc)}})
+        
         return data
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id',
+            'dashboard',
+            'content',
+            'format',
+            'status',
+            'size',
+            'error',
+            'download_url',
+            'created_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        return f"/api/dashboards/{obj.dashboard_id}/exports/{obj.id}/download/"
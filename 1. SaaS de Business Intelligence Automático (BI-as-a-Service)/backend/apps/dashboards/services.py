@@ -1,87 +1,84 @@
+import contextlib
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from django.conf import settings
 from django.utils import timezone
 from .models import Dashboard
 from apps.datasources.models import DataSource
 from .ai_processor import DataProcessor
 from apps.datasources.services import DataSourceService
+from apps.datasources.services import dates, serialization
+from apps.datasources.services.sql_engine import SQLEngine
+from apps.datasources.services.type_inference import TypeInferenceEngine
 from .insights_generator import InsightsGenerator
 from .predictions import PredictionEngine
 from .alerts import AlertEngine
+from .result_cache import DashboardResultCache
+from .aggregates import CubeAggregates, LazyRows, SQLAggregates, build_aggregates
+from .analysis_context import AnalysisContext
+from .comparison import WINDOWS, PeriodComparison, compare_series, compare_values
+from .sources import CombinedSource
+from .widgets import WidgetEngine, data_version
 
 
-class DashboardService:
-    """Serviço para processar dados de dashboards"""
-    
-    def _detect_column_types(self, df):
-        """
-        Detecta automaticamente os tipos de colunas no DataFrame.
-        Retorna um dicionário com as colunas categorizadas por tipo.
-        """
-        col_types = {
-            'numeric': [],
-            'categorical': [],
-            'date': [],
-            'boolean': []
-        }
-        
-        for col in df.columns:
-            # Detectar numéricos PRIMEIRO (antes de datetime)
-            if pd.api.types.is_numeric_dtype(df[col]):
-                col_types['numeric'].append(col)
-            # Depois detectar datas
-            elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                col_types['date'].append(col)
-            # Tentar converter para data se parecer uma data
-            else:
-                parse_kwargs = self._infer_datetime_parse_kwargs(df[col])
-                if parse_kwargs:
-                    df[col] = pd.to_datetime(
-                        df[col],
-                        errors='coerce',
-                        **parse_kwargs,
-                    )
-                    if df[col].notna().any():
-                        col_types['date'].append(col)
-                        continue
+# Rótulos dos meses no gráfico de evolução (índice = mês - 1)
+MONTH_LABELS_PT = np.array(['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
+# Colunas dos gráficos por forma de pagamento e por região (pelo nome)
+PAYMENT_WORDS = ['pagamento', 'payment']
+REGION_WORDS = ['regiao', 'region', 'estado', 'state']
 
-                # Se não for data, verificar se é boolean
-                unique_values = df[col].nunique(dropna=True)
-                if unique_values == 2:
-                    col_types['boolean'].append(col)
-                else:
-                    col_types['categorical'].append(col)
-        
-        return col_types
 
-    def _infer_datetime_parse_kwargs(self, series):
-        """Tenta identificar argumentos consistentes para converter a série em datetime sem emitir warnings."""
-        import re
+def _month_labels(monthly):
+    """Rótulos 'Mmm AAAA' de uma soma mensal (colunas year, month_num)"""
+    months = MONTH_LABELS_PT[monthly['month_num'].to_numpy(dtype=np.int64) - 1]
+    years = serialization.labels(monthly['year'].to_numpy(dtype=np.int64))
+    return np.char.add(np.char.add(months, ' '), years)
 
-        sample = series.dropna().astype(str).head(8)
-        if sample.empty:
-            return None
 
-        # Heurística: só tentar parse se a maioria dos itens parecem datas
-        date_like_pattern = re.compile(r"^(\d{4}[\-/]\d{1,2}[\-/]\d{1,2}|\d{1,2}[\-/]\d{1,2}[\-/]\d{2,4}|\d{8})$")
-        date_like_count = sum(1 for s in sample if date_like_pattern.match(s.strip()))
-        if date_like_count < max(2, len(sample) // 2):
-            return None
+def _week_labels(weekly):
+    """Rótulos 'Sem N' de uma soma semanal (coluna week)"""
+    return np.char.add('Sem ', serialization.labels(weekly['week'].to_numpy(dtype=np.int64)))
 
-        candidate_formats = [
-            '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
-            '%m/%d/%Y', '%m-%d-%Y', '%Y%m%d', '%d%m%Y'
-        ]
 
-        for fmt in candidate_formats:
-            try:
-                pd.to_datetime(sample, format=fmt, errors='raise')
-                return {'format': fmt}
-            except Exception:
-                continue
+def _column_named(columns, words):
+    """Primeira coluna cujo nome contém uma das palavras"""
+    return next((col for col in columns if any(word in col.lower() for word in words)), None)
 
-        # Sem formato confiável → não tentar inferências genéricas para evitar warnings
-        return None
+
+# Motores das agregações de KPIs e gráficos (settings.DASHBOARD_ENGINE)
+ENGINES = ('pandas', 'duckdb')
+
+
+class DashboardService:
+    """Serviço para processar dados de dashboards"""
+    
+    def __init__(self, engine=None):
+        """
+        engine: 'pandas' (cubo diário ou linhas em pandas) ou 'duckdb' (SQL
+        embutido sobre o snapshot); padrão settings.DASHBOARD_ENGINE
+        """
+        self.engine = engine or getattr(settings, 'DASHBOARD_ENGINE', 'pandas')
+        if self.engine not in ENGINES:
+            raise ValueError(f"Motor de dashboard inválido: {self.engine}; use {' ou '.join(ENGINES)}")
+    
+    def _detect_column_types(self, df, schema=None):
+        """
+        Colunas do DataFrame agrupadas por tipo (numeric, categorical, date,
+        boolean, identifier).
+        
+        schema: TypedSchema do snapshot; sem ele os tipos são inferidos de
+        uma amostra do DataFrame. Colunas de data ainda em texto (snapshots
+        antigos) são convertidas no próprio df com o formato detectado.
+        """
+        engine = TypeInferenceEngine()
+        schema = schema or engine.infer(df)
+        col_types = schema.column_types(df.columns)
+        for col in col_types['date']:
+            converted = engine.convert(df[col], schema[col])
+            if converted is not None:
+                df[col] = converted
+        return col_types
     
     def _detect_value_column(self, df, numeric_cols):
         """Detecta qual coluna numérica é o valor principal (preço, valor, etc)"""
@@ -119,49 +116,51 @@ class DashboardService:
         
         return None
     
-    def _calculate_advanced_kpis(self, df):
+    def _calculate_advanced_kpis(self, context):
         """Calcula KPIs avançados baseado nas colunas disponíveis"""
         kpis = {}
+        df = context.df
+        aggregates = context.aggregates
         
         try:
             # Detectar colunas financeiras
             if 'valor_bruto' in df.columns and 'valor_liquido' in df.columns:
-                valor_bruto = float(df['valor_bruto'].sum())
-                valor_liquido = float(df['valor_liquido'].sum())
+                valor_bruto = context.total('valor_bruto')
+                valor_liquido = context.total('valor_liquido')
                 kpis['valor_bruto_total'] = valor_bruto
                 kpis['valor_liquido_total'] = valor_liquido
                 kpis['margem_liquida'] = ((valor_liquido / valor_bruto) * 100) if valor_bruto > 0 else 0
             
             # Detectar descontos
             if 'desconto_valor' in df.columns:
-                kpis['total_descontos'] = float(df['desconto_valor'].sum())
+                kpis['total_descontos'] = context.total('desconto_valor')
                 if 'desconto_percentual' in df.columns:
-                    kpis['desconto_medio'] = float(df['desconto_percentual'].mean())
+                    kpis['desconto_medio'] = aggregates.mean('desconto_percentual')
             
             # Detectar taxas
             if 'taxa_maquina_valor' in df.columns:
-                kpis['custo_taxas'] = float(df['taxa_maquina_valor'].sum())
+                kpis['custo_taxas'] = context.total('taxa_maquina_valor')
             
             # Detectar juros
             if 'juros_valor' in df.columns:
-                kpis['receita_juros'] = float(df['juros_valor'].sum())
+                kpis['receita_juros'] = context.total('juros_valor')
             
             # Análise de pagamentos
             if 'status_pagamento' in df.columns:
-                aprovados = (df['status_pagamento'] == 'Aprovado').sum()
-                total = len(df)
+                aprovados = context.rows_by('status_pagamento').get('Aprovado', 0)
+                total = aggregates.row_count()
                 kpis['taxa_aprovacao'] = (aprovados / total * 100) if total > 0 else 0
             
             # Performance por vendedor
             if 'vendedor' in df.columns and 'valor_liquido' in df.columns:
-                vendedores = df.groupby('vendedor')['valor_liquido'].sum().sort_values(ascending=False)
+                vendedores = context.summary_by('vendedor', 'valor_liquido')['sum'].sort_values(ascending=False)
                 if len(vendedores) > 0:
                     kpis['melhor_vendedor'] = str(vendedores.index[0])
                     kpis['vendas_melhor_vendedor'] = float(vendedores.iloc[0])
             
             # Performance por região
             if 'regiao' in df.columns and 'valor_liquido' in df.columns:
-                regioes = df.groupby('regiao')['valor_liquido'].sum().sort_values(ascending=False)
+                regioes = context.summary_by('regiao', 'valor_liquido')['sum'].sort_values(ascending=False)
                 if len(regioes) > 0:
                     kpis['melhor_regiao'] = str(regioes.index[0])
                     kpis['vendas_melhor_regiao'] = float(regioes.iloc[0])
@@ -171,97 +170,92 @@ class DashboardService:
         
         return kpis
     
-    def _generate_additional_charts(self, df, col_types):
+    def _generate_additional_charts(self, context):
         """Gera gráficos adicionais RICOS"""
         additional = {}
+        df = context.df
+        col_types = context.col_types
+        value_col = context.value_col
         
         # 1. DISTRIBUIÇÃO REAL (Histogram)
         if col_types.get('numeric'):
-            value_col = col_types['numeric'][0]
             try:
-                hist, bins = np.histogram(df[value_col].dropna(), bins=10)
-                distribution_data = [
-                    {
-                        'range': f'R$ {int(bins[i])}-{int(bins[i+1])}',
-                        'count': int(hist[i]),
-                        'value': float((bins[i] + bins[i+1]) / 2)
-                    }
-                    for i in range(len(hist)) if hist[i] > 0
-                ]
-                additional['value_distribution'] = distribution_data
+                values = context.values(value_col)
+                hist, bins = np.histogram(values[~np.isnan(values)], bins=10)
+                filled = hist > 0
+                lower = serialization.labels(bins[:-1][filled].astype(np.int64))
+                upper = serialization.labels(bins[1:][filled].astype(np.int64))
+                additional['value_distribution'] = serialization.records({
+                    'range': np.char.add(np.char.add(np.char.add('R$ ', lower), '-'), upper),
+                    'count': hist[filled],
+                    'value': ((bins[:-1] + bins[1:]) / 2)[filled],
+                })
             except:
                 pass
         
         # 2. ANÁLISE POR FORMA DE PAGAMENTO
-        payment_cols = [col for col in df.columns if any(word in col.lower() for word in ['pagamento', 'payment'])]
-        if payment_cols and col_types.get('numeric'):
+        payment_col = _column_named(df.columns, PAYMENT_WORDS)
+        if payment_col and col_types.get('numeric'):
             try:
-                payment_col = payment_cols[0]
-                value_col = col_types['numeric'][0]
-                payment_analysis = df.groupby(payment_col)[value_col].agg(['sum', 'count', 'mean']).reset_index()
-                additional['payment_analysis'] = [
-                    {
-                        'method': str(row[payment_col]),
-                        'total': float(row['sum']),
-                        'count': int(row['count']),
-                        'avg_ticket': float(row['mean'])
-                    }
-                    for _, row in payment_analysis.iterrows()
-                ]
+                payment_analysis = context.summary_by(payment_col, value_col)
+                additional['payment_analysis'] = serialization.records({
+                    'method': serialization.labels(payment_analysis.index),
+                    'total': serialization.floats(payment_analysis['sum']),
+                    'count': payment_analysis['count'].to_numpy(dtype=np.int64),
+                    'avg_ticket': serialization.floats(payment_analysis['mean']),
+                })
             except:
                 pass
         
         # 3. ANÁLISE POR REGIÃO
-        region_cols = [col for col in df.columns if any(word in col.lower() for word in ['regiao', 'region', 'estado', 'state'])]
-        if region_cols and col_types.get('numeric'):
+        region_col = _column_named(df.columns, REGION_WORDS)
+        if region_col and col_types.get('numeric'):
             try:
-                region_col = region_cols[0]
-                value_col = col_types['numeric'][0]
-                region_sales = df.groupby(region_col)[value_col].sum().reset_index()
-                additional['region_sales'] = [
-                    {
-                        'region': str(row[region_col]),
-                        'sales': float(row[value_col])
-                    }
-                    for _, row in region_sales.iterrows()
-                ]
+                region_sales = context.summary_by(region_col, value_col)['sum']
+                additional['region_sales'] = serialization.records({
+                    'region': serialization.labels(region_sales.index),
+                    'sales': serialization.floats(region_sales),
+                })
             except:
                 pass
         
         # 4. TENDÊNCIA SEMANAL REAL
         if col_types.get('date') and col_types.get('numeric'):
-            date_col = col_types['date'][0]
-            value_col = col_types['numeric'][0]
             try:
-                df_copy = df.copy()
-                df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-                df_copy = df_copy.dropna(subset=[date_col])
-                df_copy = df_copy.sort_values(date_col)
-                
-                df_copy['week'] = df_copy[date_col].dt.isocalendar().week
-                df_copy['year'] = df_copy[date_col].dt.year
-                weekly_sales = df_copy.groupby(['year', 'week'])[value_col].sum().reset_index()
+                weekly_sales = context.weekly(value_col)
                 
-                additional['weekly_trend'] = [
-                    {
-                        'week': f"Sem {int(row['week'])}",
-                        'value': float(row[value_col])
-                    }
-                    for _, row in weekly_sales.iterrows()
-                ]
+                additional['weekly_trend'] = serialization.records({
+                    'week': _week_labels(weekly_sales),
+                    'value': serialization.floats(weekly_sales['value']),
+                })
             except:
                 pass
         
         return additional
     
-    def get_dashboard_data(self, dashboard, options=None):
-        """Obter dados processados do dashboard
+    def get_dashboard_data(self, dashboard, options=None, encoded=False):
+        """Obter dados processados do dashboard (via cache de resultados)
         
         options:
             period: '30d' | '90d' | 'ytd'
             compare: bool
+        encoded: retorna o JSON já serializado (bytes) em vez do dict
         """
         options = options or {}
+        return DashboardResultCache().get_or_compute(
+            dashboard,
+            options,
+            lambda: self.compute_dashboard_data(dashboard, options),
+            encoded=encoded,
+        )
+    
+    def compute_dashboard_data(self, dashboard, options=None):
+        """Processar dados do dashboard a partir do snapshot (sem cache)"""
+        # Recursos abertos no processamento (motor SQL) são fechados mesmo com erro
+        with contextlib.ExitStack() as resources:
+            return self._compute_dashboard_data(dashboard, options or {}, resources)
+    
+    def _compute_dashboard_data(self, dashboard, options, resources):
         period = options.get('period') or '30d'
         compare = bool(options.get('compare'))
         
@@ -270,34 +264,95 @@ class DashboardService:
         if not datasource:
             return self._get_empty_data(dashboard.template)
         
-        # Obter dados da fonte
+        # Obter dados da fonte (snapshot colunar já tipado)
         datasource_service = DataSourceService()
-        source_data = datasource_service.get_data(datasource)
+        ingestion_service = datasource_service.ingestion_service
+        # Várias fontes combinadas (config['sources']): união ou junção
+        combined = CombinedSource.for_dashboard(dashboard, datasource_service)
+        # Rollups diários pré-calculados na ingestão (mesmo recorte de período)
+        full_cube = cube = ingestion_service.get_cube(datasource) if combined is None else None
+        date_col = None
+        col_types = None
+        start = now = None
         
-        # Criar DataFrame
-        df = pd.DataFrame(source_data['rows'])
-        if not df.empty:
-            # Tentar identificar coluna de data principal para filtrar período
-            col_types = self._detect_column_types(df.copy())
+        # Motor SQL (modo duckdb): as linhas do período vão do snapshot (Arrow)
+        # direto para o motor; o DataFrame só é montado se alguém ler as linhas
+        sql_engine = resources.enter_context(SQLEngine()) if self.engine == 'duckdb' else None
+        
+        # Tipos decididos na ingestão: a coluna de data principal é conhecida
+        # sem ler as linhas, e só os meses do período são lidos do snapshot
+        schema = fields = None
+        if combined is None:
+            schema = ingestion_service.get_typed_schema(datasource)
+            fields = ingestion_service.get_arrow_schema(datasource) if schema else None
+        if fields is not None:
+            col_types = schema.column_types(fields.names)
             date_col = col_types['date'][0] if col_types['date'] else None
-            if date_col:
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                df = df.dropna(subset=[date_col])
-                if period in ('30d', '90d'):
-                    days = 30 if period == '30d' else 90
-                    start = timezone.now() - timezone.timedelta(days=days)
-                    df = df[df[date_col] >= start]
-                elif period == 'ytd':
-                    start = pd.Timestamp(year=timezone.now().year, month=1, day=1, tz=timezone.now().tzinfo)
-                    df = df[df[date_col] >= start]
+        if combined is not None:
+            table = combined.table()
+            col_types, date_col, start, now = self._combined_columns(combined, table, period)
+            load = lambda: self._combined_rows(combined, table, date_col, start)
+            if sql_engine is not None:
+                sql_engine.register_rows(table, date_col, start)
+                df = LazyRows(table.column_names, sql_engine, load)
+            else:
+                df = load()
+        elif date_col and pa.types.is_timestamp(fields.field(date_col).type):
+            start, now = self._period_bounds(period, aware=fields.field(date_col).type.tz is not None)
+            load = lambda: datasource_service.get_rows(datasource, date_col, start)
+            if sql_engine is not None:
+                sql_engine.register_snapshot(datasource, date_col, start, service=ingestion_service)
+                df = LazyRows(fields.names, sql_engine, load)
+            else:
+                df = load()
+            if start is not None:
+                cube = cube.between(start) if cube else None
+        else:
+            df = datasource_service.get_dataframe(datasource)
+            date_col = None
+            col_types = None
+            if not df.empty:
+                schema = ingestion_service.get_typed_schema(datasource, df)
+                col_types = self._detect_column_types(df, schema)
+                date_col = col_types['date'][0] if col_types['date'] else None
+                if date_col:
+                    # Datas da planilha não têm fuso: comparar no horário local
+                    start, now = self._period_bounds(period, aware=df[date_col].dt.tz is not None)
+                    # Filtro por dia (inteiros), com os dias da coluna em cache por snapshot
+                    snapshot_hash = (datasource.connection_config.get('last_snapshot') or {}).get('data_hash')
+                    days = dates.epoch_days(df[date_col], cache_key=snapshot_hash)
+                    df = df[dates.between(days, start)]
+                    if start is not None:
+                        cube = cube.between(start) if cube else None
+            if sql_engine is not None:
+                # Snapshots antigos (registros em connection_config): só há o DataFrame
+                sql_engine.register_rows(df)
+        
+        if sql_engine is not None:
+            aggregates = SQLAggregates(df, sql_engine)
+        else:
+            aggregates = build_aggregates(df, cube, date_col)
+        
+        # Comparação com períodos anteriores, lida dos rollups diários
+        comparison = None
+        if compare and start is not None and full_cube is not None and full_cube.date_column == date_col:
+            comparison = PeriodComparison(full_cube, start, now)
+        
+        # Widgets declarados na configuração: um plano com agregações fundidas
+        widgets = None
+        if (dashboard.config or {}).get('widgets'):
+            engine = WidgetEngine(df, aggregates.cube if isinstance(aggregates, CubeAggregates) else None,
+                                  version=data_version(dashboard, period, date_col))
+            widgets = engine.run(dashboard.config['widgets'])
         
         # Processar dados (considerar mapeamento manual)
         override_mapping = options.get('override_mapping') if options else None
         column_mapping = override_mapping if override_mapping else (dashboard.config or {}).get('column_mapping', {})
         if dashboard.template == 'sales':
-            result = self._process_sales_simple(df, mapping=column_mapping)
+            result = self._process_sales_simple(df, mapping=column_mapping, aggregates=aggregates, col_types=col_types,
+                                                comparison=comparison)
         elif dashboard.template == 'financial':
-            result = self._process_financial_simple(df)
+            result = self._process_financial_simple(df, col_types=col_types)
         else:
             result = self._get_empty_data(dashboard.template)
         
@@ -307,16 +362,102 @@ class DashboardService:
         result['goals'] = self._compute_goals_progress(dashboard, result)
         result['impact_estimates'] = self._estimate_impact(result)
         result.setdefault('metadata', {})['options'] = {'period': period, 'compare': compare}
+        if widgets is not None:
+            result['widgets'] = widgets
+        if compare and 'comparison' not in result:
+            # Modo compare sem números: dizer por quê em vez de omitir a comparação
+            result['comparison'] = {
+                'available': False,
+                'reason': self._comparison_unavailable_reason(dashboard, combined, full_cube, date_col, start),
+            }
         return result
     
-    def _process_sales_simple(self, df, mapping=None):
-        """Processar dados de vendas"""
+    def _comparison_unavailable_reason(self, dashboard, combined, full_cube, date_col, start):
+        """
+        Por que o modo compare não tem números para o dashboard
+        
+        A comparação sai dos rollups diários da fonte (PeriodComparison), que
+        só existem para uma fonte com snapshot tipado e a mesma coluna de
+        data do dashboard, e hoje só o template de vendas monta as séries
+        comparadas.
+        """
+        if not date_col:
+            return 'Os dados não têm coluna de data'
+        if start is None:
+            return 'O período cobre todo o histórico: não há período anterior'
+        if combined is not None:
+            return 'Dashboards com várias fontes combinadas não têm rollups diários para comparar'
+        if full_cube is None:
+            return 'A fonte ainda não tem rollups diários; sincronize-a novamente'
+        if full_cube.date_column != date_col:
+            return f'Os rollups diários da fonte usam outra coluna de data ({full_cube.date_column})'
+        if dashboard.template != 'sales':
+            return 'A comparação de períodos está disponível apenas no template de vendas'
+        return 'Sem dados no período'
+    
+    def _combined_columns(self, combined, table, period):
+        """
+        Tipos, coluna de data e período da tabela combinada de várias fontes
+        (sem converter as linhas)
+        
+        Returns:
+            (col_types, date_col, start, now)
+        """
+        schema = combined.typed_schema(table.schema)
+        col_types = schema.column_types(table.column_names)
+        date_col = next(
+            (col for col in col_types['date'] if pa.types.is_timestamp(table.schema.field(col).type)),
+            None,
+        )
+        start = now = None
+        if date_col:
+            start, now = self._period_bounds(period, aware=table.schema.field(date_col).type.tz is not None)
+        return col_types, date_col, start, now
+    
+    def _combined_rows(self, combined, table, date_col, start):
+        """Linhas do período da tabela combinada, em pandas"""
+        df = table.to_pandas(split_blocks=True)
+        if date_col:
+            # Dias da coluna em cache pela versão da combinação (hashes dos snapshots)
+            days = dates.epoch_days(df[date_col], cache_key=combined.version)
+            df = df[dates.between(days, start)]
+        return df
+    
+    def _period_bounds(self, period, aware=True):
+        """
+        (início, agora) do período ('30d', '90d', 'ytd'); início None para
+        todo o histórico
+        
+        aware: a coluna de data tem fuso; datas sem fuso são comparadas no
+        horário local
+        """
+        now = timezone.localtime()
+        if not aware:
+            now = now.replace(tzinfo=None)
+        if period in ('30d', '90d'):
+            return now - timezone.timedelta(days=30 if period == '30d' else 90), now
+        if period == 'ytd':
+            return now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0), now
+        return None, now
+    
+    def _process_sales_simple(self, df, mapping=None, aggregates=None, col_types=None, comparison=None):
+        """Processar dados de vendas
+        
+        aggregates: somas/contagens do período (cubo diário ou linhas)
+        col_types: tipos das colunas já detectados (ver _detect_column_types)
+        comparison: PeriodComparison do período (modo compare), ou None
+        
+        KPIs, gráficos e motores (insights, previsões, alertas) leem do
+        mesmo AnalysisContext, montado uma vez aqui.
+        """
         try:
             if df.empty:
                 return self._get_empty_data('sales')
             
             # DETECÇÃO AUTOMÁTICA
-            col_types = self._detect_column_types(df)
+            col_types = col_types or self._detect_column_types(df)
+            context = AnalysisContext(df, col_types, aggregates)
+            aggregates = context.aggregates
             # Aplicar mapeamento manual quando fornecido
             value_col = mapping.get('value') if mapping else None
             if value_col and value_col not in df.columns:
@@ -349,59 +490,37 @@ class DashboardService:
                             break
             
             # KPIs BÁSICOS
-            total_revenue = float(df[value_col].sum())
-            total_transactions = len(df)
+            total_revenue = context.total(value_col)
+            total_transactions = aggregates.row_count()
             avg_ticket = total_revenue / total_transactions if total_transactions > 0 else 0
-            total_quantity = float(df[qty_col].sum()) if qty_col else 0
+            total_quantity = context.total(qty_col) if qty_col else 0
             
             # KPIs AVANÇADOS
-            advanced_kpis = self._calculate_advanced_kpis(df)
+            advanced_kpis = self._calculate_advanced_kpis(context)
             
             # GRÁFICO: Evolução
             sales_evolution = []
             if date_col:
-                df_copy = df.copy()
-                df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-                df_copy = df_copy.dropna(subset=[date_col])
+                sales_by_month = context.monthly(value_col, date_col=date_col)
                 
-                if len(df_copy) > 0:
-                    df_copy['year'] = df_copy[date_col].dt.year
-                    df_copy['month_num'] = df_copy[date_col].dt.month
-                    month_labels_pt = {
-                        1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
-                        7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'
-                    }
-
-                    sales_by_month = (
-                        df_copy.groupby(['year', 'month_num'])[value_col]
-                        .sum()
-                        .reset_index()
-                        .sort_values(['year', 'month_num'])
-                    )
-
-                    sales_evolution = [
-                        {
-                            'month': f"{month_labels_pt.get(int(row['month_num']), str(int(row['month_num'])))} {int(row['year'])}",
-                            'value': float(row[value_col])
-                        }
-                        for _, row in sales_by_month.iterrows()
-                    ]
+                if len(sales_by_month) > 0:
+                    sales_evolution = serialization.records({
+                        'month': _month_labels(sales_by_month),
+                        'value': serialization.floats(sales_by_month['value']),
+                    })
             
             # GRÁFICO: Top produtos
             top_products_data = []
             if product_col:
-                top_products = df.groupby(product_col)[value_col].sum().nlargest(5)
-                top_products_data = [
-                    {
-                        'name': str(name),
-                        'sales': float(value),
-                        'growth': 0
-                    }
-                    for name, value in top_products.items()
-                ]
+                top_products = context.summary_by(product_col, value_col)['sum'].nlargest(5)
+                top_products_data = serialization.records({
+                    'name': serialization.labels(top_products.index),
+                    'sales': serialization.floats(top_products),
+                    'growth': np.zeros(len(top_products), dtype=np.int64),
+                })
             
             # GRÁFICOS ADICIONAIS
-            additional_charts = self._generate_additional_charts(df, col_types)
+            additional_charts = self._generate_additional_charts(context)
             
             # GRÁFICO: Categorias
             category_sales = []
@@ -411,15 +530,17 @@ class DashboardService:
                 and not any(word in col.lower() for word in ['cliente', 'customer', 'nome', 'name'])
             ]
             
+            category_col = None
             if category_cols:
                 for col in category_cols:
-                    unique_count = df[col].nunique()
+                    unique_count = context.nunique(col)
                     if 2 <= unique_count <= 10:
-                        cat_sales = df.groupby(col)[value_col].sum().nlargest(10)
-                        category_sales = [
-                            {'name': str(name), 'value': float(value)}
-                            for name, value in cat_sales.items()
-                        ]
+                        category_col = col
+                        cat_sales = context.summary_by(col, value_col)['sum'].nlargest(10)
+                        category_sales = serialization.records({
+                            'name': serialization.labels(cat_sales.index),
+                            'value': serialization.floats(cat_sales),
+                        })
                         break
             
             # INSIGHTS E ANÁLISES
@@ -431,19 +552,19 @@ class DashboardService:
                 'total_quantity': total_quantity,
             }
             
-            insights = insights_gen.generate_insights(df, col_types, kpis_dict)
-            problems = insights_gen.detect_data_problems(df, col_types)
-            suggestions = insights_gen.suggest_additional_charts(df, col_types, ['sales_evolution', 'top_products'])
+            insights = insights_gen.generate_insights(context, kpis_dict)
+            problems = insights_gen.detect_data_problems(context)
+            suggestions = insights_gen.suggest_additional_charts(context, ['sales_evolution', 'top_products'])
             
             # PREVISÕES
             prediction_engine = PredictionEngine()
-            predictions = prediction_engine.generate_predictions(df, col_types, plan='free')
+            predictions = prediction_engine.generate_predictions(context, plan='free')
             
             # ALERTAS
             alert_engine = AlertEngine()
-            alerts = alert_engine.generate_alerts(df, col_types, kpis_dict, plan='free')
+            alerts = alert_engine.generate_alerts(context, kpis_dict, plan='free')
             
-            return {
+            result = {
                 'kpis': {
                     'total_revenue': total_revenue,
                     'total_customers': total_transactions,
@@ -472,6 +593,15 @@ class DashboardService:
                     }
                 }
             }
+            if comparison is not None:
+                result['comparison'] = self._compare_sales(comparison, context, result, {
+                    'value': value_col,
+                    'quantity': qty_col,
+                    'date': date_col,
+                    'product': product_col,
+                    'category': category_col,
+                })
+            return result
         except Exception as e:
             import logging
             import traceback
@@ -480,13 +610,111 @@ class DashboardService:
             logger.error(traceback.format_exc())
             return self._get_empty_data('sales')
     
-    def _process_financial_simple(self, df):
+    def _compare_sales(self, comparison, context, result, columns):
+        """
+        KPIs e séries dos gráficos no período anterior e no mesmo período do
+        ano passado
+        
+        Tudo sai do cubo diário (ver PeriodComparison): KPIs e séries sobre
+        medidas ou dimensões fora do cubo (e o histograma de valores, que
+        depende das linhas) ficam sem comparação. Preenche também
+        kpis.growth_rate e o growth dos top produtos com a variação sobre o
+        período anterior.
+        """
+        value_col = columns['value']
+        if not comparison.cube.has_measure(value_col):
+            return {
+                'available': False,
+                'reason': f'A coluna de valor ({value_col}) não está nos rollups diários',
+                'periods': comparison.periods(),
+            }
+        windows = {name: comparison.aggregates(name) for name in WINDOWS}
+        
+        # KPIs de cada janela
+        window_kpis = {}
+        for name, window in windows.items():
+            revenue = window.total(value_col)
+            rows = window.row_count()
+            values = {
+                'total_revenue': revenue,
+                'total_customers': rows,
+                'avg_ticket': revenue / rows if rows > 0 else 0,
+            }
+            if columns['quantity'] and comparison.cube.has_measure(columns['quantity']):
+                values['total_quantity'] = window.total(columns['quantity'])
+            window_context = AnalysisContext(context.df.iloc[:0], context.col_types, window)
+            values.update(self._calculate_advanced_kpis(window_context))
+            window_kpis[name] = values
+        
+        kpis = result['kpis']
+        compared_kpis = {}
+        for key, current in kpis.items():
+            if isinstance(current, bool) or not isinstance(current, (int, float)):
+                continue
+            bases = {name: window_kpis[name].get(key) for name in WINDOWS}
+            if all(base is None for base in bases.values()):
+                continue
+            compared_kpis[key] = compare_values(current, bases)
+        
+        # Séries: (gráfico, campo do rótulo, campo do valor, valores por rótulo)
+        def by_member(dimension, col):
+            return lambda window: window.summary_by(dimension, col)['sum'].rename(index=str)
+        
+        def by_month(window):
+            monthly = window.monthly(columns['date'], value_col)
+            return pd.Series(monthly['value'].to_numpy(), index=_month_labels(monthly))
+        
+        def by_week(window):
+            weekly = window.weekly(context.date_col, context.value_col)
+            return pd.Series(weekly['value'].to_numpy(), index=_week_labels(weekly))
+        
+        series = [('sales_evolution', 'month', 'value', by_month), ('weekly_trend', 'week', 'value', by_week)]
+        if columns['product']:
+            series.append(('top_products', 'name', 'sales', by_member(columns['product'], value_col)))
+        if columns['category']:
+            series.append(('category_sales', 'name', 'value', by_member(columns['category'], value_col)))
+        payment_col = _column_named(context.df.columns, PAYMENT_WORDS)
+        if payment_col:
+            series.append(('payment_analysis', 'method', 'total', by_member(payment_col, context.value_col)))
+        region_col = _column_named(context.df.columns, REGION_WORDS)
+        if region_col:
+            series.append(('region_sales', 'region', 'sales', by_member(region_col, context.value_col)))
+        
+        charts = result['charts']
+        compared_charts = {}
+        for chart, label_field, value_field, values_of in series:
+            if not charts.get(chart):
+                continue
+            values = {}
+            for name, window in windows.items():
+                try:
+                    values[name] = values_of(window)
+                except KeyError:
+                    values[name] = None
+            if all(value is None for value in values.values()):
+                continue
+            compared_charts[chart] = compare_series(charts[chart], label_field, value_field, values)
+        
+        # Crescimento sobre o período anterior nos campos que já existiam
+        revenue_change = compared_kpis.get('total_revenue', {}).get('previous_change_pct')
+        kpis['growth_rate'] = revenue_change or 0
+        for product, compared in zip(charts.get('top_products') or [], compared_charts.get('top_products') or []):
+            product['growth'] = compared['previous_change_pct'] or 0
+        
+        return {
+            'available': True,
+            'periods': comparison.periods(),
+            'kpis': compared_kpis,
+            'charts': compared_charts,
+        }
+    
+    def _process_financial_simple(self, df, col_types=None):
         """Processar dados financeiros"""
         try:
             if df.empty:
                 return self._get_empty_data('financial')
             
-            col_types = self._detect_column_types(df)
+            col_types = col_types or self._detect_column_types(df)
             value_col = self._detect_value_column(df, col_types['numeric'])
             
             if not value_col:
@@ -524,7 +752,12 @@ class DashboardService:
         
         growth = 0.0
         sales_evolution = charts.get('sales_evolution') or []
-        if len(sales_evolution) >= 2:
+        comparison = processed.get('comparison') or {}
+        revenue_change = comparison.get('kpis', {}).get('total_revenue', {}).get('previous_change_pct')
+        if compare and revenue_change is not None:
+            # Receita do período contra o período anterior
+            growth = revenue_change
+        elif len(sales_evolution) >= 2:
             last = sales_evolution[-1]['value']
             prev = sales_evolution[-2]['value']
             if prev > 0:
@@ -543,6 +776,7 @@ class DashboardService:
         }
         if compare:
             summary['comparison_enabled'] = True
+            summary['comparison_available'] = bool(comparison.get('available'))
         return summary
     
     def _estimate_benchmark(self, dashboard, processed):
@@ -659,6 +893,45 @@ class DashboardService:
         
         return {'kpis': {}, 'charts': {}}
 
+    def create_preview_dashboard(self, datasource, user, template, config):
+        """
+        Criar (ou atualizar) a pré-visualização ÚNICA da organização para a fonte
+        
+        A pré-visualização não conta no limite de dashboards do plano.
+        """
+        organization = datasource.organization
+        preview_name = "Pré-visualização de dados"
+        description = f"Pré-visualização automática a partir de {datasource.name}"
+        preview_dashboard = Dashboard.objects.filter(
+            organization=organization,
+            is_preview=True
+        ).first()
+        
+        if preview_dashboard:
+            # Atualizar prévia existente
+            preview_dashboard.name = preview_name
+            preview_dashboard.template = template
+            preview_dashboard.config = config
+            preview_dashboard.description = description
+            preview_dashboard.save(update_fields=['name', 'template', 'config', 'description', 'updated_at'])
+            preview_dashboard.datasources.clear()
+            preview_dashboard.datasources.add(datasource)
+            DashboardResultCache().invalidate(preview_dashboard.id)
+            return preview_dashboard
+        
+        # Criar prévia
+        dashboard = Dashboard.objects.create(
+            name=preview_name,
+            template=template,
+            organization=organization,
+            created_by=user,
+            config=config,
+            description=description,
+            is_preview=True,
+        )
+        dashboard.datasources.add(datasource)
+        return dashboard
+
     def change_template(self, dashboard, new_template, reset_config=True):
         """
         Trocar o template do dashboard garantindo validação e limpeza de configuração.
@@ -675,4 +948,5 @@ class DashboardService:
             dashboard.config = {}
 
         dashboard.save(update_fields=['template', 'config', 'updated_at'])
+        DashboardResultCache().invalidate(dashboard.id)
         return dashboard
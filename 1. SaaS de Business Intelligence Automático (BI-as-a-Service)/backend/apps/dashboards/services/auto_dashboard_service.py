@@ -11,6 +11,7 @@ import pandas as pd
 
 from apps.dashboards.models import Dashboard
 from apps.dashboards.intelligent_analyzer import IntelligentDataAnalyzer
+from apps.datasources.services import serialization
 from apps.datasources.services.data_ingestion_service import DataIngestionService
 from apps.dashboards.services.data_processing_service import DataProcessingService
 
@@ -99,28 +100,6 @@ class AutoDashboardService:
             logger.error(f"Erro ao criar dashboard automaticamente: {str(e)}", exc_info=True)
             raise
     
-    def _convert_to_serializable(self, val):
-        """
-        Converte valores pandas/numpy para tipos serializáveis em JSON
-        """
-        import numpy as np
-        from datetime import datetime
-        
-        if pd.isna(val):
-            return None
-        elif isinstance(val, (pd.Timestamp, datetime)):
-            return val.isoformat()
-        elif isinstance(val, (np.integer, np.int64, np.int32)):
-            return int(val)
-        elif isinstance(val, (np.floating, np.float64, np.float32)):
-            if np.isnan(val) or np.isinf(val):
-                return None
-            return float(val)
-        elif isinstance(val, np.bool_):
-            return bool(val)
-        else:
-            return val
-    
     def _analyze_data_with_ai(self, df: pd.DataFrame, datasource_name: str) -> Dict[str, Any]:
         """
         Usa GPT para analisar os dados e entender sua estrutura
@@ -170,28 +149,20 @@ class AutoDashboardService:
         """
         Prepara contexto estruturado para enviar ao GPT
         """
-        # Amostra dos dados - converter para formato serializável
-        sample_data = []
-        for _, row in df.head(5).iterrows():
-            row_dict = {}
-            for col, val in row.items():
-                row_dict[col] = self._convert_to_serializable(val)
-            sample_data.append(row_dict)
+        # Amostra dos dados - converter para formato serializável (por coluna)
+        sample_data = serialization.frame_records(df.head(5))
         
         # Estatísticas das colunas
         columns_info = []
+        null_counts = df.isnull().sum()
+        unique_counts = df.nunique()
         for col in df.columns:
-            # Converter sample_values para formato serializável
-            sample_values = []
-            for val in df[col].dropna().head(3):
-                sample_values.append(self._convert_to_serializable(val))
-            
             col_info = {
                 'name': col,
                 'type': str(df[col].dtype),
-                'null_count': int(df[col].isnull().sum()),
-                'unique_values': int(df[col].nunique()),
-                'sample_values': sample_values
+                'null_count': int(null_counts[col]),
+                'unique_values': int(unique_counts[col]),
+                'sample_values': serialization.column(df[col].dropna().head(3))
             }
             columns_info.append(col_info)
         
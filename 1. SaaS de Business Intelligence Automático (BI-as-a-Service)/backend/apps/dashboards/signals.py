@@ -0,0 +1,9 @@
+from django.dispatch import receiver
+from apps.datasources.signals import snapshot_updated
+from .result_cache import DashboardResultCache
+
+
+@receiver(snapshot_updated)
+def invalidate_dashboard_results(sender, datasource, **kwargs):
+    """Resultados processados dependem do snapshot da fonte"""
+    DashboardResultCache().invalidate_datasource(datasource)
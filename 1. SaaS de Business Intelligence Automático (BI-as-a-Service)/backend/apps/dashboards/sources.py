@@ -0,0 +1,170 @@
+"""
+Dashboards com várias fontes de dados
+dashboard.config['sources'] diz como as fontes são combinadas antes do
+processamento:
+
+    {"mode": "union", "source_column": "fonte"}
+    {"mode": "join", "base": 1,
+     "joins": [{"datasource": 2, "on": {"produto_id": "id"}, "how": "left"}]}
+
+A tabela combinada sai dos snapshots (Arrow, sem passar por pandas) e fica
+no cache de tabelas com uma chave que inclui o hash de todos os snapshots e
+a configuração: um snapshot novo em qualquer fonte gera uma chave nova.
+"""
+import hashlib
+import json
+
+import pyarrow as pa
+
+from apps.datasources.services import DataSourceService
+from apps.datasources.services.combine import JOIN_TYPES, hash_join, joined_names, union_tables
+from apps.datasources.services.tiered_cache import table_cache
+from apps.datasources.services.type_inference import CATEGORY, DATE, NUMERIC, TEXT, TypedSchema
+
+MODES = ('union', 'join')
+# Sufixo das colunas da fonte juntada com nome já existente
+JOIN_SUFFIX = '_2'
+
+
+def parse_sources(config, datasource_ids):
+    """
+    Configuração de combinação validada, ou None quando não há
+
+    datasource_ids: ids das fontes do dashboard. Levanta ValueError para
+    configurações inválidas.
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict) or config.get('mode') not in MODES:
+        raise ValueError(f"Modo de combinação inválido; use {' ou '.join(MODES)}")
+    available = set(datasource_ids)
+
+    if config['mode'] == 'union':
+        source_column = config.get('source_column') or None
+        if source_column is not None and not isinstance(source_column, str):
+            raise ValueError('source_column deve ser o nome de uma coluna')
+        return {'mode': 'union', 'source_column': source_column}
+
+    base = config.get('base')
+    if base not in available:
+        raise ValueError('A fonte base da junção deve ser uma das fontes do dashboard')
+    joins = []
+    for join in config.get('joins') or []:
+        if not isinstance(join, dict) or join.get('datasource') not in available:
+            raise ValueError('Cada junção deve indicar uma das fontes do dashboard')
+        on = join.get('on')
+        if isinstance(on, str):
+            on = [on]
+        if isinstance(on, list):
+            on = {col: col for col in on}
+        if not isinstance(on, dict) or not on or not all(isinstance(col, str) for pair in on.items() for col in pair):
+            raise ValueError('Informe as colunas da junção em "on"')
+        how = join.get('how') or 'left'
+        if how not in JOIN_TYPES:
+            raise ValueError(f'Tipo de junção inválido: {how}')
+        joins.append({'datasource': join['datasource'], 'on': on, 'how': how})
+    if not joins:
+        raise ValueError('Informe ao menos uma fonte para juntar à base')
+    return {'mode': 'join', 'base': base, 'joins': joins}
+
+
+class CombinedSource:
+    """
+    Fontes de um dashboard combinadas numa só tabela
+
+    plan: configuração validada por parse_sources
+    datasources: {id: DataSource} de todas as fontes do dashboard
+    """
+
+    def __init__(self, plan, datasources, service: DataSourceService = None):
+        self.plan = plan
+        self.datasources = datasources
+        self.ingestion = (service or DataSourceService()).ingestion_service
+
+    @classmethod
+    def for_dashboard(cls, dashboard, service=None):
+        """CombinedSource do dashboard, ou None quando ele usa uma fonte só"""
+        config = (dashboard.config or {}).get('sources')
+        if not config:
+            return None
+        datasources = {ds.id: ds for ds in dashboard.datasources.order_by('id')}
+        plan = parse_sources(config, datasources)
+        if plan['mode'] == 'union' and len(datasources) < 2:
+            return None
+        return cls(plan, datasources, service)
+
+    def _order(self):
+        """Ids das fontes na ordem da combinação"""
+        if self.plan['mode'] == 'union':
+            return list(self.datasources)
+        return [self.plan['base'], *(join['datasource'] for join in self.plan['joins'])]
+
+    @property
+    def version(self):
+        """Muda com qualquer snapshot das fontes ou com a configuração"""
+        parts = [json.dumps(self.plan, sort_keys=True)]
+        for datasource_id in self._order():
+            snapshot = self.ingestion.get_snapshot(self.datasources[datasource_id]) or {}
+            parts.append(f"{datasource_id}:{snapshot.get('data_hash')}")
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+    def table(self) -> pa.Table:
+        """Tabela combinada (do cache de tabelas quando já montada)"""
+        return table_cache().get_or_load(f"combined/{self.version}", self._combine)
+
+    def _combine(self) -> pa.Table:
+        if self.plan['mode'] == 'union':
+            tables = [self.ingestion.get_table(ds) for ds in self.datasources.values()]
+            labels = [ds.name for ds in self.datasources.values()]
+            return union_tables(tables, labels, self.plan['source_column'])
+
+        combined = self.ingestion.get_table(self.datasources[self.plan['base']])
+        for join in self.plan['joins']:
+            right = self.ingestion.get_table(self.datasources[join['datasource']])
+            combined = hash_join(
+                combined, right,
+                list(join['on']), list(join['on'].values()),
+                how=join['how'], suffix=JOIN_SUFFIX,
+            )
+        return combined
+
+    def typed_schema(self, fields: pa.Schema) -> TypedSchema:
+        """
+        Tipos das colunas combinadas, a partir dos tipos de cada fonte
+
+        Colunas cujo tipo mudou na combinação (ex.: número numa fonte e
+        texto na outra) passam a texto.
+        """
+        columns = {}
+        schemas = {ds_id: self.ingestion.get_typed_schema(ds) for ds_id, ds in self.datasources.items()}
+        if self.plan['mode'] == 'union':
+            for schema in schemas.values():
+                for name, info in (schema.columns if schema else {}).items():
+                    columns.setdefault(name, info)
+        else:
+            names = list((schemas[self.plan['base']] or TypedSchema()).columns)
+            columns.update((schemas[self.plan['base']] or TypedSchema()).columns)
+            for join in self.plan['joins']:
+                schema = schemas[join['datasource']] or TypedSchema()
+                renamed = joined_names(names, list(schema.columns), list(join['on'].values()), JOIN_SUFFIX)
+                for name, output in renamed.items():
+                    columns[output] = schema[name]
+                names.extend(renamed.values())
+
+        if self.plan['mode'] == 'union' and self.plan['source_column']:
+            columns[self.plan['source_column']] = {'type': CATEGORY, 'role': 'attribute', 'format': None, 'decimal': None}
+
+        for name, info in list(columns.items()):
+            if name not in fields.names:
+                del columns[name]
+                continue
+            arrow_type = fields.field(name).type
+            if pa.types.is_dictionary(arrow_type):
+                arrow_type = arrow_type.value_type
+            changed = (
+                (info['type'] == NUMERIC and not (pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)))
+                or (info['type'] == DATE and not pa.types.is_timestamp(arrow_type))
+            )
+            if changed:
+                columns[name] = {**info, 'type': TEXT, 'role': 'attribute'}
+        return TypedSchema(columns)
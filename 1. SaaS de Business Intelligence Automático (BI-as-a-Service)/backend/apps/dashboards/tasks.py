@@ -0,0 +1,45 @@
+"""
+Tarefas assíncronas dos dashboards
+"""
+import logging
+
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.db import OperationalError
+from django.utils import timezone
+
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Tentativas extras para falhas transitórias (banco, storage)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 5  # segundos; dobra a cada tentativa
+RETRY_BACKOFF_MAX = 300
+
+
+@shared_task(bind=True, ignore_result=True)
+def render_export_job(self, job_id):
+    """Gera o arquivo de uma exportação (ExportJob) em storage"""
+    from .export_jobs import ExportJobService
+
+    job = ExportJob.objects.select_related('dashboard').filter(pk=job_id).first()
+    if job is None or job.status not in ('pending', 'running'):
+        return
+
+    try:
+        ExportJobService().render(job)
+    except Exception as exc:
+        retries = self.request.retries
+        if isinstance(exc, (OSError, OperationalError)) and retries < MAX_RETRIES:
+            countdown = get_exponential_backoff_interval(
+                RETRY_BACKOFF, retries, RETRY_BACKOFF_MAX, full_jitter=True
+            )
+            logger.warning(f"Export job {job_id} failed (attempt {retries + 1}), retrying in {countdown}s: {exc}")
+            raise self.retry(exc=exc, countdown=countdown)
+        logger.error(f"Export job {job_id} failed: {exc}", exc_info=True)
+        ExportJob.objects.filter(pk=job_id).update(
+            status='failed',
+            error=str(exc),
+            finished_at=timezone.now(),
+        )
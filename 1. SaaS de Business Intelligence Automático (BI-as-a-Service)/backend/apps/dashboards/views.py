@@ -1,14 +1,20 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Dashboard
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.text import slugify
+from .models import Dashboard, ExportJob
 from django.db.models import Count
 from django.db.utils import OperationalError, ProgrammingError
-from .serializers import DashboardSerializer
+from .serializers import DashboardSerializer, ExportJobSerializer
 from .services import DashboardService
+from .exporters import DashboardExporter
+from .export_jobs import ExportJobService, ExportLimitReached, iter_file, parse_range
+from .result_cache import DashboardResultCache
 from django.utils import timezone
 import secrets
+from config.renderers import CSVStreamRenderer, ORJSONRenderer, ParquetStreamRenderer, XLSXStreamRenderer
 
 
 class DashboardViewSet(viewsets.ModelViewSet):
@@ -97,9 +103,10 @@ class DashboardViewSet(viewsets.ModelViewSet):
                 'period': request.query_params.get('period') or '30d',
                 'compare': request.query_params.get('compare') in ('1', 'true', 'True'),
             }
-            data = service.get_dashboard_data(dashboard, options=options)
+            payload = service.get_dashboard_data(dashboard, options=options, encoded=True)
             
-            return Response(data)
+            # JSON já serializado pelo cache de resultados
+            return HttpResponse(payload, content_type='application/json')
             
         except Exception as e:
             import traceback
@@ -112,6 +119,129 @@ class DashboardViewSet(viewsets.ModelViewSet):
                 'traceback': traceback.format_exc()
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[ORJSONRenderer, CSVStreamRenderer, XLSXStreamRenderer, ParquetStreamRenderer],
+    )
+    def export(self, request, pk=None):
+        """
+        Exportar as linhas da fonte do dashboard em streaming
+        
+        ?format=csv (padrão), xlsx ou parquet, ou pelo header Accept.
+        Aceita columns, sort e filter[...] como /datasources/{id}/data/.
+        """
+        dashboard = self.get_object()
+        exporter = DashboardExporter()
+        organization = request.user.organization
+        
+        if exporter.get_export_limit(organization.plan) <= 0:
+            return Response({
+                'error': 'Exportação indisponível no seu plano',
+                'current_plan': organization.plan,
+                'required_plan': 'starter',
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        renderer = request.accepted_renderer
+        if renderer.format == 'json':
+            renderer = CSVStreamRenderer()
+        
+        try:
+            chunks = exporter.stream_rows(dashboard, renderer.format, request.query_params)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not organization.claim_export():
+            return Response({
+                'error': 'Limite mensal de exportações atingido',
+                'current_plan': organization.plan,
+                'exports_used_this_month': organization.exports_used_this_month,
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        filename = f"{slugify(dashboard.name) or f'dashboard_{dashboard.id}'}.{renderer.format}"
+        response = StreamingHttpResponse(chunks, content_type=renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=True, methods=['get', 'post'])
+    def exports(self, request, pk=None):
+        """
+        Exportações em background do dashboard
+        
+        GET: lista os jobs. POST {content: 'report'|'rows', format}: cria o
+        job (202) ou devolve o artefato já gerado para os mesmos dados (200).
+        """
+        dashboard = self.get_object()
+        
+        if request.method == 'GET':
+            jobs = dashboard.export_jobs.all()[:50]
+            return Response(ExportJobSerializer(jobs, many=True).data)
+        
+        content = request.data.get('content') or 'report'
+        fmt = request.data.get('format') or 'xlsx'
+        try:
+            job, created = ExportJobService().request_export(dashboard, request.user, content, fmt)
+        except ExportLimitReached as e:
+            organization = request.user.organization
+            return Response({
+                'error': str(e),
+                'current_plan': organization.plan,
+                'exports_used_this_month': organization.exports_used_this_month,
+            }, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            ExportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if job.status != 'done' else status.HTTP_200_OK,
+        )
+    
+    @action(detail=True, methods=['get'], url_path=r'exports/(?P<job_id>[0-9]+)')
+    def export_job(self, request, pk=None, job_id=None):
+        """Status de uma exportação"""
+        dashboard = self.get_object()
+        job = ExportJob.objects.filter(pk=job_id, dashboard=dashboard).first()
+        if job is None:
+            return Response({'error': 'Exportação não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ExportJobSerializer(job).data)
+    
+    @action(detail=True, methods=['get'], url_path=r'exports/(?P<job_id>[0-9]+)/download')
+    def export_download(self, request, pk=None, job_id=None):
+        """
+        Baixar o arquivo de uma exportação concluída
+        
+        Aceita Range (um intervalo de bytes) para retomar downloads grandes.
+        """
+        dashboard = self.get_object()
+        job = ExportJob.objects.filter(pk=job_id, dashboard=dashboard, status='done').first()
+        service = ExportJobService()
+        if job is None or not service.storage.exists(job.artifact_path):
+            return Response({'error': 'Arquivo da exportação não disponível'}, status=status.HTTP_404_NOT_FOUND)
+        
+        size = job.size
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        response = StreamingHttpResponse(
+            iter_file(service.open(job), start, length),
+            status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+            content_type=service.CONTENT_TYPES[job.format],
+        )
+        response['Content-Length'] = str(length)
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = f'"{job.artifact_key}"'
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        filename = f"{slugify(dashboard.name) or f'dashboard_{dashboard.id}'}.{job.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @action(detail=True, methods=['post'])
     def change_template(self, request, pk=None):
         """Trocar template do dashboard"""
@@ -149,6 +279,16 @@ class DashboardViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_metrics(self, request):
+        """Acertos do cache de resultados e cálculos feitos x coalescidos"""
+        metrics = DashboardResultCache().metrics()
+        misses = metrics['computed'] + metrics['coalesced'] + metrics['served_previous']
+        metrics['coalesced_ratio'] = (
+            (metrics['coalesced'] + metrics['served_previous']) / misses if misses else 0.0
+        )
+        return Response(metrics)
+
     @action(detail=False, methods=['post'])
     def cleanup_orphans(self, request):
         """
@@ -223,6 +363,7 @@ class DashboardViewSet(viewsets.ModelViewSet):
         goals[metric] = {'target': target_val, 'deadline': deadline}
         dashboard.config['goals'] = goals
         dashboard.save(update_fields=['config', 'updated_at'])
+        DashboardResultCache().invalidate(dashboard.id)
         return Response({'ok': True, 'goals': goals})
     
     @action(detail=True, methods=['post'])
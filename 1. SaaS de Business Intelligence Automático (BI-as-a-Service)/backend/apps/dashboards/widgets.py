@@ -0,0 +1,305 @@
+"""
+Execução dos widgets declarados em dashboard.config['widgets']
+(kpi_sum, line_over_time, bar_by_category, table_preview, como os sugeridos
+por DataProfileService.suggest_basic_config)
+
+Os widgets são compilados num plano único: cada um vira uma consulta
+(filtro, agrupamento, medida) e consultas com o mesmo filtro e o mesmo
+agrupamento são fundidas numa só agregação com todas as medidas. O filtro
+de cada grupo é aplicado uma vez e as linhas são lidas uma vez, só com as
+colunas que o plano usa. Agregações que o cubo diário responde (sem filtro)
+não tocam as linhas.
+
+O resultado de cada widget fica no cache com a versão dos dados: adicionar
+um widget custa só a agregação dele.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.datasources.services import dates, serialization
+
+WIDGET_TYPES = ('kpi_sum', 'line_over_time', 'bar_by_category', 'table_preview')
+INTERVALS = ('auto', 'day', 'week', 'month')
+# Intervalo 'auto': por mês quando os dados cobrem mais dias que isso
+AUTO_DAYS = 92
+CACHE_PREFIX = 'dashboard_widget'
+CACHE_SECONDS = 24 * 60 * 60
+
+
+def data_version(dashboard, period, date_col=None):
+    """Versão das linhas que os widgets leem: snapshots, combinação, período e dia"""
+    from .result_cache import DashboardResultCache
+
+    version = {
+        'snapshots': DashboardResultCache().snapshot_hashes(dashboard),
+        'sources': (dashboard.config or {}).get('sources') or None,
+        'period': period,
+        'date_column': date_col,
+        # Períodos são relativos a "hoje"
+        'day': timezone.localdate().isoformat(),
+    }
+    return hashlib.md5(json.dumps(version, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class WidgetQuery:
+    """
+    Consulta lógica de um widget
+
+    group: None (total), ('time', coluna), ('category', coluna) ou
+    ('sample',); filter: ((coluna, (valores...)), ...) normalizado. Séries
+    no tempo agrupam por dia; o intervalo do widget é aplicado sobre as
+    somas diárias, então intervalos diferentes compartilham a agregação.
+    """
+
+    def __init__(self, widget, group, measure=None, columns=(), filter=(), interval=None):
+        self.widget = widget
+        self.group = group
+        self.measure = measure
+        self.columns = list(columns)
+        self.filter = filter
+        self.interval = interval
+
+    @property
+    def fuse_key(self):
+        return self.filter, self.group
+
+
+def _normalize_filter(spec):
+    if not spec:
+        return ()
+    if not isinstance(spec, dict):
+        raise ValueError('filter deve ser {coluna: valor ou lista de valores}')
+    normalized = []
+    for col, values in spec.items():
+        values = values if isinstance(values, list) else [values]
+        normalized.append((col, tuple(sorted(str(value) for value in values))))
+    return tuple(sorted(normalized))
+
+
+def compile_widget(widget) -> WidgetQuery:
+    """Consulta de um widget; ValueError para widgets inválidos"""
+    kind = widget.get('type') if isinstance(widget, dict) else None
+    if kind not in WIDGET_TYPES:
+        raise ValueError(f'Tipo de widget desconhecido: {kind}')
+    filter = _normalize_filter(widget.get('filter'))
+
+    if kind == 'kpi_sum':
+        return WidgetQuery(widget, None, widget.get('column'), filter=filter)
+    if kind == 'line_over_time':
+        interval = widget.get('interval') or 'auto'
+        if interval not in INTERVALS:
+            raise ValueError(f'Intervalo inválido: {interval}')
+        return WidgetQuery(widget, ('time', widget.get('date_column')), widget.get('value_column'),
+                           filter=filter, interval=interval)
+    if kind == 'bar_by_category':
+        return WidgetQuery(widget, ('category', widget.get('category_column')), widget.get('value_column'),
+                           filter=filter)
+    return WidgetQuery(widget, ('sample',), columns=widget.get('columns') or [], filter=filter)
+
+
+class WidgetEngine:
+    """
+    Executa os widgets de um dashboard sobre as linhas do período
+
+    df: linhas já filtradas pelo período do dashboard
+    cube: cubo diário do mesmo período e da mesma coluna de data que df, ou None
+    version: versão dos dados (ver data_version); sem ela nada é cacheado
+    """
+
+    def __init__(self, df: pd.DataFrame, cube=None, version=None):
+        self.df = df
+        self.cube = cube
+        self.version = version
+        self.stats = {'cached': 0, 'computed': 0, 'groups': 0, 'from_cube': 0}
+
+    def run(self, widgets):
+        """Resultado de cada widget, na ordem de `widgets`"""
+        widgets = list(widgets or [])
+        keys = [self._cache_key(widget) for widget in widgets]
+        cached = cache.get_many([key for key in keys if key]) if self.version else {}
+
+        results, queries = {}, {}
+        for position, (widget, key) in enumerate(zip(widgets, keys)):
+            if key in cached:
+                results[position] = cached[key]
+                self.stats['cached'] += 1
+                continue
+            try:
+                queries[position] = compile_widget(widget)
+            except ValueError as exc:
+                results[position] = self._payload(widget, error=str(exc))
+
+        computed = self._execute(queries)
+        self.stats['computed'] += len(computed)
+        results.update(computed)
+        if self.version and computed:
+            cache.set_many({keys[position]: computed[position] for position in computed}, CACHE_SECONDS)
+        return [results[position] for position in range(len(widgets))]
+
+    def _cache_key(self, widget):
+        if not self.version:
+            return None
+        spec = json.dumps(widget, sort_keys=True, default=str)
+        return f"{CACHE_PREFIX}:{self.version}:{hashlib.md5(spec.encode()).hexdigest()}"
+
+    def _payload(self, widget, data=None, error=None):
+        payload = {'type': widget.get('type') if isinstance(widget, dict) else None,
+                   'title': widget.get('title') if isinstance(widget, dict) else None}
+        if error is not None:
+            payload['error'] = error
+        else:
+            payload['data'] = data
+        return payload
+
+    def _execute(self, queries):
+        """Funde as consultas por (filtro, agrupamento) e executa cada grupo uma vez"""
+        results = {}
+        groups = {}
+        for position, query in queries.items():
+            missing = self._missing_columns(query)
+            if missing:
+                results[position] = self._payload(query.widget, error=f"Coluna não encontrada: {', '.join(missing)}")
+                continue
+            if query.measure is not None and not pd.api.types.is_numeric_dtype(self.df[query.measure]):
+                results[position] = self._payload(query.widget, error=f'Coluna não numérica: {query.measure}')
+                continue
+            if query.group and query.group[0] == 'time' and not pd.api.types.is_datetime64_any_dtype(self.df[query.group[1]]):
+                results[position] = self._payload(query.widget, error=f'Coluna {query.group[1]!r} não é uma coluna de data')
+                continue
+            groups.setdefault(query.fuse_key, []).append((position, query))
+
+        # Uma leitura das linhas com as colunas de todos os grupos fora do cubo
+        row_groups = {key: members for key, members in groups.items() if not self._from_cube(key, members)}
+        frame = self._scan(row_groups)
+        masks = {}
+        for (filter, group), members in groups.items():
+            self.stats['groups'] += 1
+            if (filter, group) not in row_groups:
+                self.stats['from_cube'] += 1
+                values = self._cube_group(group, {query.measure for _, query in members})
+            else:
+                if filter not in masks:
+                    masks[filter] = self._mask(frame, filter)
+                rows = frame if masks[filter] is None else frame[masks[filter]]
+                values = self._row_group(rows, group, members)
+            for position, query in members:
+                results[position] = self._payload(query.widget, self._widget_data(query, values))
+        return results
+
+    def _missing_columns(self, query):
+        needed = [query.measure] if query.group != ('sample',) else []
+        if query.group and query.group[0] in ('time', 'category'):
+            needed.append(query.group[1])
+        needed.extend(col for col, _ in query.filter)
+        return [str(col) for col in needed if col not in self.df.columns]
+
+    def _from_cube(self, key, members):
+        filter, group = key
+        if self.cube is None or filter or group == ('sample',):
+            return False
+        if not all(self.cube.has_measure(query.measure) for _, query in members):
+            return False
+        if group is None:
+            return True
+        if group[0] == 'time':
+            return group[1] == self.cube.date_column
+        return self.cube.has_dimension(group[1])
+
+    def _scan(self, row_groups):
+        columns = []
+        for (filter, group), members in row_groups.items():
+            columns.extend(col for col, _ in filter)
+            if group and group[0] in ('time', 'category'):
+                columns.append(group[1])
+            for _, query in members:
+                if group == ('sample',):
+                    # Amostra sem colunas escolhidas: todas
+                    columns.extend(query.columns or self.df.columns)
+                else:
+                    columns.append(query.measure)
+        columns = [col for col in dict.fromkeys(columns) if col in self.df.columns]
+        return self.df[columns]
+
+    def _mask(self, frame, filter):
+        if not filter:
+            return None
+        mask = np.ones(len(frame), dtype=bool)
+        for col, values in filter:
+            mask &= frame[col].astype(str).isin(values).to_numpy()
+        return mask
+
+    def _row_group(self, rows, group, members):
+        """Todas as medidas do grupo numa agregação sobre as linhas"""
+        if group == ('sample',):
+            limit = max((int(query.widget.get('rows') or 10) for _, query in members), default=10)
+            return rows.head(limit)
+        measures = list(dict.fromkeys(query.measure for _, query in members))
+        if group is None:
+            return rows[measures].sum()
+        if group[0] == 'category':
+            sums = rows.groupby(group[1], sort=True, observed=True)[measures].sum()
+            sums.index = sums.index.astype(str)
+            return sums
+        days = dates.epoch_days(rows[group[1]])
+        valid = days != dates.NAT_DAY
+        return rows.loc[valid, measures].groupby(days[valid], sort=True).sum()
+
+    def _cube_group(self, group, measures):
+        """Mesmas somas do _row_group, lidas do cubo diário"""
+        columns = {f'{measure}__sum': measure for measure in measures}
+        if group is None:
+            totals = self.cube.totals()
+            return pd.Series({measure: float(totals.get(col, 0.0)) for col, measure in columns.items()})
+        if group[0] == 'category':
+            return self.cube.by_dimension(group[1])[list(columns)].rename(columns=columns)
+        daily = self.cube.daily()
+        daily = daily[daily['rows'] > 0][list(columns)].rename(columns=columns)
+        daily.index = dates.epoch_days(daily.index.to_series())
+        return daily
+
+    def _by_interval(self, daily, interval):
+        """
+        Somas por dia (índice: dias desde 1970) reagrupadas no intervalo
+
+        Returns:
+            (intervalo, somas indexadas pelo rótulo do intervalo)
+        """
+        days = daily.index.to_numpy(dtype=np.int64)
+        if interval == 'auto':
+            interval = 'month' if len(days) and days.max() - days.min() > AUTO_DAYS else 'day'
+        if interval == 'day':
+            sums = daily.groupby(days, sort=True).sum()
+            sums.index = np.datetime_as_string(sums.index.to_numpy(dtype=np.int64).astype('datetime64[D]'))
+        elif interval == 'month':
+            sums = daily.groupby(dates.month_numbers(days), sort=True).sum()
+            sums.index = np.datetime_as_string(sums.index.to_numpy(dtype=np.int64).astype('datetime64[M]'))
+        else:
+            year, week = dates.iso_weeks(days)
+            sums = daily.groupby(year * 100 + week, sort=True).sum()
+            sums.index = [f'{key // 100}-W{key % 100:02d}' for key in sums.index.to_numpy()]
+        return interval, sums
+
+    def _widget_data(self, query, values):
+        widget = query.widget
+        if query.group is None:
+            return {'value': float(values.get(query.measure, 0.0)), 'format': widget.get('format')}
+        if query.group == ('sample',):
+            columns = [col for col in query.columns if col in values.columns] or list(values.columns)
+            limit = int(widget.get('rows') or 10)
+            return {'columns': columns, 'rows': serialization.frame_records(values[columns].head(limit))}
+
+        if query.group[0] == 'category':
+            series = values[query.measure].sort_values(ascending=False, kind='stable')
+            series = series.head(int(widget.get('top_n') or 10))
+            return {'bars': serialization.records({'label': series.index, 'value': serialization.floats(series)})}
+        interval, sums = self._by_interval(values[[query.measure]], query.interval)
+        series = sums[query.measure]
+        return {
+            'interval': interval,
+            'points': serialization.records({'label': series.index, 'value': serialization.floats(series)}),
+        }
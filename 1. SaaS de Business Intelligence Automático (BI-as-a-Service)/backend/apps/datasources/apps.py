@@ -5,3 +5,6 @@ class DatasourcesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.datasources'
     verbose_name = 'Fontes de Dados'
+
+    def ready(self):
+        from . import signals  # noqa: F401
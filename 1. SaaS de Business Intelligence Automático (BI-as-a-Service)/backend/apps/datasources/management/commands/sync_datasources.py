@@ -1,11 +1,11 @@
-from datetime import timedelta
 import logging
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
 from django.utils import timezone
 
 from apps.datasources.models import DataSource
-from apps.datasources.services import DataSourceService
+from apps.datasources.services import SyncRunner
 
 logger = logging.getLogger(__name__)
 
@@ -19,68 +19,112 @@ class Command(BaseCommand):
             action='store_true',
             help='Força a sincronização independentemente da frequência configurada.',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Número de fontes sincronizadas em paralelo (padrão: 4).',
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=2,
+            help='Sincronizações simultâneas por host de origem (padrão: 2).',
+        )
+        parser.add_argument(
+            '--min-interval',
+            type=float,
+            default=1.0,
+            help='Intervalo mínimo em segundos entre requisições ao mesmo host (padrão: 1.0).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista as fontes vencidas e a carga prevista, sem sincronizar.',
+        )
 
     def handle(self, *args, **options):
-        service = DataSourceService()
-        force = options.get('force', False)
         now = timezone.now()
+        try:
+            runner = SyncRunner(
+                workers=options['workers'],
+                per_host=max(1, options['per_host']),
+                min_interval=max(0.0, options['min_interval']),
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options.get('force', False):
+            queryset = DataSource.objects.filter(auto_sync=True, is_active=True).not_syncing(now)
+        else:
+            queryset = DataSource.objects.due_for_sync(now)
+        # Fontes há mais tempo sem sincronizar primeiro
+        datasources = list(queryset.order_by(F('last_synced_at').asc(nulls_first=True)))
+
+        if not datasources:
+            self.stdout.write(self.style.WARNING('Nenhuma fonte com sincronização pendente encontrada.'))
+            return
 
-        synced = 0
-        skipped = 0
-        errors = 0
-
-        queryset = DataSource.objects.filter(auto_sync=True, is_active=True)
-        total = queryset.count()
-
-        if total == 0:
-            self.stdout.write(self.style.WARNING('Nenhuma fonte com auto_sync habilitado encontrada.'))
+        if options['dry_run']:
+            self._print_plan(runner.plan(datasources))
             return
 
-        for datasource in queryset:
-            if not force and not self._should_sync(datasource, now):
-                skipped += 1
-                continue
-
-            try:
-                service.sync_datasource(datasource)
-                synced += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Sincronizado: {datasource.name} ({datasource.get_source_type_display()})'
-                    )
-                )
-            except Exception as exc:  # noqa: BLE001
-                errors += 1
-                logger.exception('Erro ao sincronizar datasource %s: %s', datasource.id, exc)
-                self.stderr.write(
-                    self.style.ERROR(f'Erro ao sincronizar {datasource.name}: {exc}')
-                )
+        started = timezone.now()
+        results = runner.run(datasources, on_result=self._print_result)
+        elapsed = (timezone.now() - started).total_seconds()
+
+        counts = {'success': 0, 'failed': 0, 'skipped': 0}
+        for result in results:
+            counts[result['status']] += 1
+        total_bytes = sum(result.get('bytes') or 0 for result in results)
 
         summary = (
-            f'Sincronização concluída. Processadas: {total} | '
-            f'Sincronizadas: {synced} | Ignoradas: {skipped} | Erros: {errors}'
+            f'Sincronização concluída em {elapsed:.1f}s. Processadas: {len(results)} | '
+            f'Sincronizadas: {counts["success"]} | Ignoradas: {counts["skipped"]} | '
+            f'Erros: {counts["failed"]} | Lidos: {self._format_bytes(total_bytes)}'
         )
         self.stdout.write(self.style.SUCCESS(summary))
 
-    def _should_sync(self, datasource: DataSource, now) -> bool:
-        if datasource.sync_frequency == 'manual':
-            return False
-
-        last_sync = datasource.last_synced_at
-        if not last_sync:
-            return True
-
-        delta = now - last_sync
-
-        frequency_map = {
-            'hourly': timedelta(hours=1),
-            '6hours': timedelta(hours=6),
-            'daily': timedelta(days=1),
-        }
-
-        expected_interval = frequency_map.get(datasource.sync_frequency)
-
-        if not expected_interval:
-            return False
+    def _print_result(self, result):
+        name = result.get('name', f'#{result["id"]}')
+        if result['status'] == 'success':
+            self.stdout.write(self.style.SUCCESS(
+                f'Sincronizado: {name} em {result.get("duration") or 0:.2f}s '
+                f'({self._format_bytes(result.get("bytes") or 0)})'
+            ))
+        elif result['status'] == 'failed':
+            self.stderr.write(self.style.ERROR(f'Erro ao sincronizar {name}: {result["error"]}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Ignorada (sincronização em andamento): {name}'))
+
+    def _print_plan(self, plan):
+        self.stdout.write(f'Fontes vencidas: {plan["total"]}')
+        for item in plan['sources']:
+            last_sync = item['last_synced_at'].isoformat() if item['last_synced_at'] else 'nunca'
+            if item['expected_seconds'] is None:
+                expected = 'sem histórico'
+            else:
+                expected = (
+                    f'~{item["expected_seconds"]:.2f}s, '
+                    f'{self._format_bytes(item["expected_bytes"] or 0)}'
+                )
+            self.stdout.write(
+                f'  [{item["id"]}] {item["name"]} ({item["source_type"]}, {item["host"] or "local"}) '
+                f'- última: {last_sync} - previsto: {expected}'
+            )
+
+        hosts = ', '.join(f'{host}: {count}' for host, count in sorted(plan['by_host'].items()))
+        self.stdout.write(f'Por host: {hosts}')
+        self.stdout.write(
+            f'Carga prevista: {self._format_bytes(plan["expected_bytes"])} | '
+            f'tempo serial ~{plan["serial_seconds"]:.1f}s | '
+            f'estimado com {plan["workers"]} workers ~{plan["estimated_seconds"]:.1f}s'
+            + (f' (+{plan["without_history"]} fontes sem histórico)' if plan['without_history'] else '')
+        )
 
-        return delta >= expected_interval
+    @staticmethod
+    def _format_bytes(size):
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if size < 1024 or unit == 'GB':
+                return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+            size /= 1024
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasources", "0002_datasource_created_by_datasource_row_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datasource",
+            name="sync_error",
+            field=models.TextField(blank=True, verbose_name="erro da sincronização"),
+        ),
+        migrations.AddField(
+            model_name="datasource",
+            name="sync_progress",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="progresso da sincronização"),
+        ),
+        migrations.AddField(
+            model_name="datasource",
+            name="sync_started_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="início da sincronização"),
+        ),
+        migrations.AddField(
+            model_name="datasource",
+            name="sync_status",
+            field=models.CharField(choices=[("idle", "Ocioso"), ("pending", "Na fila"), ("running", "Processando"), ("success", "Concluído"), ("failed", "Falhou")], default="idle", max_length=20, verbose_name="status da sincronização"),
+        ),
+        migrations.AddField(
+            model_name="datasource",
+            name="sync_step",
+            field=models.CharField(blank=True, max_length=30, verbose_name="etapa da sincronização"),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasources", "0003_datasource_sync_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datasource",
+            name="last_sync_bytes",
+            field=models.BigIntegerField(blank=True, null=True, verbose_name="bytes lidos na última sincronização"),
+        ),
+        migrations.AddField(
+            model_name="datasource",
+            name="last_sync_duration",
+            field=models.FloatField(blank=True, null=True, verbose_name="duração da última sincronização (s)"),
+        ),
+        migrations.AddIndex(
+            model_name="datasource",
+            index=models.Index(fields=["sync_frequency", "last_synced_at", "is_active", "auto_sync"], name="datasource_due_sync_idx"),
+        ),
+    ]
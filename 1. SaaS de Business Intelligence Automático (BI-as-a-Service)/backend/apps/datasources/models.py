@@ -1,7 +1,54 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+# Intervalo entre sincronizações automáticas por frequência
+SYNC_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    '6hours': timedelta(hours=6),
+    'daily': timedelta(days=1),
+}
+
+# Sincronizações em andamento; mais velhas que STALE_SYNC são consideradas
+# abandonadas (worker morto) e não bloqueiam uma nova
+ACTIVE_SYNC_STATUSES = ('pending', 'running')
+STALE_SYNC = timedelta(hours=1)
+
+# Fontes cujos dados chegam por upload (nada para buscar na origem)
+LOCAL_SOURCE_TYPES = ('csv_upload', 'xlsx_upload')
+
+
+class DataSourceQuerySet(models.QuerySet):
+    
+    def not_syncing(self, now):
+        """Fontes sem sincronização em andamento"""
+        return self.exclude(
+            sync_status__in=ACTIVE_SYNC_STATUSES,
+            sync_started_at__gte=now - STALE_SYNC,
+        )
+    
+    def due_for_sync(self, now):
+        """
+        Fontes com auto_sync cuja frequência já venceu, em uma única consulta
+        
+        Cada termo do OR fixa a frequência, então todos são buscas no índice
+        datasource_due_sync_idx (sync_frequency, last_synced_at, ...).
+        Uploads não têm origem para sincronizar e ficam de fora.
+        """
+        due = models.Q()
+        for frequency, interval in SYNC_INTERVALS.items():
+            due |= models.Q(sync_frequency=frequency, last_synced_at__isnull=True)
+            due |= models.Q(sync_frequency=frequency, last_synced_at__lte=now - interval)
+        return self.filter(
+            due,
+            is_active=True,
+            auto_sync=True,
+        ).exclude(
+            source_type__in=LOCAL_SOURCE_TYPES,
+        ).not_syncing(now)
+
 
 class DataSource(models.Model):
     """Data source model for connecting to external data."""
@@ -57,6 +104,27 @@ class DataSource(models.Model):
     
     last_synced_at = models.DateTimeField(_('última sincronização'), null=True, blank=True)
     
+    # Pipeline de sincronização (apps.datasources.tasks)
+    SYNC_STATUS_CHOICES = [
+        ('idle', 'Ocioso'),
+        ('pending', 'Na fila'),
+        ('running', 'Processando'),
+        ('success', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+    sync_status = models.CharField(
+        _('status da sincronização'),
+        max_length=20,
+        choices=SYNC_STATUS_CHOICES,
+        default='idle'
+    )
+    sync_step = models.CharField(_('etapa da sincronização'), max_length=30, blank=True)
+    sync_progress = models.PositiveSmallIntegerField(_('progresso da sincronização'), default=0)
+    sync_error = models.TextField(_('erro da sincronização'), blank=True)
+    sync_started_at = models.DateTimeField(_('início da sincronização'), null=True, blank=True)
+    last_sync_duration = models.FloatField(_('duração da última sincronização (s)'), null=True, blank=True)
+    last_sync_bytes = models.BigIntegerField(_('bytes lidos na última sincronização'), null=True, blank=True)
+    
     # Status
     is_active = models.BooleanField(_('ativo'), default=True)
     
@@ -64,10 +132,18 @@ class DataSource(models.Model):
     created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
     
+    objects = DataSourceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('fonte de dados')
         verbose_name_plural = _('fontes de dados')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['sync_frequency', 'last_synced_at', 'is_active', 'auto_sync'],
+                name='datasource_due_sync_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_source_type_display()})"
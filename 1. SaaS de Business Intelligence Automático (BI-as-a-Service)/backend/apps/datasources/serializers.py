@@ -13,10 +13,18 @@ class DataSourceSerializer(serializers.ModelSerializer):
             'is_active',
             'last_synced_at',
             'row_count',
+            'sync_status',
+            'sync_step',
+            'sync_progress',
+            'sync_error',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['id', 'last_synced_at', 'row_count', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'last_synced_at', 'row_count',
+            'sync_status', 'sync_step', 'sync_progress', 'sync_error',
+            'created_at', 'updated_at',
+        ]
 
     def validate(self, data):
         # Validar limites do plano
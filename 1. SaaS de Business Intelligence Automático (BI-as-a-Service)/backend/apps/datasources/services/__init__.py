@@ -0,0 +1,20 @@
+from .datasource_service import DataSourceService
+from .data_ingestion_service import DataIngestionService, RowLimitExceeded
+from .profile_service import DataProfileService
+from .snapshot_store import SnapshotStore
+from .statistics_accumulator import StatisticsAccumulator
+from .sync_runner import HostRateLimiter, SyncRunner
+from .type_inference import TypedSchema, TypeInferenceEngine
+
+__all__ = [
+    'DataSourceService',
+    'DataIngestionService',
+    'DataProfileService',
+    'RowLimitExceeded',
+    'SnapshotStore',
+    'StatisticsAccumulator',
+    'HostRateLimiter',
+    'SyncRunner',
+    'TypedSchema',
+    'TypeInferenceEngine',
+]
@@ -0,0 +1,181 @@
+"""
+Daily aggregate cubes
+Rollups per day (and per day x dimension) built once at ingestion, so
+dashboards can compute KPIs and charts without scanning the raw rows
+"""
+import pandas as pd
+
+# Dimension/member of the rows holding the per-day totals
+TOTAL = ''
+
+
+class AggregateCubeBuilder:
+    """
+    Accumulates daily rollups chunk by chunk
+
+    The date column is the first datetime column; measures are the numeric
+    columns and dimensions the text columns. For every day (and every
+    day x dimension member) it keeps the row count plus sum and count of
+    each measure. Dimensions with more than MAX_MEMBERS distinct values
+    (ids, customer names...) are dropped: they would not be smaller than
+    the rows themselves.
+    """
+
+    MAX_MEMBERS = 1000
+
+    def __init__(self):
+        self.date_column = None
+        self.measures = None
+        self.dimensions = None
+        # (dimension, rollup) pairs; tagged so dropping a dimension never reads the rows
+        self._parts = []
+        self._members = {}
+
+    def update(self, df: pd.DataFrame):
+        if self.measures is None:
+            self._detect_columns(df)
+        if self.date_column is None or self.date_column not in df.columns:
+            return
+
+        for measure in list(self.measures):
+            if not pd.api.types.is_numeric_dtype(df[measure]):
+                # Column turned into text in a later chunk
+                self._drop_measure(measure)
+
+        days = df[self.date_column].dt.normalize()
+        valid = days.notna()
+        if not valid.any():
+            return
+        frame = df.loc[valid, self.measures + self.dimensions].assign(day=days[valid])
+
+        self._append(TOTAL, self._rollup(frame, TOTAL))
+        for dimension in list(self.dimensions):
+            members = self._members.setdefault(dimension, set())
+            members.update(frame[dimension].dropna().unique().tolist())
+            if len(members) > self.MAX_MEMBERS:
+                self._drop_dimension(dimension)
+                continue
+            self._append(dimension, self._rollup(frame, dimension))
+
+    def _append(self, dimension: str, rollup: pd.DataFrame):
+        # A dimension with no value in the chunk (e.g. an empty column) has no groups
+        if not rollup.empty:
+            self._parts.append((dimension, rollup))
+
+    def _detect_columns(self, df: pd.DataFrame):
+        self.measures, self.dimensions = [], []
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                if self.date_column is None:
+                    self.date_column = col
+            elif pd.api.types.is_bool_dtype(series):
+                self.dimensions.append(col)
+            elif pd.api.types.is_numeric_dtype(series):
+                self.measures.append(col)
+            else:
+                self.dimensions.append(col)
+
+    def _rollup(self, frame: pd.DataFrame, dimension: str) -> pd.DataFrame:
+        keys = ['day'] if dimension == TOTAL else ['day', dimension]
+        grouped = frame.groupby(keys, sort=False, observed=True)
+
+        rollup = grouped.size().rename('rows').to_frame()
+        if self.measures:
+            sums = grouped[self.measures].sum().astype('float64').add_suffix('__sum')
+            counts = grouped[self.measures].count().add_suffix('__count')
+            rollup = rollup.join(sums).join(counts)
+        rollup = rollup.reset_index()
+
+        if dimension == TOTAL:
+            rollup.insert(1, 'member', TOTAL)
+        else:
+            rollup = rollup.rename(columns={dimension: 'member'})
+            rollup['member'] = rollup['member'].astype(str)
+        rollup.insert(1, 'dimension', dimension)
+        return rollup
+
+    def _drop_measure(self, measure: str):
+        self.measures.remove(measure)
+        columns = [f'{measure}__sum', f'{measure}__count']
+        self._parts = [(dimension, part.drop(columns=columns)) for dimension, part in self._parts]
+
+    def _drop_dimension(self, dimension: str):
+        self.dimensions.remove(dimension)
+        self._members.pop(dimension, None)
+        self._parts = [(name, part) for name, part in self._parts if name != dimension]
+
+    def build(self):
+        """Final cube, or None when the data has no date column"""
+        if not self._parts:
+            return None
+        frame = pd.concat([part for _, part in self._parts], ignore_index=True)
+        # Chunks may share days: merge their partial rollups
+        cube = frame.groupby(['dimension', 'member', 'day'], sort=True).sum().reset_index()
+        # Dictionary-encoded labels: compact on disk, cheap to filter on read
+        cube['dimension'] = cube['dimension'].astype('category')
+        cube['member'] = cube['member'].astype('category')
+        return AggregateCube(cube, self.date_column, self.measures, self.dimensions)
+
+
+class AggregateCube:
+    """
+    Read side of a daily cube
+
+    `frame` has one row per (dimension, member, day) with `rows`,
+    `<measure>__sum` and `<measure>__count`; the per-day totals use the
+    empty dimension.
+    """
+
+    def __init__(self, frame: pd.DataFrame, date_column, measures, dimensions):
+        self.frame = frame
+        self.date_column = date_column
+        self.measures = list(measures)
+        self.dimensions = list(dimensions)
+
+    def to_meta(self):
+        return {
+            'date_column': self.date_column,
+            'measures': self.measures,
+            'dimensions': self.dimensions,
+        }
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, meta: dict):
+        frame = frame.copy(deep=False)
+        frame['day'] = pd.to_datetime(frame['day'])
+        for col in ('dimension', 'member'):
+            if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype('category')
+        return cls(frame, meta['date_column'], meta['measures'], meta['dimensions'])
+
+    def between(self, start=None, end=None) -> 'AggregateCube':
+        """Days in [start, end); bounds with a time of day round up to the next day"""
+        mask = pd.Series(True, index=self.frame.index)
+        if start is not None:
+            mask &= self.frame['day'] >= pd.Timestamp(start).ceil('D')
+        if end is not None:
+            mask &= self.frame['day'] < pd.Timestamp(end).ceil('D')
+        return AggregateCube(self.frame[mask], self.date_column, self.measures, self.dimensions)
+
+    def has_measure(self, col) -> bool:
+        return col in self.measures
+
+    def has_dimension(self, col) -> bool:
+        return col in self.dimensions
+
+    def daily(self) -> pd.DataFrame:
+        """Per-day totals indexed by day"""
+        totals = self.frame[self.frame['dimension'] == TOTAL]
+        return totals.drop(columns=['dimension', 'member']).set_index('day')
+
+    def totals(self) -> pd.Series:
+        """Totals over all days: rows, <measure>__sum, <measure>__count"""
+        return self.daily().sum(numeric_only=True)
+
+    def by_dimension(self, dimension) -> pd.DataFrame:
+        """Totals per member (sorted by member), members without rows excluded"""
+        members = self.frame[self.frame['dimension'] == dimension]
+        grouped = members.drop(columns=['dimension', 'day']).groupby('member', sort=True, observed=True).sum()
+        grouped.index = grouped.index.astype(str)
+        return grouped[grouped['rows'] > 0]
@@ -0,0 +1,189 @@
+"""
+Join and union of snapshot tables
+Join keys are factorized once into dense integer codes shared by both sides,
+so matching is integer indexing instead of per-row hashing, and only the
+matching row pairs are ever built (never the cross product). Unions align
+the schemas first: missing columns become nulls and conflicting types are
+promoted like the snapshot writer does.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .snapshot_store import promote_type
+
+# Join output bound: keys duplicated on both sides multiply rows
+MAX_JOIN_ROWS = 5_000_000
+JOIN_TYPES = ('left', 'inner')
+
+
+def _plain(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Dictionary columns as their value type"""
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+
+def factorize_keys(left: pa.Table, right: pa.Table, left_on, right_on):
+    """
+    Dense int64 codes of the key tuples of both tables
+
+    Equal key tuples get the same code on both sides; rows with a null in
+    any key part get -1 (they never match). Key columns of different types
+    are compared as text.
+
+    Returns (left_codes, right_codes, number of distinct codes)
+    """
+    n_left = left.num_rows
+    codes = np.zeros(n_left + right.num_rows, dtype=np.int64)
+    nulls = np.zeros(len(codes), dtype=bool)
+    size = 1
+
+    for left_col, right_col in zip(left_on, right_on):
+        left_values, right_values = _plain(left.column(left_col)), _plain(right.column(right_col))
+        if not left_values.type.equals(right_values.type):
+            left_values, right_values = left_values.cast(pa.string()), right_values.cast(pa.string())
+        both = pa.chunked_array(left_values.chunks + right_values.chunks, type=left_values.type)
+        # One hash table over both sides: codes are comparable across them
+        encoded = pc.dictionary_encode(both).combine_chunks()
+        part = pc.fill_null(encoded.indices, -1).to_numpy().astype(np.int64)
+        nulls |= part < 0
+        cardinality = max(len(encoded.dictionary), 1)
+
+        codes = codes * cardinality + np.maximum(part, 0)
+        size *= cardinality
+        if size > np.iinfo(np.int32).max:
+            # Keep combined codes dense so the next product can't overflow
+            encoded = pc.dictionary_encode(pa.array(codes)).combine_chunks()
+            codes = encoded.indices.to_numpy().astype(np.int64)
+            size = len(encoded.dictionary)
+
+    if size > len(codes):
+        encoded = pc.dictionary_encode(pa.array(codes)).combine_chunks()
+        codes = encoded.indices.to_numpy().astype(np.int64)
+        size = len(encoded.dictionary)
+    codes[nulls] = -1
+    return codes[:n_left], codes[n_left:], size
+
+
+def join_indices(left_codes: np.ndarray, right_codes: np.ndarray, size: int, how='left'):
+    """
+    Row positions of a hash join on factorized keys
+
+    Output rows follow the left table order; every left row is repeated once
+    per matching right row. Unmatched left rows (how='left') get right
+    position -1.
+
+    Returns (left_positions, right_positions)
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f'Tipo de junção inválido: {how}')
+
+    valid = right_codes >= 0
+    counts = np.bincount(right_codes[valid], minlength=size)
+    safe_codes = np.maximum(left_codes, 0)
+    matches = np.where(left_codes >= 0, counts[safe_codes], 0)
+    per_left = np.maximum(matches, 1) if how == 'left' else matches
+
+    total = int(per_left.sum())
+    if total > MAX_JOIN_ROWS:
+        raise ValueError(
+            f'A junção geraria {total} linhas (limite {MAX_JOIN_ROWS}); '
+            'verifique se a chave identifica as linhas da outra fonte'
+        )
+
+    if counts.max(initial=0) <= 1:
+        # Right keys are unique (e.g. a catalog): one lookup per left row
+        lookup = np.full(size, -1, dtype=np.int64)
+        lookup[right_codes[valid]] = np.flatnonzero(valid)
+        right_positions = np.where(left_codes >= 0, lookup[safe_codes], -1)
+        if how == 'left':
+            return np.arange(len(left_codes)), right_positions
+        kept = np.flatnonzero(right_positions >= 0)
+        return kept, right_positions[kept]
+
+    # Right rows grouped by code: group g starts at starts[g] in `order`
+    order = np.flatnonzero(valid)[np.argsort(right_codes[valid], kind='stable')]
+    starts = np.cumsum(counts) - counts
+
+    left_positions = np.repeat(np.arange(len(left_codes)), per_left)
+    first_output = np.repeat(np.cumsum(per_left) - per_left, per_left)
+    within = np.arange(total) - first_output
+    matched = np.repeat(matches > 0, per_left)
+    slots = np.where(matched, np.repeat(starts[safe_codes], per_left) + within, 0)
+    right_positions = np.where(matched, order[slots] if len(order) else -1, -1)
+    return left_positions, right_positions
+
+
+def joined_names(left_names, right_names, right_on, suffix='_2'):
+    """{right column: output name} of the right columns a join appends"""
+    names, renamed = list(left_names), {}
+    for name in right_names:
+        if name in right_on:
+            continue
+        renamed[name] = f'{name}{suffix}' if name in names else name
+        names.append(renamed[name])
+    return renamed
+
+
+def hash_join(left: pa.Table, right: pa.Table, left_on, right_on, how='left', suffix='_2') -> pa.Table:
+    """
+    Left columns plus the non-key columns of `right` for matching rows
+
+    left_on / right_on: key column names (same length). Right columns whose
+    name already exists on the left get `suffix`.
+    """
+    if len(left_on) != len(right_on) or not left_on:
+        raise ValueError('Informe as mesmas quantidades de colunas de junção nas duas fontes')
+    for table, columns in ((left, left_on), (right, right_on)):
+        missing = [col for col in columns if col not in table.column_names]
+        if missing:
+            raise ValueError(f"Colunas de junção inexistentes: {', '.join(missing)}")
+
+    left_codes, right_codes, size = factorize_keys(left, right, left_on, right_on)
+    left_positions, right_positions = join_indices(left_codes, right_codes, size, how=how)
+
+    if len(left_positions) != left.num_rows or not np.array_equal(left_positions, np.arange(left.num_rows)):
+        left = left.take(pa.array(left_positions))
+    right_indices = pa.array(right_positions, mask=right_positions < 0)
+
+    columns, names = list(left.columns), list(left.column_names)
+    for name, output in joined_names(left.column_names, right.column_names, right_on, suffix).items():
+        # Null positions produce nulls: unmatched left rows
+        columns.append(right.column(name).take(right_indices))
+        names.append(output)
+    return pa.table(columns, names=names)
+
+
+def union_tables(tables, labels=None, label_column=None) -> pa.Table:
+    """
+    Rows of every table, with the columns of all of them
+
+    Columns keep the order they first appear in; a table without a column
+    gets nulls there. label_column: extra column with the label of the
+    table each row came from (labels, same length as tables).
+    """
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            field_type = _plain(table.column(field.name)).type
+            types[field.name] = promote_type(types[field.name], field_type) if field.name in types else field_type
+
+    aligned = []
+    for position, table in enumerate(tables):
+        columns = []
+        for name, field_type in types.items():
+            if name in table.column_names:
+                column = _plain(table.column(name))
+                columns.append(column if column.type.equals(field_type) else column.cast(field_type))
+            else:
+                columns.append(pa.nulls(table.num_rows, field_type))
+        names = list(types)
+        if label_column:
+            columns.append(pa.array([str(labels[position])] * table.num_rows, pa.string()).dictionary_encode())
+            names.append(label_column)
+        aligned.append(pa.table(columns, names=names))
+
+    if not aligned:
+        return pa.table({})
+    return pa.concat_tables(aligned)
@@ -3,22 +3,46 @@ Data ingestion and persistence service
 Handles data normalization, validation, and storage
 """
 import pandas as pd
-import numpy as np
+import pyarrow as pa
 import json
-from datetime import datetime
 from django.utils import timezone
-from django.core.cache import cache
 import hashlib
 import logging
 
+from .snapshot_store import SnapshotStore
+from .statistics_accumulator import StatisticsAccumulator
+from .aggregate_cube import AggregateCube, AggregateCubeBuilder
+from . import dates, serialization
+from .type_inference import DATE, TypedSchema, TypeInferenceEngine
+from ..signals import snapshot_updated
+
 logger = logging.getLogger(__name__)
 
 
+class RowLimitExceeded(ValueError):
+    """Raised while streaming a source that has more rows than allowed"""
+    
+    def __init__(self, limit, rows_read):
+        self.limit = limit
+        self.rows_read = rows_read
+        super().__init__(f'Arquivo excede o limite de {limit} linhas')
+
+
 class DataIngestionService:
     """Service for ingesting and persisting data from external sources"""
     
-    def __init__(self):
+    # Rows kept inline in the snapshot metadata for previews
+    SAMPLE_ROWS = 20
+    # Rows read per chunk when streaming files
+    CHUNK_SIZE = 20000
+    # Bump when normalization (or the snapshot layout) changes, so unchanged
+    # sources are re-ingested once
+    HASH_VERSION = 3
+    
+    def __init__(self, store: SnapshotStore = None):
         self.max_rows = 100000  # Safety limit
+        self.store = store or SnapshotStore()
+        self.type_engine = TypeInferenceEngine()
     
     def ingest_dataframe(self, datasource, df: pd.DataFrame):
         """
@@ -26,10 +50,14 @@ class DataIngestionService:
         
         Steps:
         1. Validate DataFrame
-        2. Normalize columns
-        3. Generate snapshot
-        4. Persist to cache and/or database
-        5. Update datasource metadata
+        2. Skip everything if the content hash matches the current snapshot
+        3. Normalize columns
+        4. Generate snapshot
+        5. Persist to storage and database
+        6. Update datasource metadata
+        
+        The returned snapshot has `changed` set to False when the data was
+        unchanged and nothing was rewritten.
         """
         try:
             # Validate
@@ -40,28 +68,196 @@ class DataIngestionService:
                 logger.warning(f"DataFrame has {len(df)} rows, truncating to {self.max_rows}")
                 df = df.head(self.max_rows)
             
+            # Change detection on the raw data, before any normalization
+            data_hash = self.compute_data_hash(df)
+            current = self.get_unchanged_snapshot(datasource, data_hash)
+            if current:
+                datasource.last_synced_at = timezone.now()
+                datasource.save(update_fields=['last_synced_at', 'updated_at'])
+                logger.info(f"Data unchanged for datasource {datasource.id}, skipping ingestion")
+                return {**current, 'changed': False}
+            
             # Normalize
-            df_normalized = self.normalize_dataframe(df)
+            df_normalized, typed_schema = self._normalize(df)
             
             # Generate snapshot
-            snapshot = self.create_snapshot(datasource, df_normalized)
+            snapshot = self.create_snapshot(datasource, df_normalized, data_hash=data_hash, typed_schema=typed_schema)
             
             # Persist
-            self.persist_snapshot(datasource, snapshot)
+            self.persist_snapshot(datasource, snapshot, df_normalized)
             
             # Update datasource metadata
-            datasource.row_count = len(df_normalized)
-            datasource.last_synced_at = timezone.now()
-            datasource.save(update_fields=['row_count', 'last_synced_at', 'updated_at'])
+            self._mark_synced(datasource, len(df_normalized))
             
             logger.info(f"Successfully ingested {len(df_normalized)} rows for datasource {datasource.id}")
             
+            snapshot['changed'] = True
             return snapshot
             
         except Exception as e:
             logger.error(f"Error ingesting data for datasource {datasource.id}: {str(e)}")
             raise
     
+    def ingest_file(self, datasource, file, file_format='csv', row_limit=None):
+        """
+        Ingest an uploaded CSV/XLSX file in chunks, without loading it whole
+        
+        Column types are decided once from a bounded sample of the first
+        chunk; every chunk is then converted with that typed schema and
+        appended to the snapshot file. `row_limit` (plan limit) is checked while reading
+        and raises RowLimitExceeded; `max_rows` truncates like ingest_dataframe.
+        
+        The snapshot is always rewritten: the content hash is only known
+        after the last chunk, and it is a per-chunk hash that can't be
+        compared with compute_data_hash (see there). Every upload creates a
+        new datasource, so there is no earlier snapshot to keep anyway.
+        """
+        writer = self.store.open_writer(datasource, partition=True)
+        hasher = self._new_hasher()
+        seen_rows = set()
+        typed_schema = None
+        sample_df = None
+        accumulator = StatisticsAccumulator()
+        cube_builder = AggregateCubeBuilder()
+        rows_read = 0
+        
+        try:
+            for chunk in self.iter_file_chunks(file, file_format):
+                rows_read += len(chunk)
+                if row_limit is not None and rows_read > row_limit:
+                    raise RowLimitExceeded(row_limit, rows_read)
+                
+                truncated = rows_read > self.max_rows
+                if truncated:
+                    logger.warning(f"File has more than {self.max_rows} rows, truncating")
+                    chunk = chunk.head(len(chunk) - (rows_read - self.max_rows))
+                
+                self._update_hash(hasher, chunk, with_columns=typed_schema is None)
+                
+                chunk = self._clean_column_names(chunk).dropna(how='all')
+                if typed_schema is None:
+                    typed_schema = self.type_engine.infer(chunk)
+                chunk = self.type_engine.apply(chunk, typed_schema)
+                chunk = self._drop_seen_rows(chunk, seen_rows)
+                
+                if not chunk.empty:
+                    writer.write(chunk)
+                    accumulator.update(chunk)
+                    cube_builder.update(chunk)
+                    if sample_df is None:
+                        sample_df = chunk.head(self.SAMPLE_ROWS)
+                
+                if truncated:
+                    break
+            
+            if writer.row_count == 0:
+                raise ValueError("File is empty")
+            
+            data_hash = hasher.hexdigest()
+            storage_pointer = writer.close(data_hash)
+        except Exception as e:
+            writer.abort()
+            logger.error(f"Error ingesting file for datasource {datasource.id}: {str(e)}")
+            raise
+        
+        snapshot = self._build_snapshot(datasource, accumulator, data_hash, sample_df, typed_schema)
+        snapshot['changed'] = True
+        
+        self._save_snapshot_metadata(datasource, snapshot, storage_pointer, cube_builder.build())
+        self._mark_synced(datasource, writer.row_count)
+        
+        logger.info(f"Successfully ingested {writer.row_count} rows for datasource {datasource.id} (streaming)")
+        
+        return snapshot
+    
+    def iter_file_chunks(self, file, file_format='csv'):
+        """Yield DataFrames of at most CHUNK_SIZE rows from a CSV or XLSX file"""
+        if file_format == 'xlsx':
+            yield from self._iter_xlsx_chunks(file)
+            return
+        
+        with pd.read_csv(file, chunksize=self.CHUNK_SIZE) as reader:
+            for chunk in reader:
+                yield chunk
+    
+    def _iter_xlsx_chunks(self, file):
+        """Read the first worksheet row by row (openpyxl read-only mode)"""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                return
+            
+            columns = [
+                str(col) if col is not None else f'coluna_{i + 1}'
+                for i, col in enumerate(header)
+            ]
+            width = len(columns)
+            
+            buffer = []
+            for row in rows:
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                buffer.append(row)
+                if len(buffer) >= self.CHUNK_SIZE:
+                    yield pd.DataFrame.from_records(buffer, columns=columns)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame.from_records(buffer, columns=columns)
+        finally:
+            workbook.close()
+    
+    def compute_data_hash(self, df: pd.DataFrame) -> str:
+        """
+        Content hash of a raw DataFrame
+        
+        Hashes the vectorized per-row hashes (pd.util.hash_pandas_object)
+        instead of serializing the data. Row hashes depend on the dtypes, so
+        this is not the hash ingest_file computes chunk by chunk (each chunk
+        infers its own dtypes: ints in one, floats or text in another once
+        nulls appear). Both are stable for the same input, but only
+        ingest_dataframe compares against the current snapshot.
+        """
+        hasher = self._new_hasher()
+        self._update_hash(hasher, df, with_columns=True)
+        return hasher.hexdigest()
+    
+    def _new_hasher(self):
+        hasher = hashlib.md5()
+        hasher.update(f'v{self.HASH_VERSION}'.encode())
+        return hasher
+    
+    def _update_hash(self, hasher, chunk: pd.DataFrame, with_columns=False):
+        if with_columns:
+            hasher.update(','.join(str(col) for col in chunk.columns).encode())
+        hasher.update(pd.util.hash_pandas_object(chunk, index=False).values.tobytes())
+    
+    def get_unchanged_snapshot(self, datasource, data_hash):
+        """Current snapshot if it was built from data with this hash and its file is still there"""
+        if not datasource.connection_config.get('last_snapshot'):
+            return None
+        snapshot = self.get_snapshot(datasource)
+        if snapshot.get('data_hash') != data_hash:
+            return None
+        storage = snapshot.get('storage')
+        if not storage or not self.store.storage.exists(storage['path']):
+            return None
+        return snapshot
+    
+    def _drop_seen_rows(self, chunk: pd.DataFrame, seen_rows: set) -> pd.DataFrame:
+        """Drop rows duplicated within the chunk or already written by previous chunks"""
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False)
+        keep = ~row_hashes.duplicated() & ~row_hashes.isin(seen_rows)
+        seen_rows.update(row_hashes[keep].tolist())
+        return chunk[keep.values]
+    
+    def _mark_synced(self, datasource, row_count):
+        datasource.row_count = row_count
+        datasource.last_synced_at = timezone.now()
+        datasource.save(update_fields=['row_count', 'last_synced_at', 'updated_at'])
+    
     def normalize_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Normalize DataFrame:
@@ -70,13 +266,12 @@ class DataIngestionService:
         - Infer types
         - Remove duplicates
         """
-        df_clean = df.copy()
-        
-        # Clean column names
-        df_clean.columns = [
-            str(col).strip().lower().replace(' ', '_').replace('-', '_')
-            for col in df_clean.columns
-        ]
+        return self._normalize(df)[0]
+    
+    def _normalize(self, df: pd.DataFrame):
+        """normalize_dataframe plus the typed schema decided on the way"""
+        # Clean column names (returns a new frame; the caller's df is untouched)
+        df_clean = self._clean_column_names(df)
         
         # Remove completely empty rows
         df_clean = df_clean.dropna(how='all')
@@ -84,51 +279,19 @@ class DataIngestionService:
         # Remove duplicate rows
         df_clean = df_clean.drop_duplicates()
         
-        # Infer and convert types
-        df_clean = self._infer_types(df_clean)
+        # Infer types on a bounded sample, then convert
+        typed_schema = self.type_engine.infer(df_clean)
+        df_clean = self.type_engine.apply(df_clean, typed_schema)
         
-        return df_clean
+        return df_clean, typed_schema
     
-    def _infer_types(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Infer and convert column types intelligently
-        """
-        df_typed = df.copy()
-        
-        for col in df_typed.columns:
-            # Skip if already datetime
-            if pd.api.types.is_datetime64_any_dtype(df_typed[col]):
-                continue
-            
-            # Try to convert to numeric
-            try:
-                # Remove common currency symbols and thousands separators
-                if df_typed[col].dtype == 'object':
-                    cleaned = df_typed[col].astype(str).str.replace(r'[R$\s,]', '', regex=True)
-                    numeric_col = pd.to_numeric(cleaned, errors='coerce')
-                    
-                    # If more than 50% converted successfully, use numeric
-                    if numeric_col.notna().sum() / len(df_typed) > 0.5:
-                        df_typed[col] = numeric_col
-                        continue
-            except:
-                pass
-            
-            # Try to convert to datetime
-            try:
-                if df_typed[col].dtype == 'object':
-                    date_col = pd.to_datetime(df_typed[col], errors='coerce')
-                    
-                    # If more than 50% converted successfully, use datetime
-                    if date_col.notna().sum() / len(df_typed) > 0.5:
-                        df_typed[col] = date_col
-                        continue
-            except:
-                pass
-        
-        return df_typed
-    
-    def create_snapshot(self, datasource, df: pd.DataFrame):
+    def _clean_column_names(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.set_axis(
+            [str(col).strip().lower().replace(' ', '_').replace('-', '_') for col in df.columns],
+            axis=1,
+        )
+    
+    def create_snapshot(self, datasource, df: pd.DataFrame, data_hash=None, typed_schema: TypedSchema = None):
         """
         Create a snapshot of the data
         
@@ -136,158 +299,195 @@ class DataIngestionService:
         - metadata
         - schema
         - sample_data
-        - full_data (serialized)
+        
+        Row data is not part of the snapshot: it is written to the
+        snapshot store by persist_snapshot.
+        
+        data_hash: hash of the raw source data (see compute_data_hash);
+        defaults to the hash of df itself
+        typed_schema: types decided while normalizing; inferred from df
+        when not given
         """
         # Generate data hash for change detection
-        data_hash = hashlib.md5(
-            df.to_json(date_format='iso').encode()
-        ).hexdigest()
-        
-        # Extract schema
-        schema = {
-            col: {
-                'dtype': str(df[col].dtype),
-                'nullable': bool(df[col].isnull().any()),
-                'unique_count': int(df[col].nunique()),
-                'sample_values': df[col].dropna().head(5).tolist()
-            }
-            for col in df.columns
-        }
+        if data_hash is None:
+            data_hash = self.compute_data_hash(df)
+        
+        accumulator = StatisticsAccumulator()
+        accumulator.update(df)
+        
+        typed_schema = typed_schema or self.type_engine.infer(df)
         
-        # Create snapshot
-        snapshot = {
+        return self._build_snapshot(datasource, accumulator, data_hash, df.head(self.SAMPLE_ROWS), typed_schema)
+    
+    def _build_snapshot(self, datasource, accumulator: StatisticsAccumulator, data_hash, sample_df,
+                        typed_schema: TypedSchema = None):
+        """Assemble snapshot metadata from the statistics accumulated while ingesting"""
+        schema = accumulator.schema()
+        if typed_schema:
+            # Format the source text was parsed with; the stored column is datetime64
+            for col in typed_schema.of_type(DATE, columns=schema):
+                schema[col]['date_format'] = typed_schema[col]['format']
+        
+        return {
             'datasource_id': datasource.id,
             'timestamp': timezone.now().isoformat(),
-            'row_count': len(df),
-            'column_count': len(df.columns),
+            'row_count': accumulator.row_count,
+            'column_count': len(schema),
             'data_hash': data_hash,
             'schema': schema,
-            'sample_data': df.head(100).to_dict(orient='records'),  # First 100 rows
-            'full_data': df.to_dict(orient='records'),  # Full data for processing
-            'statistics': self._calculate_statistics(df)
-        }
-        
-        return snapshot
-    
-    def _calculate_statistics(self, df: pd.DataFrame):
-        """Calculate basic statistics for the dataset"""
-        stats = {
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'memory_usage_mb': df.memory_usage(deep=True).sum() / (1024 * 1024),
-            'numeric_columns': [],
-            'date_columns': [],
-            'text_columns': []
+            'typed_schema': typed_schema.to_dict() if typed_schema else None,
+            'sample_data': serialization.frame_records(sample_df) if sample_df is not None else [],
+            'statistics': accumulator.statistics(),
+            # Mergeable sketch state, so appends don't recompute from rows
+            'statistics_state': accumulator.to_dict(),
         }
-        
-        for col in df.columns:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                stats['numeric_columns'].append({
-                    'name': col,
-                    'min': float(df[col].min()) if df[col].notna().any() else None,
-                    'max': float(df[col].max()) if df[col].notna().any() else None,
-                    'mean': float(df[col].mean()) if df[col].notna().any() else None,
-                    'median': float(df[col].median()) if df[col].notna().any() else None
-                })
-            elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                stats['date_columns'].append({
-                    'name': col,
-                    'min': df[col].min().isoformat() if df[col].notna().any() else None,
-                    'max': df[col].max().isoformat() if df[col].notna().any() else None
-                })
-            else:
-                stats['text_columns'].append(col)
-        
-        return stats
     
     def _clean_for_json(self, obj):
         """
-        Recursively convert NaN, Infinity, Timestamp to JSON-serializable types
-        """
-        if isinstance(obj, dict):
-            return {key: self._clean_for_json(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._clean_for_json(item) for item in obj]
-        elif isinstance(obj, (pd.Timestamp, datetime)):
-            return obj.isoformat()
-        elif isinstance(obj, (np.integer, np.int64, np.int32)):
-            return int(obj)
-        elif isinstance(obj, (np.floating, np.float64, np.float32)):
-            if np.isnan(obj) or np.isinf(obj):
-                return None
-            return float(obj)
-        elif isinstance(obj, float):
-            if np.isnan(obj) or np.isinf(obj):
-                return None
-            return obj
-        elif isinstance(obj, np.bool_):
-            return bool(obj)
-        elif pd.isna(obj):
-            return None
-        return obj
+        Plain JSON-compatible copy of obj (NaN/Infinity -> None, numpy and
+        Timestamp values -> Python types), for JSONField storage
+        """
+        return serialization.loads(serialization.dumps(obj))
     
-    def persist_snapshot(self, datasource, snapshot):
+    def persist_snapshot(self, datasource, snapshot, df: pd.DataFrame):
+        """
+        Persist snapshot to storage and database
+        
+        Storage: Full data as a columnar file (see SnapshotStore)
+        Database: Metadata + pointer to the stored file
         """
-        Persist snapshot to cache and database
+        storage_pointer = self.store.write(datasource, df, snapshot['data_hash'], partition=True)
         
-        Cache: Full data for fast access (1 hour TTL)
-        Database: Metadata + FULL DATA (para garantir disponibilidade)
+        cube_builder = AggregateCubeBuilder()
+        cube_builder.update(df)
+        self._save_snapshot_metadata(datasource, snapshot, storage_pointer, cube_builder.build())
+    
+    def _save_snapshot_metadata(self, datasource, snapshot, storage_pointer, cube: AggregateCube = None):
         """
-        # Cache full snapshot (1 hour)
-        cache_key = f"datasource_{datasource.id}_snapshot"
-        cache.set(cache_key, snapshot, timeout=3600)
+        Persist snapshot metadata pointing at an already stored file
         
+        cube: daily rollups of the snapshot, stored next to it
+        """
         # Clean snapshot for JSON serialization (convert NaN to None)
-        # IMPORTANTE: Salvar full_data também no database
         clean_snapshot = {
             'timestamp': snapshot['timestamp'],
             'row_count': snapshot['row_count'],
             'column_count': snapshot['column_count'],
             'data_hash': snapshot['data_hash'],
             'schema': self._clean_for_json(snapshot['schema']),
-            'sample_data': self._clean_for_json(snapshot['sample_data']),
-            'full_data': self._clean_for_json(snapshot['full_data']),  # INCLUIR DADOS COMPLETOS
-            'statistics': self._clean_for_json(snapshot['statistics'])
+            'typed_schema': snapshot.get('typed_schema'),
+            'sample_data': snapshot['sample_data'],
+            'statistics': self._clean_for_json(snapshot['statistics']),
+            'statistics_state': self._clean_for_json(snapshot.get('statistics_state')),
+            'storage': storage_pointer,
+            'cube': self._write_cube(datasource, cube, snapshot['data_hash']),
         }
         
-        # Update datasource config with metadata + full data
+        # Update datasource config with metadata + storage pointer
         datasource.connection_config['last_snapshot'] = clean_snapshot
         datasource.save(update_fields=['connection_config', 'updated_at'])
         
+        # Older snapshot files are no longer referenced
+        self.store.purge(datasource, keep=storage_pointer)
+        
+        # Let dependents (e.g. dashboard result cache) drop derived data
+        snapshot_updated.send(sender=datasource.__class__, datasource=datasource, snapshot=clean_snapshot)
+        
         logger.info(f"Snapshot persisted for datasource {datasource.id} with {snapshot['row_count']} rows")
     
-    def get_snapshot(self, datasource):
+    def _write_cube(self, datasource, cube: AggregateCube, data_hash):
+        """Store the cube frame as `<hash>.cube.arrow`; returns its pointer + metadata"""
+        if cube is None:
+            return None
+        pointer = self.store.write(datasource, cube.frame, f'{data_hash}.cube')
+        return {**pointer, **cube.to_meta()}
+    
+    def get_cube(self, datasource):
+        """Daily aggregate cube of the current snapshot, or None"""
+        snapshot = self.get_snapshot(datasource)
+        meta = (snapshot or {}).get('cube')
+        if not meta:
+            return None
+        return AggregateCube.from_frame(self.store.read(meta), meta)
+    
+    def ensure_cube(self, datasource):
         """
-        Retrieve snapshot from cache or database
+        Daily cube of the current snapshot, built from the stored rows when
+        the snapshot predates cubes (no `cube` key in its metadata)
         """
-        # Try cache first
-        cache_key = f"datasource_{datasource.id}_snapshot"
-        snapshot = cache.get(cache_key)
+        snapshot = self.get_snapshot(datasource)
+        if not snapshot or 'cube' in snapshot or not snapshot.get('storage'):
+            return self.get_cube(datasource)
         
-        if snapshot:
-            logger.debug(f"Snapshot retrieved from cache for datasource {datasource.id}")
-            return snapshot
+        builder = AggregateCubeBuilder()
+        table = self.store.read_table(snapshot['storage'])
+        for batch in table.to_batches(max_chunksize=self.CHUNK_SIZE):
+            builder.update(batch.to_pandas())
+        cube = builder.build()
+        
+        snapshot = {**snapshot, 'cube': self._write_cube(datasource, cube, snapshot['data_hash'])}
+        datasource.connection_config['last_snapshot'] = snapshot
+        datasource.save(update_fields=['connection_config', 'updated_at'])
+        
+        logger.info(f"Aggregate cube built for datasource {datasource.id}")
+        return cube
+    
+    def delete_snapshot(self, datasource):
+        """Remove stored snapshot files"""
+        self.store.purge(datasource)
+    
+    def get_snapshot(self, datasource):
+        """
+        Snapshot metadata of the datasource, or None
         
-        # Fallback to database (metadata only)
-        last_snapshot = datasource.connection_config.get('last_snapshot')
+        Metadata lives in connection_config, already loaded with the
+        datasource row; row data is read through the snapshot store.
+        """
+        snapshot = datasource.connection_config.get('last_snapshot')
+        if not snapshot:
+            logger.warning(f"No snapshot found for datasource {datasource.id}")
+        return snapshot or None
+    
+    def get_typed_schema(self, datasource, df: pd.DataFrame = None):
+        """
+        Typed schema of the current snapshot
         
-        if last_snapshot:
-            logger.debug(f"Snapshot retrieved from database for datasource {datasource.id}")
-            return last_snapshot
+        Snapshots from before typed schemas (or without a snapshot at all)
+        get one inferred from a sample of `df` when it is given, else None.
+        """
+        snapshot = self.get_snapshot(datasource)
+        typed_schema = TypedSchema.from_dict((snapshot or {}).get('typed_schema'))
+        if typed_schema is None and df is not None:
+            typed_schema = self.type_engine.infer(df)
+        return typed_schema
+    
+    def get_statistics_accumulator(self, datasource):
+        """
+        Restore the statistics accumulator of the current snapshot
         
-        logger.warning(f"No snapshot found for datasource {datasource.id}")
-        return None
+        Merge it with an accumulator of new rows to update schema and
+        statistics without reading the stored rows again.
+        """
+        snapshot = self.get_snapshot(datasource)
+        state = (snapshot or {}).get('statistics_state')
+        return StatisticsAccumulator.from_dict(state) if state else None
     
-    def get_dataframe(self, datasource) -> pd.DataFrame:
+    def get_dataframe(self, datasource, columns=None) -> pd.DataFrame:
         """
         Get DataFrame from snapshot
+        
+        columns: optional projection; names missing from the snapshot are ignored
         """
         snapshot = self.get_snapshot(datasource)
         
         if not snapshot:
             raise ValueError(f"No snapshot found for datasource {datasource.id}")
         
-        # Convert back to DataFrame
+        # Columnar snapshot: types are preserved by the file format
+        if snapshot.get('storage'):
+            return self.store.read(snapshot['storage'], columns=columns)
+        
+        # Legacy snapshots keep the rows inline as JSON records
         full_data = snapshot.get('full_data')
         if not full_data:
             # Use sample data as fallback
@@ -305,4 +505,86 @@ class DataIngestionService:
                 elif 'int' in dtype or 'float' in dtype:
                     df[col] = pd.to_numeric(df[col], errors='coerce')
         
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
+        
+        return df
+    
+    def get_table(self, datasource, columns=None) -> pa.Table:
+        """
+        Snapshot rows as an Arrow table, without converting them to pandas
+
+        Columnar snapshots are memory-mapped, so only the pages of the rows
+        and columns actually read are loaded. Legacy snapshots are converted
+        from their inline records.
+        """
+        snapshot = self.get_snapshot(datasource)
+        if snapshot and snapshot.get('storage'):
+            return self.store.read_table(snapshot['storage'], columns=columns)
+        
+        df = self.get_dataframe(datasource, columns=columns)
+        return pa.Table.from_pandas(self.store._prepare_for_arrow(df), preserve_index=False)
+    
+    def get_arrow_schema(self, datasource):
+        """
+        Column names and Arrow types of a columnar snapshot, or None
+
+        Reads only the file footer of memory-mapped snapshots; no rows are
+        decoded.
+        """
+        snapshot = self.get_snapshot(datasource)
+        if not snapshot or not snapshot.get('storage'):
+            return None
+        return self.store.read_table(snapshot['storage']).schema
+    
+    def get_rows(self, datasource, date_column, start=None, end=None, columns=None) -> pd.DataFrame:
+        """
+        Rows with `date_column` in [start, end) (either bound may be None)
+        
+        Snapshots partitioned by that column only decode the months
+        overlapping the period; other snapshots are read whole and filtered.
+        Rows without a date are never returned.
+        
+        columns: optional projection; the date column is read regardless
+        """
+        snapshot = self.get_snapshot(datasource)
+        pointer = (snapshot or {}).get('storage') or {}
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, date_column]))
+        partitions = pointer.get('partitions')
+        
+        if partitions and partitions['column'] == date_column:
+            table = self.store.read_period(pointer, start, end, columns=read_columns)
+            df = table.to_pandas(split_blocks=True)
+            days = dates.epoch_days(df[date_column])
+        else:
+            df = self.get_dataframe(datasource, columns=read_columns)
+            # Day numbers of the full column are cached per snapshot
+            days = dates.epoch_days(df[date_column], cache_key=(snapshot or {}).get('data_hash'))
+        
+        df = df[dates.between(days, start, end)]
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
         return df
+    
+    def get_period_table(self, datasource, date_column, start=None, end=None, columns=None) -> pa.Table:
+        """
+        Arrow table covering the rows with `date_column` in [start, end)
+        
+        Like get_rows, partitioned snapshots only map the overlapping months,
+        but nothing is converted to pandas and the rows are not filtered to
+        the exact days: callers (e.g. SQL views) apply the day filter.
+        """
+        snapshot = self.get_snapshot(datasource)
+        pointer = (snapshot or {}).get('storage') or {}
+        partitions = pointer.get('partitions')
+        if partitions and partitions['column'] == date_column:
+            return self.store.read_period(pointer, start, end, columns=columns)
+        return self.get_table(datasource, columns=columns)
+    
+    def get_mapped_dataframe(self, datasource, column_mapping: dict) -> pd.DataFrame:
+        """
+        Get only the columns referenced by a dashboard column_mapping
+        (value, date, product, quantity)
+        """
+        columns = list(dict.fromkeys(col for col in (column_mapping or {}).values() if col))
+        return self.get_dataframe(datasource, columns=columns)
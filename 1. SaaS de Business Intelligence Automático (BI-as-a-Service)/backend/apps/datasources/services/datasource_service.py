@@ -0,0 +1,347 @@
+import time
+import pandas as pd
+import pyarrow as pa
+import json
+from django.utils import timezone
+from apps.datasources.models import DataSource
+from .data_ingestion_service import DataIngestionService
+from .data_pages import PAGE_SIZE, DataQuery, SnapshotPager
+from .sheets_fetcher import SheetsFetcher
+
+
+class DataSourceService:
+    """Serviço para gerenciar fontes de dados"""
+    
+    def __init__(self, sheets_fetcher: SheetsFetcher = None):
+        self.ingestion_service = DataIngestionService()
+        self.sheets_fetcher = sheets_fetcher or SheetsFetcher()
+    
+    def create_from_csv(self, organization, user, name, dataframe):
+        """Criar fonte de dados a partir de CSV"""
+        datasource = DataSource.objects.create(
+            organization=organization,
+            created_by=user,
+            name=name,
+            source_type='csv_upload',
+            connection_config={},
+            is_active=True,
+            row_count=0,
+        )
+        
+        # Dados completos vão para o snapshot store; o model guarda só metadados
+        self._ingest(datasource, dataframe)
+        
+        return datasource
+    
+    def create_from_upload(self, organization, user, name, file):
+        """
+        Criar fonte de dados a partir de um arquivo enviado (CSV ou XLSX)
+        
+        O arquivo é lido em blocos e gravado direto no snapshot store; o
+        limite de linhas do plano é verificado durante a leitura.
+        """
+        is_excel = file.name.lower().endswith(('.xlsx', '.xlsm'))
+        datasource = DataSource.objects.create(
+            organization=organization,
+            created_by=user,
+            name=name,
+            source_type='xlsx_upload' if is_excel else 'csv_upload',
+            connection_config={},
+            is_active=True,
+            row_count=0,
+        )
+        
+        try:
+            snapshot = self.ingestion_service.ingest_file(
+                datasource,
+                file,
+                file_format='xlsx' if is_excel else 'csv',
+                row_limit=organization.max_data_rows,
+            )
+        except Exception:
+            # Nada foi persistido: não deixar uma fonte vazia para trás
+            datasource.delete()
+            raise
+        
+        self._store_columns(datasource, snapshot)
+        
+        return datasource
+    
+    def create_pending_upload(self, organization, user, name, file):
+        """
+        Criar fonte de dados para um arquivo enviado sem processá-lo
+        
+        O arquivo fica guardado no storage e é ingerido pelo pipeline
+        assíncrono (apps.datasources.tasks). Retorna (datasource, upload),
+        onde `upload` é o contexto que a tarefa de ingestão recebe.
+        """
+        is_excel = file.name.lower().endswith(('.xlsx', '.xlsm'))
+        datasource = DataSource.objects.create(
+            organization=organization,
+            created_by=user,
+            name=name,
+            source_type='xlsx_upload' if is_excel else 'csv_upload',
+            connection_config={},
+            is_active=True,
+            row_count=0,
+            sync_status='pending',
+        )
+        
+        try:
+            path = self.ingestion_service.store.save_upload(datasource, file)
+        except Exception:
+            datasource.delete()
+            raise
+        
+        return datasource, {'path': path, 'format': 'xlsx' if is_excel else 'csv'}
+    
+    def ingest_upload(self, datasource, upload):
+        """Ingerir um arquivo guardado por create_pending_upload"""
+        with self.ingestion_service.store.open_upload(upload['path']) as file:
+            snapshot = self.ingestion_service.ingest_file(
+                datasource,
+                file,
+                file_format=upload['format'],
+                row_limit=datasource.organization.max_data_rows,
+            )
+        self._store_columns(datasource, snapshot)
+        return snapshot
+    
+    def discard_upload(self, upload):
+        """Remover o arquivo guardado depois da ingestão (ou da falha definitiva)"""
+        self.ingestion_service.store.delete(upload)
+    
+    def connect_google_sheets(self, organization, user, name, url):
+        """
+        Conectar Google Sheets (Plano Free - Requer planilha pública)
+        
+        IMPORTANTE: Para o plano Free, a planilha deve estar pública.
+        Instruções:
+        1. Abra a planilha no Google Sheets
+        2. Clique em "Compartilhar" no canto superior direito
+        3. Em "Acesso geral", selecione "Qualquer pessoa com o link"
+        4. Copie e cole a URL aqui
+        
+        Para planos pagos (Starter+), oferecemos conexão segura via OAuth2
+        sem necessidade de tornar a planilha pública.
+        """
+        # Extrair sheet_id da URL
+        sheet_id = self._extract_sheet_id(url)
+        
+        # Tentar ler dados do Google Sheets
+        try:
+            # URL pública do Google Sheets em formato CSV
+            # Funciona apenas se a planilha estiver com acesso público.
+            # A aba principal é baixada enquanto as demais abas (gids 0..10,
+            # heurística) são sondadas em paralelo, lendo só o cabeçalho
+            gid = self._extract_gid(url)
+            export, sheets = self.sheets_fetcher.connect(sheet_id, gid)
+            used_gid = export.gid if export.gid is not None else gid
+            df = export.to_dataframe()
+            
+            # Verificar limite de linhas
+            if len(df) > organization.max_data_rows:
+                raise ValueError(
+                    f'Planilha excede o limite de {organization.max_data_rows} linhas. '
+                    f'Plano {organization.plan.upper()} permite até {organization.max_data_rows} linhas. '
+                    f'Faça upgrade para aumentar o limite.'
+                )
+            
+            columns = df.columns.tolist()
+            
+            if not sheets:
+                sheets = [{'gid': 0, 'title': 'Aba 0', 'columns': columns}]
+            
+            datasource = DataSource.objects.create(
+                organization=organization,
+                created_by=user,
+                name=name,
+                source_type='google_sheets',
+                connection_config={
+                    'url': url,
+                    'sheet_id': sheet_id,
+                    'primary_gid': used_gid,
+                    'sheets': sheets,
+                    'access_type': 'public',  # Free plan usa acesso público
+                    'http_validators': export.validators(),
+                },
+                is_active=True,
+                row_count=0,
+            )
+            try:
+                self._ingest(datasource, df)
+            except Exception:
+                # Nada foi persistido: não deixar uma fonte vazia para trás
+                datasource.delete()
+                raise
+            
+            return datasource
+            
+        except pd.errors.ParserError as e:
+            raise ValueError(
+                'Erro ao ler a planilha. Verifique se ela está pública. '
+                'Vá em Compartilhar > Acesso geral > Qualquer pessoa com o link.'
+            )
+        except Exception as e:
+            error_msg = str(e)
+            if '403' in error_msg or 'Forbidden' in error_msg:
+                raise ValueError(
+                    'Acesso negado. A planilha precisa estar pública. '
+                    'Instruções: Compartilhar > Acesso geral > Qualquer pessoa com o link. '
+                    'Ou faça upgrade para Starter e conecte planilhas privadas via OAuth2.'
+                )
+            elif '404' in error_msg or 'Not Found' in error_msg:
+                raise ValueError(
+                    'Planilha não encontrada. Verifique se a URL está correta.'
+                )
+            elif '400' in error_msg or 'Bad Request' in error_msg:
+                raise ValueError(
+                    'Erro 400 ao acessar o Google Sheets. Verifique se a URL é de uma planilha (docs.google.com/spreadsheets/d/...) '
+                    'e se está com acesso "Qualquer pessoa com o link". Caso haja várias abas, copie o link com o #gid da aba desejada.'
+                )
+            else:
+                raise ValueError(f'Erro ao conectar Google Sheets: {error_msg}')
+    
+    def sync_datasource(self, datasource):
+        """
+        Sincronizar dados da fonte
+        
+        Duração e bytes lidos ficam registrados na fonte
+        (last_sync_duration / last_sync_bytes), com sucesso ou erro.
+        """
+        started = time.monotonic()
+        fetched = {'bytes': 0}
+        try:
+            if datasource.source_type == 'google_sheets':
+                self._sync_google_sheets(datasource, fetched)
+            elif datasource.source_type in ('csv_upload', 'xlsx_upload'):
+                # CSV/XLSX upload não precisa sincronizar
+                pass
+            else:
+                raise ValueError(f'Tipo de fonte não suportado: {datasource.source_type}')
+        finally:
+            DataSource.objects.filter(pk=datasource.pk).update(
+                last_sync_duration=time.monotonic() - started,
+                last_sync_bytes=fetched['bytes'],
+            )
+        return datasource
+    
+    def _sync_google_sheets(self, datasource, fetched):
+        """Sincronizar Google Sheets (`fetched['bytes']` recebe o tamanho baixado)"""
+        config = datasource.connection_config
+        sheet_id = config.get('sheet_id')
+        gid = config.get('primary_gid', 0)
+        
+        try:
+            # Requisição condicional: sem mudança na planilha, nada é baixado
+            export = self.sheets_fetcher.fetch(sheet_id, gid, validators=config.get('http_validators'))
+            fetched['bytes'] = export.size
+            if export.not_modified:
+                datasource.last_synced_at = timezone.now()
+                datasource.save(update_fields=['last_synced_at', 'updated_at'])
+                return datasource
+            df = export.to_dataframe()
+            
+            # Verificar limite de linhas
+            if len(df) > datasource.organization.max_data_rows:
+                raise ValueError(f'Planilha excede o limite de {datasource.organization.max_data_rows} linhas')
+            
+            # Atualizar dados (nada é regravado se o conteúdo não mudou)
+            self._ingest(datasource, df)
+            
+            datasource.connection_config['http_validators'] = export.validators()
+            datasource.save(update_fields=['connection_config', 'updated_at'])
+            
+            return datasource
+            
+        except OSError:
+            # Falhas de rede/HTTP sobem intactas: a tarefa de sincronização
+            # decide se vale tentar de novo
+            raise
+        except Exception as e:
+            raise ValueError(f'Erro ao sincronizar: {str(e)}')
+    
+    def _ingest(self, datasource, df):
+        """Persistir DataFrame como snapshot colunar e atualizar metadados"""
+        snapshot = self.ingestion_service.ingest_dataframe(datasource, df)
+        if snapshot['changed']:
+            self._store_columns(datasource, snapshot)
+        return snapshot
+    
+    def _store_columns(self, datasource, snapshot):
+        # Dados antigos (lista de registros) não são mais mantidos no model
+        datasource.connection_config.pop('data', None)
+        datasource.connection_config['columns'] = list(snapshot['schema'].keys())
+        datasource.save(update_fields=['connection_config', 'updated_at'])
+    
+    def get_dataframe(self, datasource, columns=None):
+        """Obter DataFrame tipado da fonte (opcionalmente só algumas colunas)"""
+        if self.ingestion_service.get_snapshot(datasource):
+            return self.ingestion_service.get_dataframe(datasource, columns=columns)
+        
+        # Fallback: fontes antigas com registros em connection_config
+        df = pd.DataFrame(datasource.connection_config.get('data', []))
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
+        return df
+    
+    def get_rows(self, datasource, date_column, start=None, end=None, columns=None):
+        """
+        Linhas da fonte com `date_column` em [start, end)
+        
+        Snapshots particionados por mês só leem os meses do período (ver
+        DataIngestionService.get_rows).
+        """
+        return self.ingestion_service.get_rows(datasource, date_column, start, end, columns=columns)
+    
+    def get_pager(self, datasource):
+        """Paginador das linhas da fonte (lidas direto do snapshot colunar)"""
+        snapshot = self.ingestion_service.get_snapshot(datasource)
+        if snapshot:
+            table = self.ingestion_service.get_table(datasource)
+            version = snapshot.get('data_hash')
+        else:
+            # Fontes antigas com registros em connection_config
+            df = self.get_dataframe(datasource)
+            table = pa.Table.from_pandas(self.ingestion_service.store._prepare_for_arrow(df), preserve_index=False)
+            version = None
+        version = version or datasource.updated_at.isoformat()
+        return SnapshotPager(table, f"{datasource.id}:{version}")
+    
+    def get_data(self, datasource, params=None):
+        """
+        Obter uma página de dados da fonte
+        
+        params (query string): columns, sort, filter[...], cursor e limit;
+        veja DataQuery. A resposta traz next_cursor enquanto houver linhas.
+        """
+        params = params or {}
+        pager = self.get_pager(datasource)
+        query = DataQuery.from_params(params, pager.table.column_names)
+        
+        try:
+            limit = int(params.get('limit') or PAGE_SIZE)
+        except (TypeError, ValueError):
+            raise ValueError('limit deve ser um número inteiro')
+        
+        data = pager.page(query, cursor=params.get('cursor'), limit=limit)
+        data['sheets'] = datasource.connection_config.get('sheets', [])
+        return data
+    
+    def _extract_sheet_id(self, url):
+        """Extrair ID da planilha da URL"""
+        # URL formato: https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit...
+        if '/d/' in url:
+            parts = url.split('/d/')
+            if len(parts) > 1:
+                sheet_id = parts[1].split('/')[0]
+                return sheet_id
+        raise ValueError('URL do Google Sheets inválida')
+
+    def _extract_gid(self, url):
+        if '#gid=' in url:
+            try:
+                return int(url.split('#gid=')[1].split('&')[0])
+            except Exception:
+                return 0
+        return 0
@@ -0,0 +1,108 @@
+"""
+Date columns as epoch days
+Snapshot date columns are parsed once at ingestion into datetime64; period
+filters and calendar grouping then work on their day numbers (days since
+1970-01-01), computed once per snapshot column and cached
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400 * 10**9
+# Day number of missing dates (NaT); below every real date
+NAT_DAY = np.iinfo(np.int32).min
+
+# Snapshot columns whose day numbers are kept in memory
+CACHE_SIZE = 32
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _naive(values: pd.Series) -> pd.Series:
+    """tz-aware datetimes as naive UTC, so all day numbers share one clock"""
+    if getattr(values.dt, 'tz', None) is not None:
+        return values.dt.tz_convert(None)
+    return values
+
+
+def _require_dates(series: pd.Series):
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        raise ValueError(f'Coluna {series.name!r} não é uma coluna de data')
+
+
+def _compute_days(series: pd.Series) -> np.ndarray:
+    _require_dates(series)
+    ns = _naive(series).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    days = np.floor_divide(ns, NS_PER_DAY).astype(np.int32)
+    days[ns == np.iinfo(np.int64).min] = NAT_DAY
+    return days
+
+
+def epoch_days(series: pd.Series, cache_key=None) -> np.ndarray:
+    """
+    Day number of every row (int32, NAT_DAY where the date is missing)
+
+    cache_key: identifies the data the series belongs to (e.g. the snapshot
+    hash); the result is reused while that data doesn't change. Only pass
+    it for full snapshot columns, not for filtered frames.
+    """
+    if cache_key is None:
+        return _compute_days(series)
+
+    key = (cache_key, series.name, len(series))
+    with _cache_lock:
+        days = _cache.get(key)
+        if days is not None:
+            _cache.move_to_end(key)
+            return days
+
+    days = _compute_days(series)
+    days.setflags(write=False)
+    with _cache_lock:
+        _cache[key] = days
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return days
+
+
+def first_day(bound) -> int:
+    """Day number of a period bound; bounds with a time of day round up to the next day"""
+    timestamp = pd.Timestamp(bound)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return int(np.floor_divide(timestamp.ceil('D').value, NS_PER_DAY))
+
+
+def between(days: np.ndarray, start=None, end=None) -> np.ndarray:
+    """Mask of the rows with a date in [start, end) (missing dates excluded)"""
+    mask = days != NAT_DAY
+    if start is not None:
+        mask &= days >= first_day(start)
+    if end is not None:
+        mask &= days < first_day(end)
+    return mask
+
+
+def month_numbers(days: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 (year = n // 12 + 1970, month = n % 12 + 1)"""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def iso_weeks(days: np.ndarray):
+    """(ISO year, ISO week) of every day"""
+    days = days.astype(np.int64)
+    # 1970-01-01 was a Thursday; weekday 0 is Monday
+    thursday = days - (days + 3) % 7 + 3
+    year = thursday.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64)
+    jan_first = year.astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    return year + 1970, (thursday - jan_first) // 7 + 1
+
+
+def chronological_order(series: pd.Series) -> np.ndarray:
+    """Positions of the rows with a date, oldest first (stable for equal dates)"""
+    _require_dates(series)
+    values = _naive(series).to_numpy(dtype='datetime64[ns]')
+    positions = np.flatnonzero(~np.isnat(values))
+    return positions[np.argsort(values[positions], kind='stable')]
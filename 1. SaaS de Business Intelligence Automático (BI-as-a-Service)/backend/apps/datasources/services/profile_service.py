@@ -0,0 +1,184 @@
+"""
+Perfil de dados de uma fonte
+Classificação de colunas, sinal mínimo e template sugerido, usados para
+montar automaticamente a pré-visualização de dashboard
+"""
+import pandas as pd
+
+from .type_inference import TypeInferenceEngine
+
+
+class DataProfileService:
+    """Analisa o DataFrame normalizado de uma fonte"""
+    
+    def build_profile(self, df, max_charts, schema=None):
+        """
+        Perfil completo persistido na fonte: colunas por tipo, sinal mínimo,
+        template detectado e configuração básica de dashboard
+        
+        schema: TypedSchema do snapshot (inferido de uma amostra se ausente)
+        """
+        analysis = self.analyze_dataframe(df, schema=schema)
+        template = self.detect_template(df)
+        return {
+            'columns_info': analysis['columns_info'],
+            'has_minimum_signal': analysis['has_minimum_signal'],
+            'template': template,
+            'basic_config': self.suggest_basic_config(df, template, max_charts, analysis=analysis),
+        }
+    
+    def analyze_dataframe(self, df, schema=None):
+        """
+        Analisa o DataFrame para identificar colunas por tipo e sinal mínimo para dashboards.
+        
+        Os tipos vêm do TypedSchema (sem converter colunas inteiras);
+        identificadores ficam de fora das categorias.
+        """
+        schema = schema or TypeInferenceEngine().infer(df)
+        col_types = schema.column_types(df.columns)
+        columns_info = {
+            'numeric': col_types['numeric'],
+            'date': col_types['date'],
+            'categorical': [
+                col for col in df.columns
+                if col in col_types['categorical'] or col in col_types['boolean']
+            ],
+        }
+        
+        # Heurística mínima: ao menos 1 numérica e (1 categórica ou 1 de data), e linhas suficientes
+        min_rows_ok = len(df) >= 5
+        has_numeric = len(columns_info['numeric']) > 0
+        has_cat_or_date = (len(columns_info['categorical']) > 0) or (len(columns_info['date']) > 0)
+        
+        # Também evitar colunas categóricas com cardinalidade absurda (ruído)
+        low_cardinality_exists = False
+        for col in columns_info['categorical']:
+            try:
+                unique_vals = df[col].nunique(dropna=True)
+                if unique_vals > 0 and unique_vals <= 50:
+                    low_cardinality_exists = True
+                    break
+            except Exception:
+                continue
+        
+        has_minimum_signal = min_rows_ok and has_numeric and (low_cardinality_exists or len(columns_info['date']) > 0)
+        
+        return {
+            'columns_info': columns_info,
+            'has_minimum_signal': has_minimum_signal,
+        }
+    
+    def suggest_basic_config(self, df, template, max_charts, analysis=None):
+        """
+        Sugere uma configuração básica de dashboard com no máximo `max_charts` widgets.
+        Essa configuração é genérica e segura para dados variados.
+        """
+        analysis = analysis or self.analyze_dataframe(df)
+        cols = analysis['columns_info']
+        
+        widgets = []
+        
+        # 1) KPI simples: soma do primeiro numérico
+        if cols['numeric']:
+            widgets.append({
+                'type': 'kpi_sum',
+                'title': 'Total',
+                'column': cols['numeric'][0],
+                'format': 'number',
+            })
+        
+        # 2) Linha no tempo se houver data+numérica
+        if cols['date'] and cols['numeric'] and len(widgets) < max_charts:
+            widgets.append({
+                'type': 'line_over_time',
+                'title': 'Evolução no tempo',
+                'date_column': cols['date'][0],
+                'value_column': cols['numeric'][0],
+                'interval': 'auto',
+            })
+        
+        # 3) Barras por categoria se houver categoria+numérica
+        if cols['categorical'] and cols['numeric'] and len(widgets) < max_charts:
+            widgets.append({
+                'type': 'bar_by_category',
+                'title': 'Por categoria',
+                'category_column': cols['categorical'][0],
+                'value_column': cols['numeric'][0],
+                'top_n': 10,
+            })
+        
+        # 4) Tabela de amostra como fallback
+        if len(widgets) < max_charts:
+            sample_cols = list(df.columns)[:6]
+            widgets.append({
+                'type': 'table_preview',
+                'title': 'Amostra de dados',
+                'columns': sample_cols,
+                'rows': 10,
+            })
+        
+        # Garantir que não ultrapasse o limite
+        widgets = widgets[:max_charts]
+        
+        return {
+            'layout': 'two-column',
+            'template_hint': template,
+            'widgets': widgets,
+        }
+    
+    def detect_template(self, df):
+        """
+        Detecta automaticamente qual template usar baseado nas colunas do DataFrame.
+        Retorna: 'sales', 'financial', 'performance', ou 'custom'
+        """
+        # Converter nomes de colunas para lowercase para comparação
+        columns_lower = [col.lower() for col in df.columns]
+        columns_str = ' '.join(columns_lower)
+        
+        # Score para cada template
+        sales_score = 0
+        financial_score = 0
+        
+        # INDICADORES DE VENDAS
+        sales_keywords = [
+            'produto', 'product', 'item', 'sku',
+            'venda', 'sale', 'vendas', 'sales',
+            'cliente', 'customer', 'comprador',
+            'quantidade', 'quantity', 'qtd', 'qty',
+            'preco', 'price', 'valor', 'value'
+        ]
+        
+        for keyword in sales_keywords:
+            if keyword in columns_str:
+                sales_score += 1
+        
+        # INDICADORES FINANCEIROS
+        financial_keywords = [
+            'receita', 'revenue', 'income',
+            'despesa', 'expense', 'cost', 'custo',
+            'lucro', 'profit',
+            'tipo', 'type', 'categoria', 'category',
+            'debito', 'debit', 'credito', 'credit'
+        ]
+        
+        for keyword in financial_keywords:
+            if keyword in columns_str:
+                financial_score += 1
+        
+        # Palavras que indicam fortemente financeiro
+        if any(word in columns_str for word in ['receita', 'despesa', 'revenue', 'expense', 'debito', 'credito']):
+            financial_score += 3
+        
+        # Palavras que indicam fortemente vendas
+        if any(word in columns_str for word in ['produto', 'product', 'cliente', 'customer']):
+            sales_score += 2
+        
+        # Decidir template
+        if financial_score > sales_score and financial_score >= 3:
+            return 'financial'
+        elif sales_score >= 2:
+            return 'sales'
+        else:
+            # Padrão: usar 'sales' se tiver pelo menos 1 coluna numérica
+            has_numeric = any(pd.api.types.is_numeric_dtype(df[col]) for col in df.columns)
+            return 'sales' if has_numeric else 'custom'
@@ -0,0 +1,117 @@
+"""
+Columnar JSON serialization
+Chart and table payloads are built column by column: each column is cleaned
+in one numpy step (NaN/Inf/NaT become None, datetimes ISO strings) and the
+columns are zipped into row dicts, instead of walking rows with iterrows or
+cleaning nested Python objects recursively. `dumps` encodes with orjson
+"""
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import orjson
+import pandas as pd
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _iso(values: np.ndarray) -> np.ndarray:
+    """datetime64 values as ISO strings (seconds, or microseconds when present)"""
+    ns = values.astype('datetime64[ns]')
+    missing = np.isnat(ns)
+    fractional = (ns.view(np.int64)[~missing] % 10**9).any()
+    text = np.datetime_as_string(ns, unit='us' if fractional else 's').astype(object)
+    text[missing] = None
+    return text
+
+
+def column(values) -> list:
+    """
+    Python list of a column (Series, Index or array)
+
+    Missing and infinite numbers, NaT and NA become None; datetimes become
+    ISO strings, like Timestamp.isoformat for naive values.
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and isinstance(values.dtype, pd.DatetimeTZDtype):
+        return [None if value is pd.NaT else value.isoformat() for value in values]
+    if isinstance(values, (pd.Series, pd.Index)):
+        # Nullable/categorical columns keep their Python values (NA -> None below)
+        array = values.to_numpy(dtype=None if isinstance(values.dtype, np.dtype) else object)
+    else:
+        array = np.asarray(values)
+
+    kind = array.dtype.kind
+    if kind in 'iub':
+        return array.tolist()
+    if kind == 'f':
+        invalid = ~np.isfinite(array)
+        if not invalid.any():
+            return array.tolist()
+        cleaned = array.astype(object)
+        cleaned[invalid] = None
+        return cleaned.tolist()
+    if kind == 'M':
+        return _iso(array).tolist()
+
+    cleaned = array.astype(object)
+    cleaned[pd.isna(cleaned)] = None
+    return cleaned.tolist()
+
+
+def floats(values) -> np.ndarray:
+    """Column as float64, for payload fields that are always numbers with decimals"""
+    if isinstance(values, (pd.Series, pd.Index)):
+        return values.to_numpy(dtype='float64', na_value=np.nan)
+    return np.asarray(values, dtype='float64')
+
+
+def labels(values) -> np.ndarray:
+    """Column as strings (str of every value), e.g. category names"""
+    return np.asarray(values).astype(str)
+
+
+def records(columns: dict) -> list:
+    """List of row dicts from {field: column}; every column must have the same length"""
+    names = list(columns)
+    lists = [column(values) for values in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*lists)]
+
+
+def frame_records(df: pd.DataFrame) -> list:
+    """Rows of a DataFrame as JSON-ready dicts"""
+    return records({col: df[col] for col in df.columns})
+
+
+def default(obj):
+    """orjson fallback for the types it doesn't encode natively"""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, np.datetime64):
+        return None if np.isnat(obj) else pd.Timestamp(obj).isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return column(obj)
+    if isinstance(obj, pd.DataFrame):
+        return frame_records(obj)
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+def dumps(obj, option=0, default=default) -> bytes:
+    """
+    JSON bytes of `obj`; NaN and Infinity are written as null
+
+    numpy arrays and scalars, pandas Timestamps/Series/DataFrames, Decimals
+    and non-string dict keys are accepted. `option`: extra orjson flags.
+    """
+    return orjson.dumps(obj, default=default, option=OPTIONS | option)
+
+
+def loads(data):
+    return orjson.loads(data)
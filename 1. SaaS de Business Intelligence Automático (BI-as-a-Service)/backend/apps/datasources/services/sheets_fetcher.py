@@ -0,0 +1,235 @@
+"""
+Google Sheets CSV export client
+Async fetches over one pooled HTTP client: tab probes run concurrently once
+the primary export succeeded (cancelled early when access is denied),
+previews stop reading after the rows they need and re-syncs send
+ETag/Last-Modified validators
+"""
+import asyncio
+import io
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SheetFetchError(OSError):
+    """Network or HTTP failure; `status` is the HTTP code when the server answered"""
+
+    def __init__(self, message, status=None):
+        self.status = status
+        super().__init__(message)
+
+    @property
+    def is_transient(self) -> bool:
+        return self.status is None or self.status >= 500 or self.status == 429
+
+
+class SheetExport:
+    """Result of a full export download"""
+
+    def __init__(self, gid, content=None, etag=None, last_modified=None, not_modified=False):
+        self.gid = gid
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+    @property
+    def size(self) -> int:
+        return len(self.content) if self.content else 0
+
+    def validators(self) -> Dict[str, str]:
+        """Values to store and send back on the next conditional request"""
+        return {key: value for key, value in (('etag', self.etag), ('last_modified', self.last_modified)) if value}
+
+    def columns(self) -> List[str]:
+        return pd.read_csv(io.BytesIO(self.content), nrows=0).columns.tolist()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(self.content))
+
+
+class SheetsFetcher:
+    """
+    Fetches public Google Sheets through the CSV export endpoint
+
+    Every public method opens a single httpx.AsyncClient for all of its
+    requests, so concurrent probes share pooled (keep-alive) connections
+    instead of one TLS handshake per request. `base_url` points the client
+    at another server (e.g. a local stub in tests).
+    """
+
+    # Tabs probed when the spreadsheet doesn't list its sheets
+    PROBE_GIDS = range(0, 11)
+    PREVIEW_ROWS = 5
+    TIMEOUT = 60
+    MAX_CONNECTIONS = 10
+    READ_CHUNK = 16 * 1024
+
+    def __init__(self, base_url=None, timeout=None, transport=None):
+        self.base_url = (base_url or getattr(settings, 'GOOGLE_SHEETS_BASE_URL', 'https://docs.google.com')).rstrip('/')
+        self.timeout = timeout or self.TIMEOUT
+        self.transport = transport
+
+    def export_url(self, sheet_id, gid=None) -> str:
+        url = f"{self.base_url}/spreadsheets/d/{sheet_id}/export?format=csv"
+        return url if gid is None else f"{url}&gid={gid}"
+
+    # Sync entry points (Django views/services are synchronous)
+
+    def connect(self, sheet_id, gid=0, probe_gids=None):
+        """Full export of the primary tab + preview of every tab; see connect_async"""
+        return asyncio.run(self.connect_async(sheet_id, gid, probe_gids))
+
+    def fetch(self, sheet_id, gid=0, validators=None) -> SheetExport:
+        return asyncio.run(self._with_client(lambda client: self._fetch(client, sheet_id, gid, validators)))
+
+    def previews(self, sheet_id, gids, nrows=None) -> Dict[int, Optional[pd.DataFrame]]:
+        return asyncio.run(self._with_client(lambda client: self._previews(client, sheet_id, gids, nrows)))
+
+    # Async implementation
+
+    async def connect_async(self, sheet_id, gid=0, probe_gids=None):
+        """
+        Download the primary tab, then probe the other tabs concurrently
+
+        Returns (export, sheets): the export of the first tab that answers
+        among gid, the default tab and gid 0, and the probed tabs as
+        [{'gid', 'title', 'columns'}]. The probes only start once the
+        primary export succeeded, so a private or missing spreadsheet
+        (401/403/404) costs no probe requests; see _probe_tabs for the
+        probes themselves.
+        """
+        # The primary tab comes with the full download; no need to probe it
+        probe_gids = [g for g in (probe_gids or self.PROBE_GIDS) if g != gid]
+
+        async def run(client):
+            export = await self._fetch_first(client, sheet_id, [gid, None, 0])
+            previews = await self._probe_tabs(client, sheet_id, probe_gids)
+
+            sheets = []
+            if export.gid == gid:
+                sheets.append({'gid': gid, 'title': f'Aba {gid}', 'columns': export.columns()})
+            for g, preview in previews.items():
+                if preview is not None and preview.shape[1] > 0:
+                    sheets.append({'gid': g, 'title': f'Aba {g}', 'columns': preview.columns.tolist()})
+            return export, sorted(sheets, key=lambda sheet: sheet['gid'])
+
+        return await self._with_client(run)
+
+    async def _with_client(self, func):
+        limits = httpx.Limits(max_connections=self.MAX_CONNECTIONS, max_keepalive_connections=self.MAX_CONNECTIONS)
+        async with httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=limits,
+            follow_redirects=True,
+            transport=self.transport,
+        ) as client:
+            return await func(client)
+
+    async def _fetch_first(self, client, sheet_id, gids) -> SheetExport:
+        """Try each export URL in turn; the last error is raised if none works"""
+        last_error = None
+        for gid in gids:
+            try:
+                export = await self._fetch(client, sheet_id, gid)
+                if export.content:
+                    return export
+            except SheetFetchError as exc:
+                last_error = exc
+                if exc.status in (401, 403):
+                    # Private spreadsheet: every tab answers the same
+                    break
+        raise last_error or SheetFetchError('Planilha vazia')
+
+    async def _fetch(self, client, sheet_id, gid, validators=None) -> SheetExport:
+        headers = {}
+        validators = validators or {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        url = self.export_url(sheet_id, gid)
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError as exc:
+            raise SheetFetchError(f'Erro de rede ao acessar {url}: {exc}') from exc
+
+        if response.status_code == 304:
+            return SheetExport(gid, etag=validators.get('etag'),
+                               last_modified=validators.get('last_modified'), not_modified=True)
+        self._raise_for_status(response, url)
+        return SheetExport(
+            gid,
+            content=response.content,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+    async def _probe_tabs(self, client, sheet_id, gids) -> Dict[int, Optional[pd.DataFrame]]:
+        """
+        Previews of the probed tabs, concurrently, with early cancellation
+
+        A gid that doesn't exist only drops that tab: gids are not
+        contiguous (tabs added later get large random ids), so a missing
+        one says nothing about the others. An access error (401/403/404)
+        applies to the whole spreadsheet, e.g. sharing revoked while
+        probing: the probes still in flight are cancelled at the first one.
+        """
+        tasks = {asyncio.ensure_future(self._preview(client, sheet_id, g, self.PREVIEW_ROWS)): g for g in gids}
+        previews = dict.fromkeys(gids)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        previews[tasks[task]] = task.result()
+                    elif isinstance(error, SheetFetchError) and error.status in (401, 403, 404):
+                        logger.info(f"Tab probing for sheet {sheet_id} stopped: {error}")
+                        return previews
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return previews
+
+    async def _previews(self, client, sheet_id, gids, nrows=None):
+        results = await asyncio.gather(
+            *(self._preview(client, sheet_id, g, nrows) for g in gids),
+            return_exceptions=True,
+        )
+        return {g: (r if isinstance(r, pd.DataFrame) else None) for g, r in zip(gids, results)}
+
+    async def _preview(self, client, sheet_id, gid, nrows=None) -> pd.DataFrame:
+        """
+        First `nrows` rows of a tab, reading only as many bytes as needed
+
+        The body is streamed and the connection released once the header
+        plus `nrows` complete lines have arrived.
+        """
+        nrows = nrows or self.PREVIEW_ROWS
+        url = self.export_url(sheet_id, gid)
+        buffer = bytearray()
+        try:
+            async with client.stream('GET', url) as response:
+                self._raise_for_status(response, url)
+                async for chunk in response.aiter_bytes(self.READ_CHUNK):
+                    buffer.extend(chunk)
+                    # header + nrows lines, plus one so the last row is complete
+                    if buffer.count(b'\n') > nrows + 1:
+                        break
+        except httpx.HTTPError as exc:
+            raise SheetFetchError(f'Erro de rede ao acessar {url}: {exc}') from exc
+        return pd.read_csv(io.BytesIO(bytes(buffer)), nrows=nrows)
+
+    def _raise_for_status(self, response, url):
+        if response.status_code >= 400:
+            raise SheetFetchError(f'HTTP {response.status_code} ao acessar {url}', status=response.status_code)
@@ -0,0 +1,398 @@
+"""
+Columnar snapshot storage
+Persists normalized DataFrames as files outside the database, keeping only a
+pointer and metadata in DataSource.connection_config
+"""
+import logging
+import os
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files import File
+from django.utils.module_loading import import_string
+
+from . import dates
+from .tiered_cache import table_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows per record batch when rewriting a snapshot in partition order
+PARTITION_BATCH_ROWS = 65_536
+
+
+class SnapshotStore:
+    """
+    Reads and writes snapshot row data in a pluggable storage
+
+    Snapshots are Arrow IPC files without compression, so a local file can be
+    memory-mapped and read without copying: workers serving the same
+    datasource share the OS page cache instead of holding private copies.
+    Parquet snapshots written by earlier versions are still readable.
+
+    Row snapshots are partitioned by month of their primary date column:
+    rows are stored grouped by month (oldest first, rows without a date
+    last) and the pointer carries a partition index with the row range of
+    every month, so period reads only touch the months they need.
+    """
+
+    format = 'arrow'
+
+    def __init__(self, storage=None):
+        self.storage = storage or self._build_storage()
+
+    def _build_storage(self):
+        """Instantiate the storage configured in settings.SNAPSHOT_STORAGE"""
+        config = getattr(settings, 'SNAPSHOT_STORAGE', {})
+        backend = import_string(config.get('BACKEND', 'django.core.files.storage.FileSystemStorage'))
+        return backend(**config.get('OPTIONS', {}))
+
+    def build_path(self, datasource, data_hash):
+        """Snapshot files are grouped by organization and datasource"""
+        return f"org_{datasource.organization_id}/datasource_{datasource.id}/{data_hash}.{self.format}"
+
+    def write(self, datasource, df: pd.DataFrame, data_hash: str, partition=False) -> dict:
+        """
+        Write DataFrame to storage
+
+        partition: group rows by month of the primary date column
+        Returns the pointer persisted in the snapshot metadata
+        """
+        writer = self.open_writer(datasource, partition=partition)
+        try:
+            writer.write(df)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.close(data_hash)
+
+    def open_writer(self, datasource, partition=False) -> 'SnapshotWriter':
+        """Start an incremental snapshot; chunks are appended with writer.write()"""
+        return SnapshotWriter(self, datasource, partition=partition)
+
+    def save_file(self, datasource, local_path: str, data_hash: str) -> dict:
+        """Move a finished local snapshot file into storage"""
+        name = self.build_path(datasource, data_hash)
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        with open(local_path, 'rb') as fh:
+            path = self.storage.save(name, File(fh))
+        size = os.path.getsize(local_path)
+
+        logger.info(f"Snapshot file written for datasource {datasource.id}: {path} ({size} bytes)")
+
+        return {
+            'path': path,
+            'format': self.format,
+            'size_bytes': size,
+        }
+
+    def save_upload(self, datasource, file) -> str:
+        """
+        Keep an uploaded file until the ingestion task reads it
+
+        Uploads live outside the datasource directory so purge() leaves them
+        alone; returns the storage name.
+        """
+        extension = os.path.splitext(file.name)[1].lower()
+        name = f"org_{datasource.organization_id}/uploads/datasource_{datasource.id}_{uuid.uuid4().hex}{extension}"
+        return self.storage.save(name, file)
+
+    def open_upload(self, name):
+        return self.storage.open(name, 'rb')
+
+    def read(self, pointer: dict, columns=None) -> pd.DataFrame:
+        """
+        Read a snapshot file back into a typed DataFrame
+
+        columns: optional projection; only those columns are decoded
+        """
+        table = self.read_table(pointer, columns=columns)
+        # split_blocks avoids consolidating columns into 2D blocks, which
+        # would copy data out of the memory map
+        return table.to_pandas(split_blocks=True)
+
+    def read_table(self, pointer: dict, columns=None) -> pa.Table:
+        """
+        Open a snapshot as an Arrow table
+
+        Local Arrow files are memory-mapped: workers already share them
+        through the page cache. Anything that has to be downloaded or
+        decoded (remote storage, Parquet) goes through the snapshot table
+        cache, keyed by the file path, which carries org, datasource and
+        data hash.
+        """
+        local_path = self._local_path(pointer['path'])
+        if pointer.get('format') != 'parquet' and local_path:
+            # Record batches reference the mapped pages; nothing is decoded
+            # until a column is converted
+            table = ipc.open_file(pa.memory_map(local_path, 'r')).read_all()
+        else:
+            table = table_cache().get_or_load(pointer['path'], lambda: self._load_table(pointer))
+
+        if columns is not None:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table
+
+    def read_period(self, pointer: dict, start=None, end=None, columns=None) -> pa.Table:
+        """
+        Rows of the month partitions overlapping [start, end)
+
+        Partitions are pruned by the index alone; rows of the first and last
+        month outside the bounds are still included, so callers filter the
+        date column exactly afterwards. Snapshots without a partition index
+        return every row.
+        """
+        table = self.read_table(pointer, columns=columns)
+        ranges = partition_ranges(pointer.get('partitions'), start, end)
+        if ranges is None:
+            return table
+        # Slices of a memory-mapped table: nothing is copied or decoded
+        pieces = [table.slice(offset, rows) for offset, rows in ranges]
+        return pa.concat_tables(pieces) if pieces else table.slice(0, 0)
+
+    def _load_table(self, pointer: dict) -> pa.Table:
+        with self.storage.open(pointer['path'], 'rb') as fh:
+            if pointer.get('format') == 'parquet':
+                return pq.read_table(fh)
+            return ipc.open_file(pa.BufferReader(fh.read())).read_all()
+
+    def _local_path(self, name):
+        """Filesystem path of a stored file, or None for remote storages"""
+        try:
+            return self.storage.path(name)
+        except NotImplementedError:
+            return None
+
+    def delete(self, pointer: dict):
+        """Remove a snapshot file, ignoring files already gone"""
+        path = (pointer or {}).get('path')
+        if path and self.storage.exists(path):
+            self.storage.delete(path)
+
+    def purge(self, datasource, keep: dict = None):
+        """
+        Remove every snapshot file of the datasource except `keep`
+
+        Files derived from the kept snapshot (`<hash>.cube.arrow`, ...)
+        share its hash prefix and are kept as well.
+        """
+        directory = f"org_{datasource.organization_id}/datasource_{datasource.id}"
+        keep_path = (keep or {}).get('path')
+        keep_prefix = os.path.basename(keep_path).split('.')[0] + '.' if keep_path else None
+        try:
+            _, files = self.storage.listdir(directory)
+        except (FileNotFoundError, NotImplementedError):
+            return
+
+        for filename in files:
+            if keep_prefix and filename.startswith(keep_prefix):
+                continue
+            self.storage.delete(f"{directory}/{filename}")
+
+    def _prepare_for_arrow(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Object columns may mix str/int/float after type inference; Arrow needs
+        a single type per column, so those are stored as text.
+        """
+        prepared = df.copy(deep=False)
+        prepared.columns = [str(col) for col in prepared.columns]
+
+        for col in prepared.columns:
+            if prepared[col].dtype == 'object':
+                series = prepared[col]
+                prepared[col] = series.where(series.isna(), series.astype(str))
+
+        return prepared
+
+
+class SnapshotWriter:
+    """
+    Appends DataFrame chunks to a local Arrow IPC file, then hands it to the
+    store. Memory use is bounded by the chunk size, not by the dataset.
+
+    A chunk whose types don't fit the current schema (e.g. decimals after an
+    all-integer first chunk) promotes the schema: batches already written are
+    re-cast into a new file from a memory map, one batch at a time.
+
+    With partition=True the finished file is reordered by month of the first
+    date column (the same column the daily cube uses), one month at a time,
+    and the pointer gets the partition index. Rows already in month order
+    (the usual append-only sheet) are not rewritten.
+    """
+
+    def __init__(self, store: SnapshotStore, datasource, partition=False):
+        self.store = store
+        self.datasource = datasource
+        self.partition = partition
+        self.schema = None
+        self.row_count = 0
+        self._path = None
+        self._sink = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        table = pa.Table.from_pandas(self.store._prepare_for_arrow(df), preserve_index=False)
+
+        if self.schema is None:
+            self._open(table.schema)
+        else:
+            target = self._unify(self.schema, table.schema)
+            if not target.equals(self.schema):
+                self._rewrite(target)
+            table = table.cast(self.schema)
+
+        self._writer.write_table(table)
+        self.row_count += table.num_rows
+
+    def close(self, data_hash: str) -> dict:
+        """Finish the file and move it to storage; returns the snapshot pointer"""
+        if self.schema is None:
+            self._open(pa.schema([]))
+        self._finish()
+        try:
+            partitions = self._partition() if self.partition else None
+            pointer = self.store.save_file(self.datasource, self._path, data_hash)
+        finally:
+            os.remove(self._path)
+        if partitions:
+            pointer['partitions'] = partitions
+        return pointer
+
+    def abort(self):
+        """Discard a partially written snapshot"""
+        if self._path:
+            self._finish()
+            os.remove(self._path)
+            self._path = None
+
+    def _open(self, schema: pa.Schema):
+        fd, self._path = tempfile.mkstemp(suffix=f'.{self.store.format}')
+        os.close(fd)
+        self.schema = schema
+        self._sink = pa.OSFile(self._path, 'wb')
+        self._writer = ipc.new_file(self._sink, schema)
+
+    def _finish(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
+
+    def _partition(self):
+        """
+        Group the written rows by month of the primary date column
+
+        Returns the partition index ({'column', 'months': [{'month', 'offset',
+        'rows'}]}, month 'YYYY-MM' or None for rows without a date), or None
+        when the snapshot has no date column.
+        """
+        column = next((field.name for field in self.schema if pa.types.is_timestamp(field.type)), None)
+        if column is None or self.row_count == 0:
+            return None
+
+        old_path = self._path
+        with pa.memory_map(old_path, 'r') as source:
+            table = ipc.open_file(source).read_all()
+            # Naive UTC, like the day numbers used by period filters
+            values = table.column(column).to_numpy()
+            if values.dtype.kind != 'M':
+                values = values.astype('datetime64[ns]')
+            months = values.astype('datetime64[M]').astype(np.int64)
+            months[np.isnat(values)] = np.iinfo(np.int64).max
+
+            in_order = bool(np.all(months[1:] >= months[:-1]))
+            if in_order:
+                sorted_months = months
+            else:
+                order = np.argsort(months, kind='stable')
+                sorted_months = months[order]
+                self._open(self.schema)
+                for offset in range(0, len(order), PARTITION_BATCH_ROWS):
+                    positions = order[offset:offset + PARTITION_BATCH_ROWS]
+                    self._writer.write_table(table.take(positions))
+                self._finish()
+            del table
+
+        if not in_order:
+            os.remove(old_path)
+
+        starts = np.flatnonzero(np.r_[True, sorted_months[1:] != sorted_months[:-1]])
+        counts = np.diff(np.r_[starts, len(sorted_months)])
+        partitions = []
+        for offset, rows in zip(starts.tolist(), counts.tolist()):
+            month = int(sorted_months[offset])
+            label = None if month == np.iinfo(np.int64).max else str(np.datetime64(month, 'M'))
+            partitions.append({'month': label, 'offset': offset, 'rows': rows})
+        return {'column': column, 'months': partitions}
+
+    def _rewrite(self, schema: pa.Schema):
+        self._finish()
+        old_path = self._path
+        self._open(schema)
+        with pa.memory_map(old_path, 'r') as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                self._writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        os.remove(old_path)
+
+    def _unify(self, current: pa.Schema, incoming: pa.Schema) -> pa.Schema:
+        fields = []
+        for field in current:
+            new_type = incoming.field(field.name).type
+            fields.append(pa.field(field.name, promote_type(field.type, new_type)))
+        return pa.schema(fields)
+
+
+def promote_type(current: pa.DataType, incoming: pa.DataType) -> pa.DataType:
+    """
+    Type that holds values of both types: mixed numbers become float64,
+    anything else that differs becomes text
+    """
+    if current.equals(incoming) or pa.types.is_null(incoming):
+        return current
+    if pa.types.is_null(current):
+        return incoming
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(current) for check in numeric) and any(check(incoming) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+def partition_ranges(partitions: dict, start=None, end=None):
+    """
+    (offset, rows) of the month partitions overlapping [start, end)
+
+    Bounds are compared as day numbers, like dates.between; rows without a
+    date never match a period. Returns None without a partition index.
+    """
+    if not partitions:
+        return None
+    if start is None and end is None:
+        return [(part['offset'], part['rows']) for part in partitions['months']]
+
+    first = dates.first_day(start) if start is not None else None
+    last = dates.first_day(end) if end is not None else None
+    ranges = []
+    for part in partitions['months']:
+        if part['month'] is None:
+            continue
+        month = np.datetime64(part['month'], 'M')
+        month_first = int(month.astype('datetime64[D]').astype(np.int64))
+        month_end = int((month + 1).astype('datetime64[D]').astype(np.int64))
+        if first is not None and month_end <= first:
+            continue
+        if last is not None and month_first >= last:
+            continue
+        if ranges and sum(ranges[-1]) == part['offset']:
+            # Consecutive months: one slice
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + part['rows'])
+        else:
+            ranges.append((part['offset'], part['rows']))
+    return ranges
@@ -0,0 +1,135 @@
+"""
+Embedded analytical SQL engine over snapshots
+Snapshots are registered in an in-process DuckDB database as Arrow tables
+(memory-mapped files are scanned in place, nothing is copied) and queried
+with multi-threaded vectorized SQL. Queries that outgrow MEMORY_LIMIT spill
+to TEMP_DIRECTORY. Configured by settings.SQL_ENGINE; duckdb is an optional
+dependency, imported on first use.
+"""
+import threading
+
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+
+from . import dates
+
+# Name of the table with the rows of a period
+ROWS = 'rows'
+NS_PER_DAY = 86_400 * 10**9
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def quote(name) -> str:
+    """SQL identifier for a column or table name"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def day_number(column) -> str:
+    """
+    SQL day number (days since 1970) of a timestamp column
+
+    Naive timestamps are taken as they are and tz-aware ones in UTC, like
+    dates.epoch_days, so both engines put a row on the same day.
+    """
+    ns = f'epoch_ns({quote(column)})'
+    # Integer floor division (`//` truncates towards zero before 1970)
+    return f'CAST({ns} // {NS_PER_DAY} - CASE WHEN {ns} % {NS_PER_DAY} < 0 THEN 1 ELSE 0 END AS INTEGER)'
+
+
+def day_date(column) -> str:
+    """SQL DATE of the day_number of a timestamp column (no time zone involved)"""
+    return f"(DATE '1970-01-01' + {day_number(column)})"
+
+
+def database():
+    """Process-wide in-memory DuckDB database configured by settings.SQL_ENGINE"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                import duckdb
+
+                config = getattr(settings, 'SQL_ENGINE', {})
+                options = {}
+                if config.get('THREADS'):
+                    options['threads'] = int(config['THREADS'])
+                if config.get('MEMORY_LIMIT'):
+                    options['memory_limit'] = config['MEMORY_LIMIT']
+                if config.get('TEMP_DIRECTORY'):
+                    options['temp_directory'] = str(config['TEMP_DIRECTORY'])
+                _database = duckdb.connect(':memory:', config=options)
+    return _database
+
+
+class SQLEngine:
+    """
+    One cursor on the shared database, with its own registered tables
+
+    Cursors are cheap and not shared between threads: create one engine
+    per request (or task) and close it when done.
+    """
+
+    def __init__(self):
+        self.connection = database().cursor()
+
+    def register(self, name, data):
+        """Expose an Arrow table or a DataFrame as a table (no copy)"""
+        self.connection.register(name, data)
+        return name
+
+    def register_rows(self, table: pa.Table, date_column=None, start=None, end=None, name=ROWS):
+        """
+        Temp table `name` with the rows of `table` with `date_column` in [start, end)
+
+        Same rule as dates.between: the bounds are rounded up to whole days
+        and rows without a date are excluded whenever a date column is given.
+        The period is filtered once here, so every later query only scans
+        its rows; the table lives in DuckDB's buffer pool (spilled to
+        TEMP_DIRECTORY past MEMORY_LIMIT) and is dropped with the cursor.
+        """
+        source = self.register(f'{name}_source', table)
+        conditions = []
+        if date_column is not None:
+            day = day_number(date_column)
+            conditions.append(f'{quote(date_column)} IS NOT NULL')
+            if start is not None:
+                conditions.append(f'{day} >= {dates.first_day(start)}')
+            if end is not None:
+                conditions.append(f'{day} < {dates.first_day(end)}')
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        self.connection.execute(f'CREATE OR REPLACE TEMP TABLE {quote(name)} AS SELECT * FROM {quote(source)}{where}')
+        return name
+
+    def register_snapshot(self, datasource, date_column=None, start=None, end=None, name=ROWS, service=None):
+        """
+        Rows table of a datasource snapshot, optionally restricted to a period
+
+        Partitioned snapshots only map the months overlapping the period.
+        """
+        from .data_ingestion_service import DataIngestionService
+
+        service = service or DataIngestionService()
+        if date_column is not None:
+            table = service.get_period_table(datasource, date_column, start, end)
+        else:
+            table = service.get_table(datasource)
+        return self.register_rows(table, date_column, start, end, name=name)
+
+    def query(self, sql, params=None) -> pd.DataFrame:
+        return self.connection.execute(sql, params or []).df()
+
+    def scalar(self, sql, params=None):
+        row = self.connection.execute(sql, params or []).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,364 @@
+"""
+Mergeable dataset statistics
+Single-pass accumulators fed chunk by chunk during ingestion; their state is
+stored with the snapshot so schema/statistics never need the row data again
+"""
+import base64
+import math
+import numpy as np
+import pandas as pd
+
+SAMPLE_VALUES = 5
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii')
+
+
+def _decode(data: str, dtype) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy()
+
+
+def _to_python(value):
+    """Plain JSON-friendly value for sample lists"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    return value
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count (HyperLogLog, 2^p registers)
+
+    Registers merge by element-wise max, so sketches from different chunks
+    or snapshots combine without seeing the values again.
+    """
+
+    def __init__(self, p: int = 10, registers: np.ndarray = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray):
+        """Add 64-bit hashes (e.g. from pd.util.hash_pandas_object)"""
+        if len(hashes) == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        # Rank = leading zeros of the next 32 bits + 1
+        rest = ((hashes >> np.uint64(32 - self.p)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.frexp(rest)[1]
+        rank = (33 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'p': self.p, 'registers': _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(p=data['p'], registers=_decode(data['registers'], np.uint8))
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles (KLL sketch)
+
+    Level h holds items of weight 2^h; when a level overflows it is sorted
+    and every other item is promoted. Lower levels get geometrically smaller
+    capacities, so the sketch stays around 3k items whatever the row count.
+    While nothing has been compacted the quantiles are exact.
+    """
+
+    def __init__(self, k: int = 128, levels=None):
+        self.k = k
+        self.levels = levels or [np.empty(0, dtype=np.float64)]
+        self._offset = 0
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64, copy=False)])
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch'):
+        for h, items in enumerate(other.levels):
+            if h < len(self.levels):
+                self.levels[h] = np.concatenate([self.levels[h], items])
+            else:
+                self.levels.append(items.copy())
+        self._compress()
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                promoted = pairs[self._offset::2]
+                self._offset ^= 1
+                self.levels[h] = keep
+                if h + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                else:
+                    self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                # Capacities depend on the depth; restart from the bottom
+                h = 0
+                continue
+            h += 1
+
+    def quantile(self, q: float):
+        if len(self.levels) == 1:
+            if len(self.levels[0]) == 0:
+                return None
+            return float(np.quantile(self.levels[0], q))
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level), 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(items[order][min(position, len(items) - 1)])
+
+    def to_dict(self):
+        return {'k': self.k, 'levels': [_encode(level) for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(k=data['k'], levels=[_decode(level, np.float64) for level in data['levels']])
+
+
+class ColumnAccumulator:
+    """Counts, extremes, moments, quantiles and distinct values of one column"""
+
+    def __init__(self):
+        self.kind = None
+        self.dtype = None
+        self.count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.samples = []
+        self.distinct = HyperLogLog()
+        self.quantiles = QuantileSketch()
+
+    @staticmethod
+    def _kind_of(series: pd.Series) -> str:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return 'datetime'
+        if pd.api.types.is_numeric_dtype(series):
+            return 'numeric'
+        return 'text'
+
+    def update(self, series: pd.Series):
+        kind = self._kind_of(series)
+        self._merge_type(kind, str(series.dtype))
+
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+
+        if len(self.samples) < SAMPLE_VALUES:
+            self.samples.extend(_to_python(v) for v in values.head(SAMPLE_VALUES - len(self.samples)).tolist())
+
+        if self.kind == 'numeric':
+            array = values.to_numpy(dtype=np.float64)
+            self._update_range(float(array.min()), float(array.max()))
+            self.sum += float(array.sum())
+            self.sumsq += float(np.dot(array, array))
+            self.quantiles.update(array)
+            hashed = pd.util.hash_array(array)
+        elif self.kind == 'datetime':
+            array = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            self._update_range(int(array.min()), int(array.max()))
+            hashed = pd.util.hash_array(array)
+        else:
+            hashed = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+
+        self.distinct.update_hashes(hashed)
+
+    def merge(self, other: 'ColumnAccumulator'):
+        if other.kind is None:
+            return
+        self._merge_type(other.kind, other.dtype)
+        self.count += other.count
+        self.null_count += other.null_count
+        self.samples.extend(other.samples[:SAMPLE_VALUES - len(self.samples)])
+        if self.kind != 'text' and other.kind == self.kind:
+            if other.min is not None:
+                self._update_range(other.min, other.max)
+            self.sum += other.sum
+            self.sumsq += other.sumsq
+            self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+
+    def _merge_type(self, kind, dtype):
+        if self.kind is None:
+            self.kind, self.dtype = kind, dtype
+            return
+        if dtype != self.dtype:
+            both_numeric = self.kind == kind == 'numeric'
+            self.dtype = 'float64' if both_numeric else 'object'
+        if kind != self.kind:
+            # Mixed chunks end up stored as text (see SnapshotWriter)
+            self.kind = 'text'
+            self.min = self.max = None
+            self.sum = self.sumsq = 0.0
+            self.quantiles = QuantileSketch()
+
+    def _update_range(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def schema(self):
+        return {
+            'dtype': self.dtype,
+            'nullable': self.null_count > 0,
+            'unique_count': self.distinct.estimate() if self.count else 0,
+            'sample_values': list(self.samples),
+        }
+
+    def numeric_statistics(self):
+        has_values = self.count > 0
+        mean = self.sum / self.count if has_values else None
+        std = None
+        if self.count > 1:
+            variance = (self.sumsq - self.count * mean * mean) / (self.count - 1)
+            std = math.sqrt(max(variance, 0.0))
+        return {
+            'min': float(self.min) if has_values else None,
+            'max': float(self.max) if has_values else None,
+            'mean': mean,
+            'median': self.quantiles.quantile(0.5) if has_values else None,
+            'p25': self.quantiles.quantile(0.25) if has_values else None,
+            'p75': self.quantiles.quantile(0.75) if has_values else None,
+            'std': std,
+            'null_count': self.null_count,
+        }
+
+    def date_statistics(self):
+        has_values = self.count > 0
+        return {
+            'min': pd.Timestamp(self.min).isoformat() if has_values else None,
+            'max': pd.Timestamp(self.max).isoformat() if has_values else None,
+        }
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'dtype': self.dtype,
+            'count': self.count,
+            'null_count': self.null_count,
+            'min': self.min,
+            'max': self.max,
+            'sum': self.sum,
+            'sumsq': self.sumsq,
+            'samples': self.samples,
+            'distinct': self.distinct.to_dict(),
+            'quantiles': self.quantiles.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        column = cls()
+        for key in ('kind', 'dtype', 'count', 'null_count', 'min', 'max', 'sum', 'sumsq', 'samples'):
+            setattr(column, key, data[key])
+        column.distinct = HyperLogLog.from_dict(data['distinct'])
+        column.quantiles = QuantileSketch.from_dict(data['quantiles'])
+        return column
+
+
+class StatisticsAccumulator:
+    """
+    Dataset statistics built in one pass over the chunks of a snapshot
+
+    Produces the same `schema` and `statistics` structures the snapshot
+    metadata has always carried; `to_dict()` is stored alongside them so a
+    later append can `merge` instead of recomputing from the rows.
+    """
+
+    def __init__(self):
+        self.row_count = 0
+        self.memory_bytes = 0
+        self.columns = {}
+
+    def update(self, df: pd.DataFrame):
+        self.row_count += len(df)
+        self.memory_bytes += int(df.memory_usage(deep=True, index=False).sum())
+        for col in df.columns:
+            self.columns.setdefault(col, ColumnAccumulator()).update(df[col])
+
+    def merge(self, other: 'StatisticsAccumulator'):
+        self.row_count += other.row_count
+        self.memory_bytes += other.memory_bytes
+        for col, column in other.columns.items():
+            self.columns.setdefault(col, ColumnAccumulator()).merge(column)
+
+    def schema(self):
+        return {col: column.schema() for col, column in self.columns.items()}
+
+    def statistics(self):
+        stats = {
+            'total_rows': self.row_count,
+            'total_columns': len(self.columns),
+            'memory_usage_mb': self.memory_bytes / (1024 * 1024),
+            'numeric_columns': [],
+            'date_columns': [],
+            'text_columns': []
+        }
+
+        for col, column in self.columns.items():
+            if column.kind == 'numeric':
+                stats['numeric_columns'].append({'name': col, **column.numeric_statistics()})
+            elif column.kind == 'datetime':
+                stats['date_columns'].append({'name': col, **column.date_statistics()})
+            else:
+                stats['text_columns'].append(col)
+
+        return stats
+
+    def to_dict(self):
+        return {
+            'row_count': self.row_count,
+            'memory_bytes': self.memory_bytes,
+            'columns': {col: column.to_dict() for col, column in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        accumulator = cls()
+        accumulator.row_count = data['row_count']
+        accumulator.memory_bytes = data['memory_bytes']
+        accumulator.columns = {
+            col: ColumnAccumulator.from_dict(column) for col, column in data['columns'].items()
+        }
+        return accumulator
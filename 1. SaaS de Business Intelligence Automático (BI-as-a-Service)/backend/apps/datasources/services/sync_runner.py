@@ -0,0 +1,191 @@
+"""
+Concurrent synchronization of many data sources
+A bounded thread pool runs DataSourceService.sync_datasource, with per-host
+limits so one origin (e.g. docs.google.com) is never hit by every worker
+at once
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from django.db import connection
+from django.utils import timezone
+
+from apps.datasources.models import DataSource, LOCAL_SOURCE_TYPES
+from .datasource_service import DataSourceService
+
+logger = logging.getLogger(__name__)
+
+# Origin of the sources that are fetched over HTTP
+SOURCE_HOSTS = {
+    'google_sheets': 'docs.google.com',
+}
+
+
+class HostRateLimiter:
+    """
+    Per-host concurrency and pacing
+
+    At most `max_concurrent` syncs of the same host run together, and two
+    of them never start less than `min_interval` seconds apart. Sources
+    without a host (uploads) are not limited.
+    """
+
+    def __init__(self, max_concurrent=2, min_interval=1.0):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, host):
+        if host is None:
+            yield
+            return
+
+        with self._lock:
+            semaphore = self._slots.setdefault(host, threading.BoundedSemaphore(self.max_concurrent))
+
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class SyncRunner:
+    """Plans and runs the synchronization of a set of data sources"""
+
+    def __init__(self, workers=4, per_host=2, min_interval=1.0, service_class=DataSourceService):
+        if workers < 1:
+            raise ValueError('workers deve ser maior que zero')
+        self.workers = workers
+        self.limiter = HostRateLimiter(per_host, min_interval)
+        self.service_class = service_class
+
+    @staticmethod
+    def host_for(datasource):
+        """Host contacted when syncing the source, or None for local data"""
+        if datasource.source_type in LOCAL_SOURCE_TYPES:
+            return None
+        host = SOURCE_HOSTS.get(datasource.source_type)
+        if host:
+            return host
+        url = (datasource.connection_config or {}).get('url')
+        return urlparse(url).hostname if url else None
+
+    def plan(self, datasources):
+        """
+        Due set with the load expected from the previous sync of each source
+
+        Returns the sources plus totals: bytes, serial time and an estimate
+        of the wall time with this runner's workers and per-host limits.
+        """
+        items = []
+        host_seconds = {}
+        for datasource in datasources:
+            host = self.host_for(datasource)
+            seconds = datasource.last_sync_duration
+            items.append({
+                'id': datasource.id,
+                'name': datasource.name,
+                'source_type': datasource.source_type,
+                'host': host,
+                'last_synced_at': datasource.last_synced_at,
+                'expected_seconds': seconds,
+                'expected_bytes': datasource.last_sync_bytes,
+            })
+            if host and seconds:
+                host_seconds[host] = host_seconds.get(host, 0.0) + seconds
+
+        serial_seconds = sum(item['expected_seconds'] or 0.0 for item in items)
+        # A host cannot go faster than its own lane allows
+        per_host_lanes = min(self.limiter.max_concurrent, self.workers)
+        bottleneck = max((seconds / per_host_lanes for seconds in host_seconds.values()), default=0.0)
+        return {
+            'sources': items,
+            'workers': self.workers,
+            'total': len(items),
+            'without_history': sum(1 for item in items if item['expected_seconds'] is None),
+            'expected_bytes': sum(item['expected_bytes'] or 0 for item in items),
+            'serial_seconds': serial_seconds,
+            'estimated_seconds': max(serial_seconds / self.workers, bottleneck),
+            'by_host': {host or 'local': sum(1 for item in items if item['host'] == host)
+                        for host in {item['host'] for item in items}},
+        }
+
+    def run(self, datasources, on_result=None):
+        """
+        Sync every source in the pool; returns one result per source
+
+        on_result: called (from the calling thread) as each source finishes
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='datasource-sync') as pool:
+            futures = [pool.submit(self._sync_one, datasource.id) for datasource in datasources]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return results
+
+    def _sync_one(self, datasource_id):
+        result = {'id': datasource_id, 'status': 'skipped', 'error': ''}
+        claimed = 0
+        try:
+            now = timezone.now()
+            claimed = DataSource.objects.filter(pk=datasource_id).not_syncing(now).update(
+                sync_status='running',
+                sync_step='ingest',
+                sync_progress=0,
+                sync_error='',
+                sync_started_at=now,
+            )
+            datasource = DataSource.objects.select_related('organization').filter(pk=datasource_id).first()
+            if datasource is None:
+                # Removed after being planned
+                return result
+            result.update(name=datasource.name, host=self.host_for(datasource))
+            if not claimed:
+                # Already being synced by the pipeline or another run
+                return result
+
+            with self.limiter.slot(result['host']):
+                self.service_class().sync_datasource(datasource)
+            result['status'] = 'success'
+        except Exception as exc:  # noqa: BLE001
+            logger.exception('Erro ao sincronizar datasource %s: %s', datasource_id, exc)
+            result.update(status='failed', error=str(exc))
+        finally:
+            if claimed:
+                # Whatever failed above, the claim must not stay 'running'
+                self._release(datasource_id, result)
+            # Each pool thread has its own connection; don't leak it
+            connection.close()
+        return result
+
+    def _release(self, datasource_id, result):
+        """Final status of a claimed source, plus the metrics of its sync"""
+        try:
+            DataSource.objects.filter(pk=datasource_id).update(
+                sync_status=result['status'],
+                sync_step='',
+                sync_progress=100 if result['status'] == 'success' else 0,
+                sync_error=result['error'],
+            )
+            metrics = DataSource.objects.filter(pk=datasource_id).values(
+                'last_sync_duration', 'last_sync_bytes'
+            ).first() or {}
+        except Exception as exc:  # noqa: BLE001
+            # Left to the stale-claim timeout
+            logger.exception('Erro ao gravar o status do datasource %s: %s', datasource_id, exc)
+            return
+        result.update(duration=metrics.get('last_sync_duration'), bytes=metrics.get('last_sync_bytes'))
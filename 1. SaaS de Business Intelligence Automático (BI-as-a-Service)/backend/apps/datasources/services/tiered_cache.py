@@ -0,0 +1,209 @@
+"""
+Multi-tier cache for snapshot tables
+Tier 1 is an in-process LRU bounded by bytes; tier 2 is the shared Django
+cache (Redis in production) holding compressed Arrow IPC payloads; misses
+load from storage. Concurrent misses for the same key in a process share
+one load (single-flight).
+
+Keys must be versioned: snapshot paths already are
+(`org_<id>/datasource_<id>/<data_hash>.arrow`), so a new snapshot never
+reads an old entry and nothing needs to be invalidated.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the payload encoding changes
+PAYLOAD_VERSION = 1
+
+
+class ByteLRU:
+    """LRU bounded by the total size of its values, not by entry count"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, nbytes: int):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TableCache:
+    """
+    Arrow tables by versioned key: local LRU -> shared cache -> loader
+
+    remote: a Django cache (e.g. caches['default'] backed by Redis) or None
+    for a process-local cache only. Tables are stored there as zstd
+    compressed Arrow IPC; payloads over max_remote_bytes stay local.
+    """
+
+    def __init__(self, max_local_bytes, remote=None, remote_timeout=24 * 60 * 60,
+                 max_remote_bytes=32 * 1024 * 1024, compression='zstd'):
+        self.local = ByteLRU(max_local_bytes)
+        self.remote = remote
+        self.remote_timeout = remote_timeout
+        self.max_remote_bytes = max_remote_bytes
+        self.compression = compression
+        self.stats = {'local_hits': 0, 'remote_hits': 0, 'loads': 0, 'coalesced': 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: str, load) -> pa.Table:
+        table = self.local.get(key)
+        if table is not None:
+            self.stats['local_hits'] += 1
+            return table
+        return self._single_flight(key, lambda: self._fill(key, load))
+
+    def _single_flight(self, key, func):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self.stats['coalesced'] += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = func()
+            return flight.value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _fill(self, key, load) -> pa.Table:
+        # Another request may have filled it while this one waited for the lock
+        table = self.local.get(key)
+        if table is not None:
+            return table
+
+        table = self._remote_get(key)
+        if table is not None:
+            self.stats['remote_hits'] += 1
+        else:
+            self.stats['loads'] += 1
+            table = load()
+            self._remote_set(key, table)
+
+        self.local.set(key, table, table.get_total_buffer_size())
+        return table
+
+    def _remote_key(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return f"snapshot_table:v{PAYLOAD_VERSION}:{digest}"
+
+    def _remote_get(self, key):
+        if self.remote is None:
+            return None
+        try:
+            payload = self.remote.get(self._remote_key(key))
+        except Exception as exc:
+            # The shared tier is an optimization: fall through to storage
+            logger.warning(f"Snapshot cache read failed for {key}: {exc}")
+            return None
+        if payload is None:
+            return None
+        return ipc.open_stream(pa.BufferReader(payload)).read_all()
+
+    def _remote_set(self, key, table: pa.Table):
+        if self.remote is None:
+            return
+        sink = pa.BufferOutputStream()
+        options = ipc.IpcWriteOptions(compression=self.compression)
+        with ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        payload = sink.getvalue().to_pybytes()
+        if len(payload) > self.max_remote_bytes:
+            return
+        try:
+            self.remote.set(self._remote_key(key), payload, timeout=self.remote_timeout)
+        except Exception as exc:
+            logger.warning(f"Snapshot cache write failed for {key}: {exc}")
+
+    def discard(self, key):
+        self.local.discard(key)
+        if self.remote is not None:
+            try:
+                self.remote.delete(self._remote_key(key))
+            except Exception as exc:
+                logger.warning(f"Snapshot cache delete failed for {key}: {exc}")
+
+
+_table_cache = None
+_table_cache_lock = threading.Lock()
+
+
+def table_cache() -> TableCache:
+    """Process-wide cache configured by settings.SNAPSHOT_CACHE"""
+    global _table_cache
+    if _table_cache is None:
+        with _table_cache_lock:
+            if _table_cache is None:
+                from django.core.cache import caches
+
+                config = getattr(settings, 'SNAPSHOT_CACHE', {})
+                alias = config.get('REMOTE_ALIAS')
+                _table_cache = TableCache(
+                    max_local_bytes=config.get('LOCAL_MAX_BYTES', 256 * 1024 * 1024),
+                    remote=caches[alias] if alias else None,
+                    remote_timeout=config.get('REMOTE_TIMEOUT', 24 * 60 * 60),
+                    max_remote_bytes=config.get('REMOTE_MAX_BYTES', 32 * 1024 * 1024),
+                )
+    return _table_cache
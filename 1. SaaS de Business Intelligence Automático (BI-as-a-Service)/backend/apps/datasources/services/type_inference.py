@@ -0,0 +1,271 @@
+"""
+Column type inference
+One vectorized pass over a bounded sample decides the type of every column
+(numeric, date + format, category, boolean, identifier or text) and its
+semantic role. The resulting TypedSchema is stored on the snapshot, so
+dashboards and profiles read it instead of re-parsing the columns
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+NUMERIC = 'numeric'
+DATE = 'date'
+CATEGORY = 'category'
+BOOLEAN = 'boolean'
+IDENTIFIER = 'identifier'
+TEXT = 'text'
+
+# Tried in order; the format that parses most of the sample wins
+DATE_FORMATS = [
+    'ISO8601',
+    '%d/%m/%Y', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S',
+    '%m/%d/%Y', '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S',
+    '%d-%m-%Y', '%m-%d-%Y', '%d.%m.%Y', '%Y/%m/%d', '%d/%m/%y',
+]
+
+DATE_LIKE = re.compile(
+    r'\d{4}[-/.]\d{1,2}[-/.]\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?'
+    r'|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}( \d{1,2}:\d{2}(:\d{2})?)?'
+)
+CURRENCY = re.compile(r'[R$\s]')
+# "1.234,56" / "12,5" (pt-BR) vs "1,234.56" / "12.5"
+COMMA_DECIMAL = re.compile(r'-?\d{1,3}(\.\d{3})*,\d+|-?\d+,\d+')
+DOT_DECIMAL = re.compile(r'-?\d{1,3}(,\d{3})*(\.\d+)?|-?\d+(\.\d+)?')
+CODE_LIKE = re.compile(r'[A-Za-z0-9#_./-]*\d[A-Za-z0-9#_./-]*')
+ID_NAME = re.compile(r'(^|_)(id|uuid|cod|codigo|code|numero|num|nr)($|_)')
+
+BOOLEAN_TOKENS = {
+    'true', 'false', 'sim', 'não', 'nao', 'yes', 'no', 's', 'n',
+    'verdadeiro', 'falso', 'ativo', 'inativo',
+}
+
+ROLE_KEYWORDS = {
+    'value': ['valor', 'value', 'preco', 'price', 'total', 'amount', 'receita', 'revenue'],
+    'quantity': ['quantidade', 'qtd', 'qty', 'units', 'unidades', 'qtde'],
+    'product': ['produto', 'product', 'item', 'sku'],
+    'customer': ['cliente', 'customer', 'nome', 'name', 'comprador'],
+}
+
+
+def _name_matches(col, role) -> bool:
+    col_lower = str(col).lower()
+    return any(keyword in col_lower for keyword in ROLE_KEYWORDS[role])
+
+
+class TypedSchema:
+    """
+    Inferred type of every column
+
+    Each column maps to {'type', 'role', 'format', 'decimal'}: `format` is
+    the strptime format (or 'ISO8601') dates were parsed with, `decimal`
+    the decimal separator of numbers read from text. Stored on the
+    snapshot as `typed_schema` (see to_dict).
+    """
+
+    VERSION = 1
+
+    def __init__(self, columns=None):
+        self.columns = dict(columns or {})
+
+    def __contains__(self, col):
+        return col in self.columns
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    def get(self, col, default=None):
+        return self.columns.get(col, default)
+
+    def type_of(self, col):
+        column = self.columns.get(col)
+        return column['type'] if column else None
+
+    def of_type(self, *types, columns=None):
+        """Names of the columns with one of `types`, in column order"""
+        names = self.columns if columns is None else [col for col in columns if col in self.columns]
+        return [col for col in names if self.columns[col]['type'] in types]
+
+    def with_role(self, role, columns=None):
+        names = self.columns if columns is None else [col for col in columns if col in self.columns]
+        return [col for col in names if self.columns[col]['role'] == role]
+
+    def column_types(self, columns=None):
+        """
+        Columns grouped the way the dashboard detectors expect:
+        numeric, date, boolean, categorical (category + text) and identifier
+        """
+        return {
+            'numeric': self.of_type(NUMERIC, columns=columns),
+            'categorical': self.of_type(CATEGORY, TEXT, columns=columns),
+            'date': self.of_type(DATE, columns=columns),
+            'boolean': self.of_type(BOOLEAN, columns=columns),
+            'identifier': self.of_type(IDENTIFIER, columns=columns),
+        }
+
+    def to_dict(self):
+        return {'version': self.VERSION, 'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data or data.get('version') != cls.VERSION:
+            return None
+        return cls(data['columns'])
+
+
+class TypeInferenceEngine:
+    """
+    Decides column types from a bounded sample
+
+    `infer` probes each column once with vectorized regexes on at most
+    SAMPLE_ROWS evenly spaced rows; `apply` then converts the full columns
+    with the decided decimal separator / date format, so no full column
+    is ever parsed just to find out what it is.
+    """
+
+    SAMPLE_ROWS = 5000
+    # Share of the non-null sample that must parse for a conversion to be used
+    MIN_MATCH = 0.5
+    # Text columns with at most this many distinct sample values are categories
+    MAX_CATEGORIES = 50
+    # Fewer rows than this can't tell an identifier from a small dimension
+    MIN_IDENTIFIER_ROWS = 20
+
+    def infer(self, df: pd.DataFrame) -> TypedSchema:
+        sample = self.sample(df)
+        return TypedSchema({col: self.infer_column(sample[col], col) for col in sample.columns})
+
+    def sample(self, df: pd.DataFrame) -> pd.DataFrame:
+        if len(df) <= self.SAMPLE_ROWS:
+            return df
+        positions = np.linspace(0, len(df) - 1, self.SAMPLE_ROWS).astype(np.int64)
+        return df.iloc[positions]
+
+    def infer_column(self, series: pd.Series, col) -> dict:
+        column = {'type': TEXT, 'role': 'attribute', 'format': None, 'decimal': None}
+        values = series.dropna()
+
+        if pd.api.types.is_bool_dtype(series):
+            column['type'] = BOOLEAN
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            column['type'] = DATE
+        elif pd.api.types.is_numeric_dtype(series):
+            column['type'] = NUMERIC
+            if self._looks_like_identifier(values, col, numeric=True):
+                column['type'] = IDENTIFIER
+        elif len(values):
+            text = values.astype(str).str.strip()
+            text = text[text != '']
+            column.update(self._probe_text(text, col))
+
+        column['role'] = self._role(col, column['type'])
+        return column
+
+    def _probe_text(self, text: pd.Series, col) -> dict:
+        if text.empty:
+            return {'type': TEXT}
+
+        decimal, share = self._numeric_probe(text)
+        if share > self.MIN_MATCH:
+            return {'type': NUMERIC, 'decimal': decimal}
+
+        if text.str.fullmatch(DATE_LIKE).mean() > self.MIN_MATCH:
+            fmt = self._date_format(text)
+            if fmt is not None:
+                return {'type': DATE, 'format': fmt}
+
+        distinct = text.nunique()
+        if text.str.lower().isin(BOOLEAN_TOKENS).all() or distinct == 2:
+            return {'type': BOOLEAN}
+        if self._looks_like_identifier(text, col):
+            return {'type': IDENTIFIER}
+        if distinct <= self.MAX_CATEGORIES or distinct <= len(text) * 0.5:
+            return {'type': CATEGORY}
+        return {'type': TEXT}
+
+    def _numeric_probe(self, text: pd.Series):
+        """(decimal separator, share of the sample that reads as a number)"""
+        cleaned = text.str.replace(CURRENCY, '', regex=True)
+        comma = cleaned.str.fullmatch(COMMA_DECIMAL).mean()
+        dot = cleaned.str.fullmatch(DOT_DECIMAL).mean()
+        return (',', comma) if comma > dot else ('.', dot)
+
+    def _date_format(self, text: pd.Series):
+        best, best_share = None, self.MIN_MATCH
+        for fmt in DATE_FORMATS:
+            try:
+                share = pd.to_datetime(text, format=fmt, errors='coerce').notna().mean()
+            except (ValueError, TypeError):
+                # e.g. ISO strings with mixed UTC offsets
+                continue
+            if share > best_share:
+                best, best_share = fmt, share
+                if share == 1.0:
+                    break
+        return best
+
+    def _looks_like_identifier(self, values: pd.Series, col, numeric=False) -> bool:
+        if len(values) < self.MIN_IDENTIFIER_ROWS or values.nunique() < len(values) * 0.95:
+            return False
+        if ID_NAME.search(str(col).lower()):
+            return True
+        if numeric:
+            # Unique numbers are only ids when the name says so
+            return False
+        # Unique codes (no spaces, with digits); unique names are still a dimension
+        return bool(values.astype(str).str.fullmatch(CODE_LIKE).all())
+
+    def _role(self, col, kind) -> str:
+        if kind == NUMERIC:
+            for role in ('value', 'quantity'):
+                if _name_matches(col, role):
+                    return role
+            return 'measure'
+        if kind == DATE:
+            return 'time'
+        if kind == IDENTIFIER:
+            return 'identifier'
+        if kind == BOOLEAN:
+            return 'flag'
+        for role in ('product', 'customer'):
+            if _name_matches(col, role):
+                return role
+        return 'dimension' if kind == CATEGORY else 'attribute'
+
+    def apply(self, df: pd.DataFrame, schema: TypedSchema) -> pd.DataFrame:
+        """
+        Convert numeric/date columns that are still text
+
+        Converts in place: callers pass a frame they own.
+        """
+        for col in df.columns:
+            column = schema.get(col)
+            if column is not None:
+                converted = self.convert(df[col], column)
+                if converted is not None:
+                    df[col] = converted
+        return df
+
+    def convert(self, series: pd.Series, column: dict):
+        """Typed copy of `series`, or None when it already has the right dtype"""
+        if column['type'] == NUMERIC and not pd.api.types.is_numeric_dtype(series):
+            return self.to_numeric(series, column.get('decimal') or '.')
+        if column['type'] == DATE and not pd.api.types.is_datetime64_any_dtype(series):
+            return self.to_datetime(series, column.get('format'))
+        return None
+
+    @staticmethod
+    def to_numeric(series: pd.Series, decimal='.') -> pd.Series:
+        cleaned = series.astype(str).str.replace(CURRENCY, '', regex=True)
+        if decimal == ',':
+            cleaned = cleaned.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        else:
+            cleaned = cleaned.str.replace(',', '', regex=False)
+        return pd.to_numeric(cleaned, errors='coerce')
+
+    @staticmethod
+    def to_datetime(series: pd.Series, fmt=None) -> pd.Series:
+        if fmt is None:
+            return pd.to_datetime(series, errors='coerce')
+        return pd.to_datetime(series, format=fmt, errors='coerce')
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+from .models import DataSource
+
+# Enviado quando um novo snapshot da fonte é persistido (kwargs: datasource, snapshot)
+snapshot_updated = Signal()
+
+
+@receiver(post_delete, sender=DataSource)
+def delete_snapshot_files(sender, instance, **kwargs):
+    """Arquivos de snapshot não são removidos em cascata pelo banco"""
+    from .services import DataIngestionService
+
+    DataIngestionService().delete_snapshot(instance)
@@ -0,0 +1,224 @@
+"""
+Tarefas assíncronas das fontes de dados
+Pipeline de sincronização executado pelo Celery:
+ingestão → perfil → agregados → dashboard automático → aquecimento de cache
+"""
+import logging
+from urllib.error import HTTPError
+
+from celery import chain, shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+from apps.datasources.models import DataSource
+from apps.datasources.services import DataProfileService, DataSourceService
+from apps.datasources.services.sheets_fetcher import SheetFetchError
+
+logger = logging.getLogger(__name__)
+
+# Etapas na ordem de execução; o progresso é a fração de etapas concluídas
+PIPELINE_STEPS = ['ingest', 'profile', 'aggregates', 'dashboard', 'warm_cache']
+
+# Tentativas extras por etapa para falhas transitórias (rede, banco, storage)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 5  # segundos; dobra a cada tentativa
+RETRY_BACKOFF_MAX = 300
+
+
+def start_pipeline(datasource, upload=None, user=None) -> bool:
+    """
+    Enfileira o pipeline completo da fonte
+
+    upload: contexto de DataSourceService.create_pending_upload (arquivo a
+        ingerir); sem ele a fonte é sincronizada com a origem.
+    user: dono do dashboard de pré-visualização; só uploads criam um.
+
+    Retorna False quando já existe um pipeline em andamento para a fonte.
+    A fila só recebe as tarefas depois do commit da transação atual.
+    """
+    now = timezone.now()
+    claimed = DataSource.objects.filter(pk=datasource.pk).not_syncing(now).update(
+        sync_status='pending',
+        sync_step='',
+        sync_progress=0,
+        sync_error='',
+        sync_started_at=now,
+    )
+    if not claimed:
+        logger.info(f"Pipeline already running for datasource {datasource.id}")
+        return False
+
+    context = {
+        'datasource_id': datasource.id,
+        'upload': upload,
+        'user_id': user.id if user else None,
+        'create_dashboard': upload is not None,
+    }
+    workflow = chain(
+        ingest_step.s(context),
+        profile_step.s(),
+        aggregates_step.s(),
+        dashboard_step.s(),
+        warm_cache_step.s(),
+    )
+    transaction.on_commit(workflow.apply_async)
+    return True
+
+
+@shared_task(ignore_result=True)
+def sync_datasource(datasource_id):
+    """Sincroniza uma fonte com a origem executando o pipeline completo"""
+    datasource = DataSource.objects.get(pk=datasource_id)
+    start_pipeline(datasource)
+
+
+def _set_step(datasource_id, step):
+    DataSource.objects.filter(pk=datasource_id).update(
+        sync_status='running',
+        sync_step=step,
+        sync_progress=int(PIPELINE_STEPS.index(step) * 100 / len(PIPELINE_STEPS)),
+    )
+
+
+def _mark_failed(datasource_id, step, exc):
+    DataSource.objects.filter(pk=datasource_id).update(
+        sync_status='failed',
+        sync_step=step,
+        sync_error=str(exc),
+    )
+
+
+def _is_transient(exc) -> bool:
+    """Falhas que podem passar sozinhas: vale tentar a etapa de novo"""
+    if isinstance(exc, SheetFetchError):
+        return exc.is_transient
+    if isinstance(exc, HTTPError):
+        # 4xx (planilha privada, não encontrada...) não muda com o tempo
+        return exc.code >= 500 or exc.code == 429
+    if isinstance(exc, FileNotFoundError):
+        return False
+    return isinstance(exc, (OSError, OperationalError))
+
+
+def _run_step(task, step, context, func):
+    """
+    Executa uma etapa registrando o progresso na fonte
+
+    Falhas transitórias são reenfileiradas com backoff exponencial (a
+    cadeia continua da mesma etapa); as demais marcam a fonte como
+    'failed' e interrompem o pipeline.
+    """
+    datasource_id = context['datasource_id']
+    _set_step(datasource_id, step)
+    try:
+        datasource = DataSource.objects.select_related('organization').get(pk=datasource_id)
+        func(datasource, context)
+    except Exception as exc:
+        retries = task.request.retries
+        if _is_transient(exc) and retries < MAX_RETRIES:
+            countdown = get_exponential_backoff_interval(
+                RETRY_BACKOFF, retries, RETRY_BACKOFF_MAX, full_jitter=True
+            )
+            logger.warning(
+                f"Step {step} failed for datasource {datasource_id} "
+                f"(attempt {retries + 1}), retrying in {countdown}s: {exc}"
+            )
+            raise task.retry(exc=exc, countdown=countdown)
+        logger.error(f"Step {step} failed for datasource {datasource_id}: {exc}", exc_info=True)
+        _mark_failed(datasource_id, step, exc)
+        if step == 'ingest' and context.get('upload'):
+            DataSourceService().discard_upload(context['upload'])
+        raise
+    return context
+
+
+@shared_task(bind=True, ignore_result=True)
+def ingest_step(self, context):
+    """Lê o arquivo enviado (ou a origem) e grava o snapshot"""
+    def ingest(datasource, context):
+        service = DataSourceService()
+        upload = context.get('upload')
+        if upload:
+            service.ingest_upload(datasource, upload)
+            service.discard_upload(upload)
+            context['changed'] = True
+            return
+
+        previous = (datasource.connection_config.get('last_snapshot') or {}).get('data_hash')
+        service.sync_datasource(datasource)
+        current = (datasource.connection_config.get('last_snapshot') or {}).get('data_hash')
+        context['changed'] = current != previous
+
+    return _run_step(self, 'ingest', context, ingest)
+
+
+@shared_task(bind=True, ignore_result=True)
+def profile_step(self, context):
+    """Classifica as colunas e detecta o template do snapshot novo"""
+    def profile(datasource, context):
+        if not context.get('changed') and datasource.connection_config.get('profile'):
+            return
+        service = DataSourceService()
+        df = service.get_dataframe(datasource)
+        schema = service.ingestion_service.get_typed_schema(datasource, df)
+        max_charts = max(1, int(datasource.organization.max_charts_per_dashboard or 4))
+        datasource.connection_config['profile'] = DataProfileService().build_profile(df, max_charts, schema=schema)
+        datasource.save(update_fields=['connection_config', 'updated_at'])
+
+    return _run_step(self, 'profile', context, profile)
+
+
+@shared_task(bind=True, ignore_result=True)
+def aggregates_step(self, context):
+    """Garante o cubo diário do snapshot (snapshots antigos não têm)"""
+    def aggregates(datasource, context):
+        DataSourceService().ingestion_service.ensure_cube(datasource)
+
+    return _run_step(self, 'aggregates', context, aggregates)
+
+
+@shared_task(bind=True, ignore_result=True)
+def dashboard_step(self, context):
+    """Cria a pré-visualização de dashboard para fontes recém-enviadas"""
+    def dashboard(datasource, context):
+        profile = datasource.connection_config.get('profile') or {}
+        if not context.get('create_dashboard') or not profile.get('has_minimum_signal'):
+            return
+
+        from apps.dashboards.services import DashboardService
+
+        user = get_user_model().objects.filter(pk=context.get('user_id')).first() or datasource.created_by
+        preview = DashboardService().create_preview_dashboard(
+            datasource,
+            user,
+            template=profile['template'],
+            config=profile['basic_config'],
+        )
+        context['dashboard_id'] = preview.id
+
+    return _run_step(self, 'dashboard', context, dashboard)
+
+
+@shared_task(bind=True, ignore_result=True)
+def warm_cache_step(self, context):
+    """Pré-calcula a visão padrão dos dashboards da fonte e conclui o pipeline"""
+    def warm_cache(datasource, context):
+        from apps.dashboards.services import DashboardService
+
+        service = DashboardService()
+        for dashboard in datasource.dashboards.all():
+            try:
+                service.get_dashboard_data(dashboard)
+            except Exception as exc:
+                # Cache frio não é erro: o dashboard calcula na primeira visita
+                logger.warning(f"Could not warm cache for dashboard {dashboard.id}: {exc}")
+
+    context = _run_step(self, 'warm_cache', context, warm_cache)
+    DataSource.objects.filter(pk=context['datasource_id']).update(
+        sync_status='success',
+        sync_step='',
+        sync_progress=100,
+    )
+    return context
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0002_remove_organization_max_ai_queries_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='exports_used_this_month',
+            field=models.IntegerField(default=0, verbose_name='exportações feitas este mês'),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='last_export_reset',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='último reset de exportações'),
+        ),
+    ]
@@ -87,6 +87,8 @@ class Organization(models.Model):
     # Usage tracking
     ai_insights_used_this_month = models.IntegerField(_('insights IA usados este mês'), default=0)
     last_ai_reset = models.DateTimeField(_('último reset de IA'), null=True, blank=True)
+    exports_used_this_month = models.IntegerField(_('exportações feitas este mês'), default=0)
+    last_export_reset = models.DateTimeField(_('último reset de exportações'), null=True, blank=True)
     
     # Settings
     settings = models.JSONField(_('configurações'), default=dict, blank=True)
@@ -158,6 +160,48 @@ class Organization(models.Model):
         self.ai_insights_used_this_month += 1
         self.save()
     
+    def get_export_limit(self):
+        """Exports allowed per month for the current plan."""
+        from apps.dashboards.exporters import DashboardExporter
+        return DashboardExporter().get_export_limit(self.plan)
+    
+    def _reset_exports_if_new_month(self):
+        from django.utils import timezone
+        from datetime import timedelta
+        
+        now = timezone.now()
+        if self.last_export_reset and now - self.last_export_reset <= timedelta(days=30):
+            return
+        self.exports_used_this_month = 0
+        self.last_export_reset = now
+        Organization.objects.filter(pk=self.pk).update(exports_used_this_month=0, last_export_reset=now)
+    
+    def can_export(self):
+        """
+        Check if organization can run more exports this month.
+        
+        The counter lives on the organization row, which requests already
+        load with the user: no extra query (besides the monthly reset).
+        """
+        self._reset_exports_if_new_month()
+        return self.exports_used_this_month < self.get_export_limit()
+    
+    def claim_export(self):
+        """
+        Count one export if the monthly limit allows it.
+        
+        Check and increment are a single conditional UPDATE, so concurrent
+        requests can't go over the limit. Returns False when it is reached.
+        """
+        self._reset_exports_if_new_month()
+        claimed = Organization.objects.filter(
+            pk=self.pk,
+            exports_used_this_month__lt=self.get_export_limit(),
+        ).update(exports_used_this_month=models.F('exports_used_this_month') + 1)
+        if claimed:
+            self.exports_used_this_month += 1
+        return bool(claimed)
+    
     def get_plan_limits(self):
         """Get all plan limits as a dictionary."""
         return {
@@ -169,6 +213,7 @@ class Organization(models.Model):
             'max_data_rows': self.max_data_rows,
             'max_charts_per_dashboard': self.max_charts_per_dashboard,
             'max_scheduled_reports': self.max_scheduled_reports,
+            'max_exports_per_month': self.get_export_limit(),
             'can_auto_sync': self.can_auto_sync,
             'can_share_dashboards': self.can_share_dashboards,
             'can_export_without_watermark': self.can_export_without_watermark,
@@ -186,6 +231,7 @@ class Organization(models.Model):
             'dashboards': self.get_dashboard_count(),
             'datasources': self.get_datasource_count(),
             'ai_insights_this_month': self.ai_insights_used_this_month,
+            'exports_this_month': self.exports_used_this_month,
         }
     
     def set_plan_limits(self, plan_name):
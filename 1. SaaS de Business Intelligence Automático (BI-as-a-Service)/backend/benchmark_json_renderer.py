@@ -0,0 +1,102 @@
+"""
+Benchmark do renderer/parser JSON da API (orjson x JSONRenderer padrão do DRF)
+
+Payloads representativos:
+- processed_data de um dashboard de vendas (KPIs, gráficos, insights, previsões)
+- página de /datasources/{id}/data/ com 1000 linhas (NaN e Timestamps)
+
+O renderer padrão precisa da limpeza recursiva (NaN/Timestamp/numpy) antes
+de serializar; o ORJSONRenderer recebe os dados como estão.
+"""
+import io
+import os
+import timeit
+from datetime import datetime
+
+import django
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.dashboards.services import DashboardService
+from config.parsers import ORJSONParser
+from config.renderers import ORJSONRenderer
+
+ROWS = 50_000
+REPEAT = 20
+SAMPLE = os.path.join(os.path.dirname(__file__), 'teste', 'planilhas_exemplo_testes', 'vendas_completo.csv')
+
+
+def clean_recursive(obj):
+    """Limpeza que as views faziam antes de usar o renderer padrão"""
+    if isinstance(obj, dict):
+        return {key: clean_recursive(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [clean_recursive(item) for item in obj]
+    if isinstance(obj, (pd.Timestamp, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, (np.floating, float)):
+        return None if np.isnan(obj) or np.isinf(obj) else float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if pd.isna(obj):
+        return None
+    return obj
+
+
+def sales_frame(rows):
+    """Planilha de exemplo ampliada: datas em 2 anos, 500 produtos, valores faltantes"""
+    base = pd.read_csv(SAMPLE)
+    df = base.sample(rows, replace=True, random_state=0).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    df['data'] = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, rows), unit='D')
+    df['produto'] = 'Produto ' + pd.Series(rng.integers(0, 500, rows)).astype(str)
+    df.loc[rng.random(rows) < 0.05, 'valor_liquido'] = np.nan
+    return df
+
+
+def best_ms(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1000
+
+
+def compare(title, payload):
+    stock, fast = JSONRenderer(), ORJSONRenderer()
+    stock_body = stock.render(clean_recursive(payload))
+    fast_body = fast.render(payload)
+
+    stock_ms = best_ms(lambda: stock.render(clean_recursive(payload)))
+    fast_ms = best_ms(lambda: fast.render(payload))
+    parse_stock_ms = best_ms(lambda: JSONParser().parse(io.BytesIO(stock_body)))
+    parse_fast_ms = best_ms(lambda: ORJSONParser().parse(io.BytesIO(fast_body)))
+
+    print('\n' + '=' * 70)
+    print(title)
+    print('=' * 70)
+    print(f"{'':24}{'DRF JSONRenderer':>20}{'ORJSONRenderer':>20}")
+    print(f"{'render (ms)':24}{stock_ms:>20.2f}{fast_ms:>20.2f}   {stock_ms / fast_ms:.1f}x")
+    print(f"{'parse (ms)':24}{parse_stock_ms:>20.2f}{parse_fast_ms:>20.2f}   {parse_stock_ms / parse_fast_ms:.1f}x")
+    print(f"{'bytes':24}{len(stock_body):>20}{len(fast_body):>20}")
+    assert ORJSONParser().parse(io.BytesIO(fast_body)) == JSONParser().parse(io.BytesIO(stock_body))
+
+
+df = sales_frame(ROWS)
+processed = DashboardService()._process_sales_simple(df.copy())
+charts = processed['charts']
+print(f"Dashboard: {ROWS} linhas | top_products={len(charts['top_products'])} "
+      f"weekly_trend={len(charts.get('weekly_trend', []))} sales_evolution={len(charts['sales_evolution'])}")
+
+compare('📊 processed_data (dashboard de vendas)', processed)
+compare('📄 /datasources/{id}/data/ (1000 linhas)', {
+    'columns': df.columns.tolist(),
+    'rows': df.head(1000).to_dict('records'),
+    'total_rows': len(df),
+})
+
+print('\n✅ Benchmark concluído')
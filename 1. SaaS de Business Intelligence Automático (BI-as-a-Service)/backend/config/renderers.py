@@ -0,0 +1,108 @@
+"""
+JSON renderer for the REST API backed by orjson.
+Encodes numpy arrays/scalars, pandas Timestamps/Series/DataFrames, Decimal
+and NaN/Infinity (as null) natively, so views can return analysis results
+without cleaning them first.
+
+Also the table renderers (CSV, Arrow, Parquet, XLSX) that let views offer
+streamed tables through content negotiation.
+"""
+import datetime
+import uuid
+
+import orjson
+import pyarrow as pa
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from apps.datasources.services import data_pages, serialization
+
+
+def default(obj):
+    """Django/DRF types on top of serialization.default (same output as DRF's JSONEncoder)"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    try:
+        return serialization.default(obj)
+    except TypeError:
+        if hasattr(obj, 'tolist'):
+            return obj.tolist()
+        if hasattr(obj, 'keys') and hasattr(obj, '__getitem__'):
+            return dict(obj)
+        if hasattr(obj, '__iter__'):
+            return list(obj)
+        raise
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for rest_framework's JSONRenderer
+
+    Output is compact UTF-8; `application/json; indent=N` (or the browsable
+    API) gets 2-space indentation, the only one orjson supports.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_UTC_Z
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        ret = serialization.dumps(data, option=option, default=default)
+
+        # Same as DRF: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class TableStreamRenderer(BaseRenderer):
+    """
+    Content negotiation for table formats (Accept header or ?format=)
+
+    Views stream the table themselves with a StreamingHttpResponse; only
+    plain payloads such as errors are rendered here, as a one-row table.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        row = data if isinstance(data, dict) else {'detail': data}
+        table = pa.table({str(key): [force_str(value)] for key, value in row.items()})
+        return b''.join(data_pages.STREAM_FORMATS[self.format]([table], table.schema))
+
+
+class CSVStreamRenderer(TableStreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    render_style = 'text'
+
+
+class ArrowStreamRenderer(TableStreamRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+
+class ParquetStreamRenderer(TableStreamRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+
+
+class XLSXStreamRenderer(TableStreamRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
@@ -115,6 +115,59 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Snapshot storage (dados completos das fontes em formato colunar)
+SNAPSHOT_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': os.environ.get('SNAPSHOT_STORAGE_ROOT', str(MEDIA_ROOT / 'snapshots')),
+    },
+}
+
+# Cache compartilhado: Redis quando configurado; sem ele, memória local de cada processo
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL') or os.environ.get('REDIS_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'insightflow',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Cache de tabelas de snapshot (ver apps/datasources/services/tiered_cache.py):
+# LRU em memória limitada por bytes na frente do cache compartilhado
+SNAPSHOT_CACHE = {
+    'LOCAL_MAX_BYTES': int(os.environ.get('SNAPSHOT_CACHE_LOCAL_MB', '256')) * 1024 * 1024,
+    # Camada compartilhada só com Redis (LocMem duplicaria a camada local)
+    'REMOTE_ALIAS': 'default' if REDIS_CACHE_URL else None,
+    'REMOTE_TIMEOUT': 24 * 60 * 60,
+    'REMOTE_MAX_BYTES': 32 * 1024 * 1024,
+}
+
+# Motor das agregações dos dashboards: 'pandas' (cubo diário/linhas) ou
+# 'duckdb' (SQL embutido sobre os snapshots; requer o pacote duckdb)
+DASHBOARD_ENGINE = os.environ.get('DASHBOARD_ENGINE', 'pandas')
+SQL_ENGINE = {
+    'THREADS': int(os.environ.get('SQL_ENGINE_THREADS', '0')) or None,  # None: todos os núcleos
+    'MEMORY_LIMIT': os.environ.get('SQL_ENGINE_MEMORY_LIMIT', '1GB'),
+    # Consultas acima do limite de memória gravam dados temporários aqui
+    'TEMP_DIRECTORY': os.environ.get('SQL_ENGINE_TEMP_DIR', str(BASE_DIR / 'tmp' / 'duckdb')),
+}
+
+# Artefatos de exportação gerados em background (ExportJob)
+EXPORT_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': os.environ.get('EXPORT_STORAGE_ROOT', str(MEDIA_ROOT / 'exports')),
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -128,11 +181,12 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson: numpy/pandas/Decimal/NaN serializados direto (ver config/renderers.py)
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'config.renderers.ORJSONRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
-        'rest_framework.parsers.JSONParser',
+        'config.parsers.ORJSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ),
@@ -162,12 +216,16 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = 'django-db'
+# O progresso das tarefas fica no próprio modelo (ex.: DataSource.sync_status);
+# backend de resultados só quando configurado (ex.: 'django-db' com django-celery-results)
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or None
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Sem broker (desenvolvimento), executar as tarefas na própria requisição
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
@@ -175,6 +233,8 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 # Google APIs
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', '')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET', '')
+# Origem das exportações CSV de planilhas públicas (sobrescrever em testes)
+GOOGLE_SHEETS_BASE_URL = os.environ.get('GOOGLE_SHEETS_BASE_URL', 'https://docs.google.com')
 
 # Microsoft APIs
 MICROSOFT_CLIENT_ID = os.environ.get('MICROSOFT_CLIENT_ID', '')
@@ -238,6 +298,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # Uma linha por requisição às planilhas é ruído em INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
     },
 }
 
@@ -0,0 +1,129 @@
+"""
+Paridade do motor SQL embutido (DuckDB) com as agregações em pandas
+
+Para cada cenário, as mesmas linhas do período passam pelos dois motores:
+- RowAggregates sobre o DataFrame filtrado com dates.between (pandas)
+- SQLAggregates sobre o snapshot completo registrado no motor SQL (filtro de
+  dias no SQL)
+
+São comparados cada agregação (total, média, summary_by, rows_by, nunique,
+mensal, semanal) e o resultado completo de _process_sales_simple (KPIs,
+gráficos, insights, previsões, alertas). Números com tolerância relativa
+de 1e-9 (a ordem das somas difere entre os motores). Sai com código 1 se
+algum cenário divergir.
+"""
+import math
+import os
+import sys
+import timeit
+
+import django
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.dashboards.aggregates import RowAggregates, SQLAggregates
+from apps.dashboards.services import DashboardService
+from apps.datasources.services import dates
+from apps.datasources.services.sql_engine import SQLEngine
+
+ROWS = 200_000
+REPEAT = 5
+TOLERANCE = 1e-9
+SAMPLE = os.path.join(os.path.dirname(__file__), 'teste', 'planilhas_exemplo_testes', 'vendas_completo.csv')
+
+
+def sales_frame(rows, seed=0):
+    """Planilha de exemplo ampliada: datas em 2 anos, 500 produtos, valores e datas faltantes"""
+    base = pd.read_csv(SAMPLE)
+    df = base.sample(rows, replace=True, random_state=seed).reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    df['data'] = pd.Timestamp('2024-06-01') + pd.to_timedelta(rng.integers(0, 730 * 24, rows), unit='h')
+    df['produto'] = 'Produto ' + pd.Series(rng.integers(0, 500, rows)).astype(str)
+    df.loc[rng.random(rows) < 0.05, 'valor_liquido'] = np.nan
+    df.loc[rng.random(rows) < 0.01, 'data'] = pd.NaT
+    df.loc[rng.random(rows) < 0.02, 'regiao'] = None
+    return df
+
+
+def scenarios():
+    df = sales_frame(ROWS)
+    aware = df.copy()
+    aware['data'] = aware['data'].dt.tz_localize('America/Sao_Paulo')
+    yield 'vendas, 90 dias', df, pd.Timestamp('2026-03-01 15:00')
+    yield 'vendas, todo o histórico', df, None
+    yield 'datas com fuso, ano corrente', aware, pd.Timestamp('2026-01-01', tz='America/Sao_Paulo')
+    yield 'antes de 1970', df.assign(data=df['data'] - pd.DateOffset(years=60)), pd.Timestamp('1964-07-01')
+    yield 'período sem linhas', df, pd.Timestamp('2030-01-01')
+
+
+def same(a, b, path='') -> list:
+    """Diferenças entre dois resultados (dicts, listas, números com tolerância)"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if a.keys() != b.keys():
+            return [f'{path}: chaves {sorted(a.keys() ^ b.keys())}']
+        return [diff for key in a for diff in same(a[key], b[key], f'{path}.{key}')]
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return [f'{path}: {len(a)} x {len(b)} itens']
+        return [diff for i, (x, y) in enumerate(zip(a, b)) for diff in same(x, y, f'{path}[{i}]')]
+    if isinstance(a, (pd.DataFrame, pd.Series)):
+        return same(a.reset_index().to_dict('list'), b.reset_index().to_dict('list'), path)
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)) \
+            and not isinstance(a, bool) and not isinstance(b, bool):
+        if math.isnan(a) and math.isnan(b):
+            return []
+        if math.isclose(a, b, rel_tol=TOLERANCE, abs_tol=1e-6):
+            return []
+    elif a == b:
+        return []
+    return [f'{path}: {a!r} x {b!r}']
+
+
+def check(title, df, start):
+    days = dates.epoch_days(df['data'])
+    rows = df[dates.between(days, start)]
+
+    engine = SQLEngine()
+    engine.register_rows(pa.Table.from_pandas(df, preserve_index=False), 'data', start)
+    pandas_aggs, sql_aggs = RowAggregates(rows), SQLAggregates(rows, engine)
+
+    calls = {
+        'row_count': lambda a: a.row_count(),
+        'total': lambda a: a.total('valor_bruto'),
+        'mean': lambda a: a.mean('valor_liquido'),
+        'summary_by': lambda a: a.summary_by('regiao', 'valor_liquido'),
+        'rows_by': lambda a: a.rows_by('status_pagamento'),
+        'nunique': lambda a: a.nunique('produto'),
+        'monthly': lambda a: a.monthly('data', 'valor_liquido'),
+        'weekly': lambda a: a.weekly('data', 'valor_bruto'),
+    }
+    diffs = []
+    print('\n' + '=' * 70)
+    print(f'{title}: {len(rows)} de {len(df)} linhas')
+    print('=' * 70)
+    print(f"{'':16}{'pandas (ms)':>14}{'duckdb (ms)':>14}")
+    for name, call in calls.items():
+        diffs += same(call(pandas_aggs), call(sql_aggs), name)
+        pandas_ms = min(timeit.repeat(lambda: call(pandas_aggs), number=1, repeat=REPEAT)) * 1000
+        sql_ms = min(timeit.repeat(lambda: call(sql_aggs), number=1, repeat=REPEAT)) * 1000
+        print(f'{name:16}{pandas_ms:>14.2f}{sql_ms:>14.2f}')
+
+    service = DashboardService()
+    expected = service._process_sales_simple(rows, aggregates=RowAggregates(rows))
+    actual = service._process_sales_simple(rows, aggregates=SQLAggregates(rows, engine))
+    diffs += same(expected, actual, 'dashboard')
+    engine.close()
+
+    for diff in diffs[:20]:
+        print(f'  ❌ {diff}')
+    print('  ✅ mesmos resultados' if not diffs else f'  ❌ {len(diffs)} diferenças')
+    return not diffs
+
+
+results = [check(title, df, start) for title, df, start in scenarios()]
+print('\n✅ Paridade confirmada' if all(results) else '\n❌ Paridade com divergências')
+sys.exit(0 if all(results) else 1)
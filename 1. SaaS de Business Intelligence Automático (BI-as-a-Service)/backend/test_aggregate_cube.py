@@ -0,0 +1,57 @@
+"""
+Exercita o AggregateCubeBuilder com colunas que não viram dimensão:
+uma coluna de texto toda vazia (sem grupos) e uma com mais de MAX_MEMBERS
+valores distintos (descartada no meio da ingestão, em vários chunks)
+"""
+import os
+
+import django
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.datasources.services.aggregate_cube import TOTAL, AggregateCubeBuilder
+from apps.datasources.services.type_inference import TypeInferenceEngine
+
+ROWS = 6000
+CHUNK = 1000
+rng = np.random.default_rng(0)
+df = pd.DataFrame({
+    'data': pd.Series(pd.date_range('2025-01-01', periods=90).strftime('%Y-%m-%d')).sample(ROWS, replace=True, random_state=0).to_numpy(),
+    'cliente': [f'Cliente {i}' for i in range(ROWS)],
+    'regiao': rng.choice(['Sul', 'Norte', 'Sudeste'], ROWS),
+    'obs': [None] * ROWS,
+    'valor': rng.random(ROWS) * 100,
+})
+
+print('=' * 70)
+print(f'🧊 CUBO EM CHUNKS DE {CHUNK} LINHAS (obs vazia, cliente com {ROWS} valores)')
+print('=' * 70)
+engine = TypeInferenceEngine()
+schema = None
+builder = AggregateCubeBuilder()
+for offset in range(0, ROWS, CHUNK):
+    chunk = df.iloc[offset:offset + CHUNK].copy()
+    schema = schema or engine.infer(chunk)
+    builder.update(engine.apply(chunk, schema))
+cube = builder.build()
+
+print(f"Data: {cube.date_column} | medidas: {cube.measures} | dimensões: {cube.dimensions}")
+assert cube.date_column == 'data'
+assert 'cliente' not in cube.dimensions and 'regiao' in cube.dimensions
+frame = cube.frame
+assert 'cliente' not in set(frame['dimension']) and 'obs' not in set(frame['dimension'])
+
+totals = frame[frame['dimension'] == TOTAL]
+print(f"Linhas no cubo: {int(totals['rows'].sum())} | soma: {totals['valor__sum'].sum():.2f}")
+assert int(totals['rows'].sum()) == ROWS
+assert np.isclose(totals['valor__sum'].sum(), df['valor'].sum())
+
+by_region = frame[frame['dimension'] == 'regiao'].groupby('member', observed=True)['valor__sum'].sum()
+expected = df.groupby('regiao')['valor'].sum()
+print(by_region.round(2).to_dict())
+assert np.allclose(by_region.sort_index().to_numpy(), expected.sort_index().to_numpy())
+
+print('\n✅ AggregateCubeBuilder OK')
@@ -0,0 +1,66 @@
+"""
+Exercita o SnapshotPager: paginação com cursor, ordenação, filtros e
+tipos das colunas estáveis entre páginas (inteiros com nulos)
+"""
+import os
+
+import django
+import pyarrow as pa
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.datasources.services.data_pages import CursorError, DataQuery, SnapshotPager
+from apps.datasources.services.serialization import dumps
+
+table = pa.table({
+    'x': pa.array([3, 1, 2, None, 5], pa.int64()),
+    'nome': ['c', 'a', 'b', 'd', 'e'],
+    'valor': [3.5, 1.0, None, 4.0, 5.5],
+})
+pager = SnapshotPager(table, 'v1')
+
+
+def all_pages(query, limit):
+    pages, cursor = [], None
+    while True:
+        page = pager.page(query, cursor, limit)
+        pages.append(page['rows'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+print('=' * 70)
+print('📄 PÁGINAS COM sort=-x (nulo na segunda página)')
+print('=' * 70)
+query = DataQuery.from_params({'sort': '-x'}, table.column_names)
+pages = all_pages(query, 3)
+for number, rows in enumerate(pages, 1):
+    print(f"Página {number}: {[row['x'] for row in rows]} | {dumps(rows).decode()}")
+values = [row['x'] for rows in pages for row in rows]
+assert values == [5, 3, 2, 1, None], values
+# O mesmo tipo JSON em todas as páginas: inteiros, nunca 1.0
+assert all(type(value) is int for value in values if value is not None), values
+assert b'"x":1.0' not in dumps(pages[1])
+
+print('\n' + '=' * 70)
+print('🔎 FILTRO E PROJEÇÃO')
+print('=' * 70)
+query = DataQuery.from_params({'columns': 'nome,x', 'filter[x__gte]': '2'}, table.column_names)
+page = pager.page(query)
+print(page)
+assert page['columns'] == ['nome', 'x'] and [row['x'] for row in page['rows']] == [3, 2, 5]
+
+print('\n' + '=' * 70)
+print('🚫 CURSOR DE OUTRA CONSULTA')
+print('=' * 70)
+cursor = pager.page(DataQuery.from_params({'sort': 'x'}, table.column_names), limit=2)['next_cursor']
+try:
+    pager.page(DataQuery.from_params({'sort': '-x'}, table.column_names), cursor)
+except CursorError as exc:
+    print(f'Recusado: {exc}')
+else:
+    raise AssertionError('cursor de outra consulta deveria ser recusado')
+
+print('\n✅ SnapshotPager OK')
@@ -0,0 +1,132 @@
+"""
+Exercita o SheetsFetcher contra um servidor local que imita a exportação
+CSV do Google Sheets (abas por gid, ETag/304 e planilha privada)
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.datasources.services.sheets_fetcher import SheetFetchError, SheetsFetcher
+
+# Atraso por requisição, para evidenciar a sondagem em paralelo
+DELAY = 0.2
+SLOW_DELAY = 3
+ROWS = 5000
+SHEETS = {
+    0: 'data,produto,valor\n' + ''.join(f'2024-01-{i % 28 + 1:02d},P{i % 7},{i}\n' for i in range(ROWS)),
+    2: 'cliente,cidade\n' + ''.join(f'C{i},Cidade {i % 9}\n' for i in range(ROWS)),
+}
+ETAG = '"v1"'
+requests_seen = []
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        sheet_id = url.path.split('/')[3]
+        gid = int(parse_qs(url.query).get('gid', ['0'])[0])
+        requests_seen.append(gid)
+        time.sleep(DELAY)
+
+        if sheet_id == 'privada' or (sheet_id == 'revogada' and gid == 1):
+            self.send_response(403)
+            self.end_headers()
+            return
+        if sheet_id == 'revogada' and gid > 1:
+            # Sondagens lentas, canceladas quando o acesso é negado
+            time.sleep(SLOW_DELAY)
+        if gid not in SHEETS:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = SHEETS[gid].encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Prévias fecham a conexão depois das linhas que precisam
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), ExportHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+fetcher = SheetsFetcher(base_url=f'http://127.0.0.1:{server.server_port}')
+
+print('=' * 70)
+print('🔗 CONEXÃO (aba principal + sondagem das abas 0..10)')
+print('=' * 70)
+started = time.perf_counter()
+export, sheets = fetcher.connect('publica', gid=0)
+elapsed = time.perf_counter() - started
+print(f"Aba principal: gid={export.gid} | {export.size} bytes | validadores={export.validators()}")
+for sheet in sheets:
+    print(f"  {sheet['title']}: {sheet['columns']}")
+print(f"Tempo: {elapsed:.2f}s para {len(requests_seen)} requisições "
+      f"(sequencial seria ~{len(requests_seen) * DELAY:.2f}s)")
+assert [s['gid'] for s in sheets] == [0, 2]
+assert len(export.to_dataframe()) == ROWS
+
+print('\n' + '=' * 70)
+print('👀 PRÉVIAS (50 linhas por aba)')
+print('=' * 70)
+previews = fetcher.previews('publica', [0, 2, 7], nrows=50)
+for gid, df in previews.items():
+    print(f"  gid={gid}: {'indisponível' if df is None else f'{len(df)} linhas, colunas {df.columns.tolist()}'}")
+assert len(previews[0]) == 50 and previews[7] is None
+
+print('\n' + '=' * 70)
+print('🔁 SINCRONIZAÇÃO CONDICIONAL')
+print('=' * 70)
+again = fetcher.fetch('publica', 0, validators=export.validators())
+print(f"Com ETag: not_modified={again.not_modified} | {again.size} bytes baixados")
+assert again.not_modified and again.size == 0
+fresh = fetcher.fetch('publica', 0)
+print(f"Sem ETag: not_modified={fresh.not_modified} | {fresh.size} bytes baixados")
+assert not fresh.not_modified
+
+print('\n' + '=' * 70)
+print('🔒 PLANILHA PRIVADA')
+print('=' * 70)
+requests_seen.clear()
+try:
+    fetcher.connect('privada', gid=0)
+except SheetFetchError as exc:
+    print(f"Erro: {exc} | transitório={exc.is_transient} | requisições feitas={len(requests_seen)}")
+    assert exc.status == 403 and not exc.is_transient
+    # Sem sondagem das abas: só a exportação principal é pedida
+    assert requests_seen == [0], requests_seen
+else:
+    raise AssertionError('planilha privada deveria falhar')
+
+print('\n' + '=' * 70)
+print('🚫 ACESSO REVOGADO DURANTE A SONDAGEM')
+print('=' * 70)
+started = time.perf_counter()
+export, sheets = fetcher.connect('revogada', gid=0)
+elapsed = time.perf_counter() - started
+print(f"Abas: {[sheet['gid'] for sheet in sheets]} | tempo: {elapsed:.2f}s (sem cancelamento: >{SLOW_DELAY}s)")
+# A aba principal continua; as sondagens pendentes foram canceladas no primeiro 403
+assert [sheet['gid'] for sheet in sheets] == [0]
+assert elapsed < SLOW_DELAY
+
+server.shutdown()
+print('\n✅ SheetsFetcher OK')
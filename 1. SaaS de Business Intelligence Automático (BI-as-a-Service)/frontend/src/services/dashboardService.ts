@@ -36,6 +36,38 @@ export interface ChartSuggestion {
   priority: string
 }
 
+export interface ComparedValue {
+  current: number
+  previous: number | null
+  previous_change_pct: number | null
+  last_year: number | null
+  last_year_change_pct: number | null
+}
+
+export interface PeriodComparison {
+  available: boolean
+  // Motivo quando available é false
+  reason?: string
+  periods?: { [window in 'current' | 'previous' | 'last_year']: { start: string; end: string } }
+  kpis?: { [key: string]: ComparedValue }
+  charts?: { [key: string]: (ComparedValue & { label: string })[] }
+}
+
+export interface WidgetResult {
+  type: 'kpi_sum' | 'line_over_time' | 'bar_by_category' | 'table_preview' | null
+  title: string | null
+  error?: string
+  data?: {
+    value?: number
+    format?: string | null
+    interval?: 'day' | 'week' | 'month'
+    points?: { label: string; value: number | null }[]
+    bars?: { label: string; value: number | null }[]
+    columns?: string[]
+    rows?: { [column: string]: any }[]
+  }
+}
+
 export interface DashboardData {
   kpis: {
     [key: string]: number
@@ -46,6 +78,8 @@ export interface DashboardData {
   insights?: Insight[]
   data_quality?: DataQualityProblem[]
   chart_suggestions?: ChartSuggestion[]
+  comparison?: PeriodComparison
+  widgets?: WidgetResult[]
   metadata?: any
 }
 
@@ -56,6 +90,19 @@ export interface PaginatedDashboards {
   results: Dashboard[]
 }
 
+export interface ExportJob {
+  id: number
+  dashboard: number
+  content: 'report' | 'rows'
+  format: 'xlsx' | 'csv' | 'parquet'
+  status: 'pending' | 'running' | 'done' | 'failed' | 'expired'
+  size: number
+  error: string
+  download_url: string | null
+  created_at: string
+  finished_at: string | null
+}
+
 export const dashboardService = {
   // Listar dashboards
   async list(): Promise<PaginatedDashboards> {
@@ -103,6 +150,26 @@ export const dashboardService = {
     return response.data
   },
 
+  // Exportar linhas da fonte do dashboard (arquivo gerado em streaming)
+  async exportRows(id: number, format: 'csv' | 'xlsx' | 'parquet' = 'csv'): Promise<Blob> {
+    const response = await api.get(`/dashboards/${id}/export/`, {
+      params: { format },
+      responseType: 'blob',
+    })
+    return response.data
+  },
+
+  // Exportação em background (o arquivo fica disponível em download_url)
+  async requestExport(id: number, content: 'report' | 'rows' = 'report', format: 'xlsx' | 'csv' | 'parquet' = 'xlsx'): Promise<ExportJob> {
+    const response = await api.post(`/dashboards/${id}/exports/`, { content, format })
+    return response.data
+  },
+
+  async getExportJob(id: number, jobId: number): Promise<ExportJob> {
+    const response = await api.get(`/dashboards/${id}/exports/${jobId}/`)
+    return response.data
+  },
+
   // Trocar template
   async changeTemplate(id: number, template: string): Promise<Dashboard> {
     const response = await api.post(`/dashboards/${id}/change_template/`, {
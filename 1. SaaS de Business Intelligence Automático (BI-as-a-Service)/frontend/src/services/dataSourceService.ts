@@ -8,6 +8,10 @@ export interface DataSource {
   is_active: boolean
   last_synced_at: string | null
   row_count: number
+  sync_status?: 'idle' | 'pending' | 'running' | 'success' | 'failed'
+  sync_step?: string
+  sync_progress?: number
+  sync_error?: string
   created_at: string
   updated_at: string
   // Campos adicionais ao criar via upload (dashboard automático)
@@ -18,13 +22,36 @@ export interface DataSource {
   message?: string
 }
 
+export interface DataSourceStatus {
+  id: number
+  name: string
+  sync_status: 'idle' | 'pending' | 'running' | 'success' | 'failed'
+  sync_step: string
+  sync_progress: number
+  sync_error: string
+  row_count: number
+  dashboard_created: boolean
+  dashboard_id?: number
+  dashboard_name?: string
+  dashboard_template?: string
+}
+
 export interface DataSourceData {
   columns: string[]
   rows: any[]
   total_rows: number
+  next_cursor?: string | null
   sheets?: { gid: number; title: string; columns: string[]; sample_rows: any[] }[]
 }
 
+export interface DataSourceDataParams {
+  columns?: string[]
+  sort?: string
+  limit?: number
+  cursor?: string
+  filters?: Record<string, string | number>
+}
+
 export interface PaginatedDataSources {
   count: number
   next: string | null
@@ -56,9 +83,32 @@ export const dataSourceService = {
         'Content-Type': 'multipart/form-data',
       },
     })
+
+    // O processamento continua em segundo plano: aguardar o pipeline
+    const result = await dataSourceService.waitForSync(response.data.id)
+    if (result.sync_status === 'failed') {
+      throw { response: { data: { error: result.sync_error || 'Erro ao processar o arquivo' } } }
+    }
+    return { ...response.data, ...result }
+  },
+
+  // Status do processamento (ingestão, perfil, dashboard automático)
+  async getStatus(id: number): Promise<DataSourceStatus> {
+    const response = await api.get(`/datasources/${id}/status/`)
     return response.data
   },
 
+  // Aguardar o pipeline de sincronização terminar
+  async waitForSync(id: number, intervalMs = 1000): Promise<DataSourceStatus> {
+    for (;;) {
+      const status = await dataSourceService.getStatus(id)
+      if (status.sync_status === 'success' || status.sync_status === 'failed') {
+        return status
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs))
+    }
+  },
+
   // Conectar Google Sheets
   async connectGoogleSheets(name: string, url: string): Promise<DataSource> {
     const response = await api.post('/datasources/connect_google_sheets/', {
@@ -75,8 +125,15 @@ export const dataSourceService = {
   },
 
   // Obter dados da fonte
-  async getData(id: number): Promise<DataSourceData> {
-    const response = await api.get(`/datasources/${id}/data/`)
+  // Paginado: passe next_cursor da resposta anterior em params.cursor
+  async getData(id: number, params: DataSourceDataParams = {}): Promise<DataSourceData> {
+    const { columns, filters, ...rest } = params
+    const query: Record<string, string | number> = { ...rest }
+    if (columns?.length) query.columns = columns.join(',')
+    Object.entries(filters || {}).forEach(([key, value]) => {
+      query[`filter[${key}]`] = value
+    })
+    const response = await api.get(`/datasources/${id}/data/`, { params: query })
     return response.data
   },
 